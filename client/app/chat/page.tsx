@@ -713,18 +713,14 @@ export default function ChatPage() {
 
     try {
       console.log(selectedModel, selectedModelType);
+      const params = new URLSearchParams({
+        model_name: selectedModel,
+        model_type: selectedModelType,
+      });
       const response = await fetch(
-        `${process.env.NEXT_PUBLIC_BACKEND_URL}/model_info`,
+        `${process.env.NEXT_PUBLIC_BACKEND_URL}/model_info?${params}`,
         {
-          method: "POST",
-          headers: {
-            "Content-Type": "application/json",
-            ...(token ? { Authorization: `Bearer ${token}` } : {}),
-          },
-          body: JSON.stringify({
-            model_name: selectedModel,
-            model_type: selectedModelType,
-          }),
+          headers: token ? { Authorization: `Bearer ${token}` } : {},
         },
       );
 
@@ -998,15 +994,13 @@ export default function ChatPage() {
         // CRITICAL FIX: Logged-in users fetch from backend, guests use localStorage
         if (token) {
           // USER IS LOGGED IN: Fetch their sessions from backend
+          // GET, so the browser revalidates its cached copy with If-None-Match
           const response = await fetch(
             `${process.env.NEXT_PUBLIC_BACKEND_URL}/chat/history`,
             {
-              method: "POST",
               headers: {
-                "Content-Type": "application/json",
                 Authorization: `Bearer ${token}`,
               },
-              body: JSON.stringify({ session_ids: [] }), // Backend ignores this for logged-in users
             },
           );
 
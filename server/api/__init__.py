@@ -2,38 +2,55 @@ from flask import Flask
 from flask_cors import CORS
 from flask_pymongo import PyMongo
 from flask_bcrypt import Bcrypt
+from werkzeug.middleware.proxy_fix import ProxyFix
 from .config import Config
-import google.generativeai as genai
 
 from api.plugins.manager import init_plugin_manager
+from api.ratelimit import init_rate_limiter
+from api.metrics import init_metrics, MongoCommandMetrics
+from api.utils.compression import init_compression
 
 mongo = PyMongo()
 bcrypt = Bcrypt()
-gemini_model = None
 plugin_manager = None
 
+def init_mongo(app):
+    """
+    Creates the MongoDB client of `mongo`. A client must not be shared across
+    fork(), so a worker forked from a preloaded master calls this again to get
+    its own client and connection pool.
+    """
+    if Config.METRICS_ENABLED:
+        mongo.init_app(app, event_listeners=[MongoCommandMetrics()])
+    else:
+        mongo.init_app(app)
+
 def create_app():
     app = Flask(__name__)
+    if Config.TRUSTED_PROXY_HOPS:
+        # Client IP (rate limit key) from the X-Forwarded-For entries added by our own proxies only
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.TRUSTED_PROXY_HOPS)
     CORS(app)
     app.config.from_object(Config)
-    mongo.init_app(app)
+    init_mongo(app)
+    if Config.METRICS_ENABLED:
+        init_metrics(app)
     bcrypt.init_app(app)
     
     # Initialize Plugins
     global plugin_manager
     plugin_manager = init_plugin_manager(app.config['PLUGINS_DIRS'], app.config['ENABLED_PLUGINS'])
 
+    # Initialize rate limiting
+    init_rate_limiter(app.config, lambda: mongo.db.rate_limits)
+
+    if Config.COMPRESSION_ENABLED:
+        init_compression(app)
+
     @app.route("/")
     def index():
         return "Welcome to the PrivGPT-Studio Backend!"
 
-    try:
-        genai.configure(api_key=Config.GEMINI_API_KEY)
-        global gemini_model
-        gemini_model = genai.GenerativeModel("models/gemini-2.5-flash")
-    except Exception as e:
-        print(f"Warning: Gemini API not configured correctly: {e}")
-
     # blueprint imports
     from api.routes.db import db_bp
     app.register_blueprint(db_bp)
@@ -50,5 +67,10 @@ def create_app():
     
     from api.routes.review_routes import review_bp
     app.register_blueprint(review_bp)
+    from api.routes.admin_routes import admin_bp
+    app.register_blueprint(admin_bp)
+    if Config.METRICS_ENABLED:
+        from api.routes.metrics_routes import metrics_bp
+        app.register_blueprint(metrics_bp)
     
     return app
\ No newline at end of file
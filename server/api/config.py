@@ -8,6 +8,13 @@ class Config:
     MONGO_URI = os.getenv("MONGODB_URL", "mongodb://localhost:27017/privgpt")
     ALLOWED_EXTENSIONS = {"pdf", "png", "jpg", "jpeg", "gif"}
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "your_gemini_api_key")
+    OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434").rstrip("/")
+    # Ollama servers to spread local inference over (comma-separated, default: OLLAMA_URL)
+    OLLAMA_NODES = [url.strip().rstrip("/") for url in os.getenv("OLLAMA_NODES", "").split(",") if url.strip()] or [OLLAMA_URL]
+    # Nodes failing this many times in a row are ejected for OLLAMA_EJECT_SECONDS
+    OLLAMA_EJECT_AFTER = int(os.getenv("OLLAMA_EJECT_AFTER", 3))
+    OLLAMA_EJECT_SECONDS = float(os.getenv("OLLAMA_EJECT_SECONDS", 30))
+    OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", 2))
     SECRET_KEY = os.getenv("SECRET_KEY", "dev_secret_key")
     # Plugins directory logic
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # this is the 'server' folder
@@ -25,5 +32,100 @@ class Config:
         PLUGINS_DIRS = _env_dirs.split(',')
         
     ENABLED_PLUGINS = os.getenv("ENABLED_PLUGINS", None) # Comma-separated list of plugin folder names
+    # Plugin hook budgets: calls over budget are logged and counted, calls over the
+    # timeout are abandoned; after N overruns in a row the plugin is quarantined
+    PLUGIN_HOOK_BUDGET_MS = float(os.getenv("PLUGIN_HOOK_BUDGET_MS", 50))  # default, manifests may override
+    PLUGIN_HOOK_TIMEOUT_MS = float(os.getenv("PLUGIN_HOOK_TIMEOUT_MS", 2000))  # 0 = run inline, no timeout
+    PLUGIN_HOOK_WORKERS = int(os.getenv("PLUGIN_HOOK_WORKERS", 8))
+    PLUGIN_QUARANTINE_AFTER = int(os.getenv("PLUGIN_QUARANTINE_AFTER", 5))
+    PLUGIN_QUARANTINE_SECONDS = float(os.getenv("PLUGIN_QUARANTINE_SECONDS", 300))  # 0 = until released by an admin
+    # Worker processes per plugin with "isolation": "process" (manifests may override with "workers")
+    PLUGIN_PROCESS_WORKERS = int(os.getenv("PLUGIN_PROCESS_WORKERS", 2))
+    PLUGIN_PROCESS_START_TIMEOUT = float(os.getenv("PLUGIN_PROCESS_START_TIMEOUT", 30))
+    # Token for the /admin endpoints (unset = admin API disabled)
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+    # Prometheus metrics at /metrics: scrapers send METRICS_TOKEN as a Bearer token;
+    # without a token, only local clients are served unless METRICS_PUBLIC is set
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+    METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "false").lower() == "true"
+    # Directory where worker processes share their metrics (set by api/serve.py
+    # for several workers); empty = each process reports only its own
+    METRICS_MULTIPROCESS_DIR = os.getenv("METRICS_MULTIPROCESS_DIR", "")
+    METRICS_SYNC_SECONDS = float(os.getenv("METRICS_SYNC_SECONDS", 5))
     MAX_MESSAGES_PER_SESSION = int(os.getenv("MAX_MESSAGES_PER_SESSION", 10))
     CONTACT_EMAIL = os.getenv("CONTACT_EMAIL", "support@privgpt-studio.com")
+    # Seconds clients/proxies may reuse /models before revalidating with its ETag
+    MODELS_CACHE_MAX_AGE = int(os.getenv("MODELS_CACHE_MAX_AGE", 30))
+    # Seconds between background refreshes of the local model catalog (Ollama /api/tags)
+    MODEL_CATALOG_REFRESH_INTERVAL = float(os.getenv("MODEL_CATALOG_REFRESH_INTERVAL", 30))
+
+    # Uploads: per-file limit, in-memory spooling threshold and whole-request cap (Flask)
+    MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_MB", 50)) * 1024 * 1024
+    UPLOAD_SPOOL_THRESHOLD = int(os.getenv("UPLOAD_SPOOL_THRESHOLD_KB", 1024)) * 1024
+    MAX_CONTENT_LENGTH = MAX_UPLOAD_SIZE + 1024 * 1024  # room for the other form fields
+    # Session imports are streamed, so they may be larger than uploads
+    IMPORT_MAX_SIZE = int(os.getenv("IMPORT_MAX_MB", 1024)) * 1024 * 1024
+    # Media above this size is sent through the Gemini File API instead of inline
+    GEMINI_INLINE_MAX_BYTES = int(os.getenv("GEMINI_INLINE_MAX_MB", 15)) * 1024 * 1024
+
+    # Gemini calls: optional client-side quota ("<requests>/<seconds>", off by default;
+    # shared by all workers with RATE_LIMIT_BACKEND=mongo), retries and deadlines
+    GEMINI_RATE_LIMIT = os.getenv("GEMINI_RATE_LIMIT", "")
+    GEMINI_QUEUE_SECONDS = float(os.getenv("GEMINI_QUEUE_SECONDS", 10))  # max wait for the quota
+    GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", 3))
+    GEMINI_DEADLINE_SECONDS = float(os.getenv("GEMINI_DEADLINE_SECONDS", 60))  # whole call, retries included
+    GEMINI_STREAM_TIMEOUT_SECONDS = float(os.getenv("GEMINI_STREAM_TIMEOUT_SECONDS", 300))
+
+    # Compression of large message bodies at rest: "" (off), "zlib", "zstd" (pip
+    # install zstandard) or "auto"; compressed messages are always readable, and
+    # stay fully searchable through the distinct words stored next to them
+    MESSAGE_COMPRESSION = os.getenv("MESSAGE_COMPRESSION", "")
+    MESSAGE_COMPRESSION_MIN_BYTES = int(os.getenv("MESSAGE_COMPRESSION_MIN_BYTES", 4096))
+
+    # Attachment storage: "gridfs" (MongoDB) or "local" (blob directory on disk)
+    ATTACHMENT_BACKEND = os.getenv("ATTACHMENT_BACKEND", "gridfs")
+    ATTACHMENT_DIR = os.getenv("ATTACHMENT_DIR", os.path.join(BASE_DIR, "attachments"))
+
+    # PDF text extraction
+    PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", 1000))  # pages read per document (0 = no limit)
+    PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", 1000000))  # characters kept per document (0 = no limit)
+    PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 64))  # below this, pages are parsed inline
+    PDF_WORKERS = int(os.getenv("PDF_WORKERS", min(4, os.cpu_count() or 1)))
+    PDF_TEXT_CACHE_CHARS = int(os.getenv("PDF_TEXT_CACHE_CHARS", 32 * 1024 * 1024))
+
+    # Image pre-processing before images are sent to Gemini
+    IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", 1536))  # longest side, in pixels
+    IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", 85))
+    IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG").upper()  # JPEG, WEBP or PNG
+    IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", min(2, os.cpu_count() or 1)))
+    IMAGE_CACHE_MB = int(os.getenv("IMAGE_CACHE_MB", 64))
+
+    # Retrieval over uploaded documents
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")  # Ollama embedding model ("" = hashing only)
+    RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", 4000))  # document tokens injected per prompt
+    RETRIEVAL_CHUNK_CHARS = int(os.getenv("RETRIEVAL_CHUNK_CHARS", 1200))
+    RETRIEVAL_CHUNK_OVERLAP = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP", 200))
+    RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", 12))
+    DOCUMENT_INDEX_CACHE_MB = int(os.getenv("DOCUMENT_INDEX_CACHE_MB", 64))
+
+    # Response compression (gzip, or brotli when installed), negotiated with Accept-Encoding
+    COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))  # smaller bodies are sent as is
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 5))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+    COMPRESSION_STREAMS = os.getenv("COMPRESSION_STREAMS", "true").lower() == "true"  # SSE and exports
+
+    # Rate limiting ("memory" is per worker process, "mongo" is shared by all workers)
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    # Reverse proxies in front of the app that append to X-Forwarded-For (0: none,
+    # the client IP is the connection's address)
+    TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", 0))
+    # Rates are "<requests>/<seconds>" per client IP
+    RATE_LIMITS = {
+        "chat": {"algorithm": "token_bucket", "rate": os.getenv("RATE_LIMIT_CHAT", "20/60")},
+        "login": {"algorithm": "sliding_window", "rate": os.getenv("RATE_LIMIT_LOGIN", "10/60")},
+        "contact": {"algorithm": "sliding_window", "rate": os.getenv("RATE_LIMIT_CONTACT", "5/60")},
+    }
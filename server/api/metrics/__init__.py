@@ -0,0 +1,14 @@
+from .registry import Registry, Counter, Gauge, Histogram
+from .telemetry import (
+    registry,
+    init_metrics,
+    exposition,
+    MongoCommandMetrics,
+    record_ttft,
+    record_ollama_stats,
+    record_fallback,
+    record_gemini_request,
+    record_gemini_retry,
+    record_gemini_throttle,
+    track_stream,
+)
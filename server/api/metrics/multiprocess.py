@@ -0,0 +1,118 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from .registry import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Counters and histograms of exited workers, so totals never go backwards
+ARCHIVE_FILE = "archived.json"
+MERGE = {"counter": Counter.merge, "histogram": Histogram.merge}
+
+
+def _snapshot_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"{pid}.json")
+
+
+def _read(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # Removed since listed (worker exited), or not written yet
+        return {}
+
+
+def _write(path: str, snapshot: dict):
+    # Written aside and renamed, so readers never see a partial file
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(temp_path, path)
+
+
+def clear_directory(directory: str):
+    """Removes the snapshots left by a previous server run."""
+    for path in glob.glob(os.path.join(directory, "*.json")) + glob.glob(os.path.join(directory, "*.tmp")):
+        os.remove(path)
+
+
+def mark_process_dead(directory: str, pid: int):
+    """
+    Folds the last snapshot of an exited worker into the archive. Gauges are
+    dropped: they describe the live process (e.g. streams in flight). Only call
+    from one process (the gunicorn master), the archive is not locked.
+    """
+    path = _snapshot_path(directory, pid)
+    snapshot = _read(path)
+    if snapshot:
+        archive_path = os.path.join(directory, ARCHIVE_FILE)
+        archive = _read(archive_path)
+        for name, entry in snapshot.items():
+            merge = MERGE.get(entry["type"])
+            if merge is None:
+                continue
+            archived = archive.setdefault(name, {"type": entry["type"], "series": []})
+            series = {tuple(values): value for values, value in archived["series"]}
+            for values, value in entry["series"]:
+                values = tuple(values)
+                series[values] = merge(series[values], value) if values in series else value
+            archived["series"] = [[list(values), value] for values, value in series.items()]
+        _write(archive_path, archive)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class SharedDirectory:
+    """
+    Shares the metrics of one registry between the worker processes of a server.
+
+    Metrics live in each worker's memory, and a scrape reaches only one worker.
+    Each worker therefore writes a snapshot of its registry to
+    <directory>/<pid>.json every `interval` seconds (from a background thread
+    started on its first request, so never in a preloading master), and
+    exposition() adds the latest snapshots of the other workers, plus the
+    archive of exited ones, to its own live values.
+    """
+
+    def __init__(self, registry, directory: str, interval: float = 5):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._pid = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def ensure_started(self):
+        """Starts the snapshot thread of this process, once (also after a fork)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="metrics-snapshot", daemon=True).start()
+
+    def _run(self):
+        pid = self._pid
+        while self._pid == pid:
+            self.write()
+            time.sleep(self.interval)
+
+    def write(self):
+        """Writes this process's snapshot now (also called when a worker exits)."""
+        try:
+            _write(_snapshot_path(self.directory, os.getpid()), self.registry.snapshot())
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot to {self.directory}: {e}")
+
+    def others(self) -> list:
+        """Latest snapshots of the other processes and the archive."""
+        own = _snapshot_path(self.directory, os.getpid())
+        return [_read(path) for path in glob.glob(os.path.join(self.directory, "*.json")) if path != own]
+
+    def exposition(self) -> str:
+        return self.registry.exposition(self.others())
@@ -0,0 +1,240 @@
+import bisect
+import math
+import threading
+
+# Default latency buckets (seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """
+    Base class for metrics with optional labels.
+
+    Each label combination is a child holding its own values and lock, so
+    concurrent updates only contend when they hit the same series; looking up an
+    existing child is a lock-free dict read.
+    """
+
+    type_name = None
+
+    def __init__(self, name: str, documentation: str, labelnames=(), max_series: int = 1000):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Label values partly come from requests (model names...): past this many
+        # series, new combinations are folded into a single "_other" series
+        self.max_series = max_series
+        self._children = {}
+        self._create_lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values):
+        """Returns the child for the given label values (in labelnames order)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._create_lock:
+                child = self._children.get(values)
+                if child is None and len(self._children) >= self.max_series:
+                    values = ("_other",) * len(values)
+                    child = self._children.get(values)
+                if child is None:
+                    child = self._new_child()
+                    self._children[values] = child
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def snapshot(self) -> dict:
+        """Returns {label values: value} for every series (a histogram's value is (counts, sum))."""
+        return {values: self._child_value(child) for values, child in list(self._children.items())}
+
+    def collect(self, series: dict = None) -> list:
+        """Renders `series` (by default the current snapshot()) in the text format."""
+        series = self.snapshot() if series is None else series
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for values, value in series.items():
+            lines.extend(self._sample_lines(values, value))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    def _child_value(self, child):
+        return child.value
+
+    @staticmethod
+    def merge(a, b):
+        return a + b
+
+    def _sample_lines(self, values, value):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"]
+
+
+class _GaugeChild(_CounterChild):
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def dec(self, amount: float = 1):
+        self._default.dec(amount)
+
+    def set(self, value: float):
+        self._default.set(value)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One count per bucket, plus the +Inf bucket; made cumulative on export
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def _child_value(self, child):
+        return child.snapshot()
+
+    @staticmethod
+    def merge(a, b):
+        return [x + y for x, y in zip(a[0], b[0])], a[1] + b[1]
+
+    def _sample_lines(self, values, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """A set of metrics exported together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> dict:
+        """
+        Returns the current values of every metric in a JSON-serializable form:
+        {name: {"type": type_name, "series": [[label values, value], ...]}}.
+        """
+        return {
+            metric.name: {"type": metric.type_name, "series": [[list(values), value] for values, value in metric.snapshot().items()]}
+            for metric in list(self._metrics.values())
+        }
+
+    def exposition(self, others=()) -> str:
+        """
+        Renders every metric in the Prometheus text exposition format (0.0.4).
+
+        Args:
+        others (list): snapshot()s of other processes to add to this registry's
+        values (series of metrics not registered here are ignored).
+        """
+        lines = []
+        for metric in list(self._metrics.values()):
+            series = metric.snapshot()
+            for other in others:
+                entry = other.get(metric.name)
+                if not entry or entry.get("type") != metric.type_name:
+                    continue
+                for values, value in entry["series"]:
+                    values = tuple(values)
+                    series[values] = metric.merge(series[values], value) if values in series else value
+            lines.extend(metric.collect(series))
+        return "\n".join(lines) + "\n"
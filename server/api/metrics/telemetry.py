@@ -0,0 +1,143 @@
+import time
+from flask import request
+from pymongo import monitoring
+from api.config import Config
+from .multiprocess import SharedDirectory
+from .registry import Registry
+
+registry = Registry()
+# Set by init_metrics when METRICS_MULTIPROCESS_DIR is configured
+shared = None
+
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+TTFT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10, 20, 30)
+TOKENS_PER_SECOND_BUCKETS = (1, 2.5, 5, 10, 15, 20, 30, 40, 50, 75, 100, 150, 200, 300)
+THROTTLE_BUCKETS = (0, 0.1, 0.25, 0.5, 1, 2, 4, 6, 8, 10, 15, 30)
+
+http_requests = registry.counter(
+    "privgpt_http_requests_total", "HTTP requests by route, method and status.",
+    ("route", "method", "status"))
+http_latency = registry.histogram(
+    "privgpt_http_request_duration_seconds",
+    "Time to produce the response (for streams: until streaming starts), by route.",
+    ("route", "method"))
+time_to_first_token = registry.histogram(
+    "privgpt_inference_time_to_first_token_seconds", "Time from request to the first streamed token.",
+    ("provider", "model"), buckets=TTFT_BUCKETS)
+tokens_per_second = registry.histogram(
+    "privgpt_inference_tokens_per_second", "Generation speed (Ollama eval_count / eval_duration).",
+    ("provider", "model"), buckets=TOKENS_PER_SECOND_BUCKETS)
+generated_tokens = registry.counter(
+    "privgpt_inference_generated_tokens_total", "Tokens generated, as reported by the model server.",
+    ("provider", "model"))
+fallbacks = registry.counter(
+    "privgpt_model_fallbacks_total", "Requests answered by the fallback model after the requested one failed.",
+    ("from_model", "to_model"))
+streams_in_flight = registry.gauge(
+    "privgpt_streams_in_flight", "Chat responses currently being streamed.")
+gemini_requests = registry.counter(
+    "privgpt_gemini_requests_total", "Gemini calls by outcome (success, error, throttled), retries included.",
+    ("outcome",))
+gemini_retries = registry.counter(
+    "privgpt_gemini_retries_total", "Gemini attempts retried after a retryable error, by status code or error type.",
+    ("reason",))
+gemini_throttle_wait = registry.histogram(
+    "privgpt_gemini_throttle_wait_seconds", "Time Gemini attempts waited for the client-side quota.",
+    buckets=THROTTLE_BUCKETS)
+gemini_throttled = registry.counter(
+    "privgpt_gemini_throttled_total", "Gemini calls rejected because the client-side quota did not free up in time.")
+mongo_latency = registry.histogram(
+    "privgpt_mongo_command_duration_seconds", "MongoDB command latency by command and outcome.",
+    ("command", "outcome"), buckets=MONGO_BUCKETS)
+
+
+def init_metrics(app):
+    """
+    Registers per-request timing hooks on the Flask app, and the snapshot
+    sharing between worker processes if METRICS_MULTIPROCESS_DIR is set.
+    """
+    global shared
+    if Config.METRICS_MULTIPROCESS_DIR and shared is None:
+        shared = SharedDirectory(registry, Config.METRICS_MULTIPROCESS_DIR, Config.METRICS_SYNC_SECONDS)
+
+    @app.before_request
+    def start_timer():
+        if shared is not None:
+            shared.ensure_started()
+        request.environ["privgpt.start"] = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = request.environ.get("privgpt.start")
+        if start is not None:
+            # The route template, not the path, keeps the number of series bounded
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            http_latency.labels(route, request.method).observe(time.perf_counter() - start)
+            http_requests.labels(route, request.method, str(response.status_code)).inc()
+        return response
+
+
+def exposition() -> str:
+    """Prometheus text of this process's metrics, plus the other workers' if shared."""
+    return shared.exposition() if shared is not None else registry.exposition()
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """PyMongo command listener recording command latency (durations come with the events)."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_latency.labels(event.command_name, "success").observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        mongo_latency.labels(event.command_name, "failure").observe(event.duration_micros / 1e6)
+
+
+def record_ttft(provider: str, model: str, seconds: float):
+    time_to_first_token.labels(provider, model).observe(seconds)
+
+
+def record_ollama_stats(model: str, data: dict):
+    """
+    Records generation speed from an Ollama response (the final chunk of a
+    stream, or a non-streamed response): eval_count tokens in eval_duration ns.
+    """
+    eval_count = data.get("eval_count")
+    eval_duration = data.get("eval_duration")
+    if eval_count:
+        generated_tokens.labels("ollama", model).inc(eval_count)
+        if eval_duration:
+            tokens_per_second.labels("ollama", model).observe(eval_count / (eval_duration / 1e9))
+
+
+def record_fallback(from_model: str, to_model: str):
+    fallbacks.labels(from_model, to_model).inc()
+
+
+def track_stream(chunks):
+    """
+    Wraps a streamed response body so it counts as in flight until it is
+    exhausted or closed (client disconnect).
+    """
+    streams_in_flight.inc()
+    try:
+        yield from chunks
+    finally:
+        streams_in_flight.dec()
+
+
+def record_gemini_request(outcome: str):
+    gemini_requests.labels(outcome).inc()
+
+
+def record_gemini_retry(reason: str):
+    gemini_retries.labels(reason).inc()
+
+
+def record_gemini_throttle(waited: float, rejected: bool = False):
+    """Records the time a Gemini call waited for the client-side quota."""
+    gemini_throttle_wait.observe(waited)
+    if rejected:
+        gemini_throttled.inc()
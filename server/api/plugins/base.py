@@ -1,9 +1,14 @@
 from abc import ABC, abstractmethod
 
+# Hook names a plugin may implement (and declare in its manifest's "hooks")
+HOOKS = ("before_prompt", "after_response", "on_chunk", "on_stream_end", "on_session_start", "on_session_end")
+
 class BasePlugin(ABC):
     """
     Base interface for PrivGPT plugins.
     All plugins should inherit from this class and implement the desired hooks.
+    Hooks may also be implemented as `async def` coroutines (e.g. for I/O-bound
+    enrichment); they are then run on the plugin manager's event loop.
     """
     
     def before_prompt(self, prompt: str) -> str:
@@ -20,6 +25,22 @@ class BasePlugin(ABC):
         """
         return response
 
+    def on_chunk(self, chunk: str, state: dict) -> str:
+        """
+        Hook called for each chunk of a streamed response, before it is sent.
+        Returns the text to emit in its place (may be empty, e.g. while holding
+        back a partial word). `state` is a dict private to this plugin and this
+        stream, for keeping data between chunks.
+        """
+        return chunk
+
+    def on_stream_end(self, state: dict) -> str:
+        """
+        Hook called once the stream is finished, with the same `state` as
+        on_chunk. Returns any text still held back, to be emitted last.
+        """
+        return ""
+
     def on_session_start(self):
         """
         Hook called when a new chat session starts.
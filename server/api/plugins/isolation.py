@@ -0,0 +1,207 @@
+import asyncio
+import atexit
+import inspect
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import TimeoutError as HookTimeout
+from api.config import Config
+from api.utils.workers import get_mp_context
+from .base import HOOKS
+from .loader import import_plugin_class, overridden_hooks
+
+logger = logging.getLogger(__name__)
+
+# Hooks whose last argument is a state dict the plugin may mutate
+STATEFUL_HOOKS = {"on_chunk", "on_stream_end"}
+
+
+def _worker_main(conn, name, plugin_file, entry_point):
+    """
+    Worker process loop: imports the plugin, reports its hooks, then serves
+    (hook, args) requests from the pipe until the parent closes it. Async hooks
+    run to completion on the worker's own event loop, kept across calls so
+    clients bound to it (e.g. HTTP sessions) can be reused.
+    """
+    try:
+        plugin_class = import_plugin_class(name, plugin_file, entry_point)
+        plugin = plugin_class()
+    except BaseException as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", overridden_hooks(plugin_class)))
+
+    loop = None
+    while True:
+        try:
+            hook, args = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            result = getattr(plugin, hook)(*args)
+            if inspect.isawaitable(result):
+                loop = loop or asyncio.new_event_loop()
+                result = loop.run_until_complete(result)
+            # Send mutated state back, the caller's dict is not shared with us
+            state = args[-1] if hook in STATEFUL_HOOKS else None
+            conn.send(("ok", result, state))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}", None))
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+
+
+class WorkerCrashed(RuntimeError):
+    """Raised when a plugin worker process dies during a call."""
+
+
+class ProcessPlugin:
+    """
+    Runs a plugin in a pool of worker processes (manifest "isolation": "process").
+
+    Each worker imports the plugin itself; hook calls are sent to an idle
+    worker over a Pipe, so CPU-heavy plugins do not hold the server's GIL and
+    scale across cores. A call that exceeds `timeout` raises HookTimeout and its
+    worker is killed; workers that time out or crash are replaced in the
+    background. Exposes the hooks as methods, like an in-process plugin.
+    """
+
+    def __init__(self, name: str, plugin_file: str, entry_point: str = None, workers: int = 1,
+                 timeout: float = None, start_timeout: float = None):
+        self.name = name
+        self.plugin_file = plugin_file
+        self.entry_point = entry_point
+        self.timeout = timeout
+        self.start_timeout = start_timeout or Config.PLUGIN_PROCESS_START_TIMEOUT
+        self.restarts = 0
+        self._context = get_mp_context()
+        self._idle = queue.Queue()
+        self._workers = set()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        started = [self._spawn() for _ in range(max(1, workers))]
+        try:
+            for worker in started:
+                self.hooks = self._wait_ready(worker)
+                self._idle.put(worker)
+        except Exception:
+            self.close()
+            raise
+        atexit.register(self.close)
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.name, self.plugin_file, self.entry_point),
+            name=f"plugin-{self.name}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, parent_conn)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _wait_ready(self, worker: _Worker) -> list:
+        try:
+            if not worker.conn.poll(self.start_timeout):
+                raise TimeoutError(f"worker did not start within {self.start_timeout:g} s")
+            message = worker.conn.recv()
+        except EOFError:
+            raise WorkerCrashed(f"worker exited with code {worker.process.exitcode} while starting")
+        if message[0] == "error":
+            raise ImportError(message[1])
+        return message[1]
+
+    def _stop(self, worker: _Worker):
+        with self._lock:
+            self._workers.discard(worker)
+        worker.conn.close()
+        if worker.process.is_alive():
+            worker.process.terminate()
+            worker.process.join(1)
+            if worker.process.is_alive():
+                worker.process.kill()
+        worker.process.join(0)
+
+    def _replace(self, worker: _Worker, reason: str):
+        """Kills a worker and starts a replacement in the background."""
+        self._stop(worker)
+        self.restarts += 1
+        logger.warning(f"Worker {worker.process.pid} of plugin {self.name} {reason}, restarting")
+
+        def restart():
+            if self._closed:
+                return
+            replacement = self._spawn()
+            try:
+                self._wait_ready(replacement)
+            except Exception as e:
+                logger.error(f"Failed to restart worker of plugin {self.name}: {e}")
+                self._stop(replacement)
+                return
+            self._idle.put(replacement)
+
+        threading.Thread(target=restart, name=f"plugin-{self.name}-restart", daemon=True).start()
+
+    def call(self, hook: str, *args):
+        """
+        Runs a hook in an idle worker and returns its result.
+
+        Raises:
+        HookTimeout: No worker became free, or the hook ran past the timeout.
+        WorkerCrashed: The worker died while running the hook.
+        RuntimeError: The hook raised an exception in the worker.
+        """
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        try:
+            worker = self._idle.get(timeout=self.timeout or self.start_timeout)
+        except queue.Empty:
+            raise HookTimeout(f"no idle worker for plugin {self.name}")
+
+        try:
+            worker.conn.send((hook, args))
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready = worker.conn.poll(remaining)
+            message = worker.conn.recv() if ready else None
+        except (EOFError, BrokenPipeError, ConnectionResetError) as e:
+            self._replace(worker, f"crashed ({type(e).__name__})")
+            raise WorkerCrashed(f"worker of plugin {self.name} crashed")
+        if message is None:
+            # The worker is still busy with this call: it cannot be reused
+            self._replace(worker, "timed out")
+            raise HookTimeout(f"{hook} of plugin {self.name} timed out")
+        self._idle.put(worker)
+
+        status, result, state = message
+        if status == "error":
+            raise RuntimeError(result)
+        if state is not None:
+            args[-1].clear()
+            args[-1].update(state)
+        return result
+
+    def __getattr__(self, hook):
+        if hook in HOOKS:
+            return lambda *args: self.call(hook, *args)
+        raise AttributeError(hook)
+
+    def describe(self) -> dict:
+        with self._lock:
+            pids = [worker.process.pid for worker in self._workers]
+        return {"pids": pids, "idle": self._idle.qsize(), "restarts": self.restarts}
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            self._stop(worker)
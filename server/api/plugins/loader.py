@@ -0,0 +1,33 @@
+import importlib.util
+from typing import List
+from .base import BasePlugin, HOOKS
+
+
+def import_plugin_class(name: str, plugin_file: str, entry_point: str = None) -> type:
+    """
+    Imports a plugin module and returns its plugin class: the manifest's
+    "entry_point", else the first BasePlugin subclass defined in the module.
+    Used in the server process and in plugin worker processes.
+    """
+    spec = importlib.util.spec_from_file_location(f"plugin_{name}", plugin_file)
+    module = importlib.util.module_from_spec(spec)
+    if spec and spec.loader:
+        spec.loader.exec_module(module)
+
+    plugin_class = getattr(module, entry_point, None) if entry_point else None
+    if plugin_class is None:
+        for attr in vars(module).values():
+            if (isinstance(attr, type) and
+                issubclass(attr, BasePlugin) and
+                attr is not BasePlugin and
+                attr.__module__ == module.__name__):
+                plugin_class = attr
+                break
+    if plugin_class is None:
+        raise ImportError(f"No BasePlugin subclass found in {plugin_file}")
+    return plugin_class
+
+
+def overridden_hooks(plugin_class: type) -> List[str]:
+    """Hooks the class implements itself rather than inheriting the BasePlugin no-ops."""
+    return [hook for hook in HOOKS if getattr(plugin_class, hook) is not getattr(BasePlugin, hook)]
@@ -1,23 +1,107 @@
 import os
 import json
-import importlib.util
 import logging
 import sys
+import asyncio
+import contextvars
+import inspect
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as HookTimeout
 from typing import List, Dict, Any
-from .base import BasePlugin
+from api.config import Config
+from .base import BasePlugin, HOOKS
+from .isolation import ProcessPlugin
+from .loader import import_plugin_class, overridden_hooks
+from .stats import HookStats
 
 logger = logging.getLogger(__name__)
 
+# Hooks called for every streamed token: run inline in the calling thread, as a
+# thread pool hop would cost more than the hook itself. They are still timed
+# and quarantined when over budget, but cannot be abandoned mid-call.
+INLINE_HOOKS = {"on_chunk"}
+
+
+class StreamTransformer:
+    """
+    Chains the on_chunk hooks of the streaming plugins for one response.
+
+    Each chunk goes through the plugins in load order, the output of one being
+    the input of the next. At the end, flush() drains every plugin's held-back
+    text (on_stream_end) through the plugins after it.
+    """
+
+    def __init__(self, manager, names: List[str]):
+        self.manager = manager
+        self.names = names
+        self.states = {name: {} for name in names}
+
+    def _run(self, text: str, start: int = 0, stop: int = None) -> str:
+        for name in self.names[start:stop]:
+            if not text:
+                break
+            if name not in self.manager.dispatch["on_chunk"] or self.manager.is_quarantined(name):
+                continue
+            ok, result = self.manager._call(name, "on_chunk", text, self.states[name])
+            if ok:
+                text = result or ""
+        return text
+
+    def feed(self, chunk: str) -> str:
+        """Returns the text to emit for a model chunk (may be empty)."""
+        return self._run(chunk)
+
+    def flush(self) -> str:
+        """Returns the text still held back by the plugins, once the model is done."""
+        pieces = []
+        for i, name in enumerate(self.names):
+            # Text released by the plugins before this one passes through it once,
+            # piece by piece, as it would have been streamed
+            pieces = [piece for piece in (self._run(p, i, i + 1) for p in pieces) if piece]
+            if name not in self.manager.dispatch["on_stream_end"] or self.manager.is_quarantined(name):
+                continue
+            ok, result = self.manager._call(name, "on_stream_end", self.states[name])
+            if ok and result:
+                pieces.append(result)
+        return "".join(pieces)
+
 class PluginManager:
     def __init__(self, plugin_dirs: List[str], enabled_plugins: str = None):
         self.plugin_dirs = plugin_dirs
         self.enabled_plugins = enabled_plugins.split(',') if enabled_plugins else None
+        # Imported plugin instances; registered plugins are in `metadata` until first use
         self.plugins: Dict[str, BasePlugin] = {}
         self.metadata: Dict[str, Dict[str, Any]] = {}
+        # Plugin names in run order (load order, adjusted for manifest "depends_on")
+        self.order: tuple = ()
+        # hook -> names of the plugins implementing it, in run order
+        self.dispatch: Dict[str, tuple] = {hook: () for hook in HOOKS}
+        # before_prompt dispatch grouped into batches of plugins that may run concurrently
+        self.prompt_batches: tuple = ()
+        self._sources: Dict[str, str] = {}
+        self._hooks: Dict[str, List[str]] = {}
+        self._load_lock = threading.Lock()
+        # (plugin, hook) -> HookStats, created on first call
+        self.stats: Dict[tuple, HookStats] = {}
+        # plugin -> {"until": monotonic deadline or None (until released), "reason", "since"}
+        self.quarantined: Dict[str, Dict[str, Any]] = {}
+        self.timeout_ms = Config.PLUGIN_HOOK_TIMEOUT_MS
+        self._executor = None
+        # plugin -> hook calls currently running in the hook thread pool
+        self._running: Dict[str, int] = {}
+        self._loop = None
+        self._lock = threading.Lock()
 
     def load_plugins(self):
         """
-        Scans all provided plugin directories and loads valid plugins.
+        Scans all provided plugin directories and registers valid plugins.
+
+        Only manifests are read here; plugin modules are imported on first use
+        (see _load). Hooks are dispatched from per-hook lists built once: a
+        manifest may declare its hooks ("hooks": ["before_prompt", ...]), otherwise
+        the plugin is listed for every hook until it is imported and its
+        overrides are known.
         """
         # Ensure the server directory is in sys.path so plugins can import 'api'
         server_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -30,7 +114,7 @@ class PluginManager:
                 continue
 
             logger.info(f"Scanning plugins in: {plugins_dir}")
-            for folder_name in os.listdir(plugins_dir):
+            for folder_name in sorted(os.listdir(plugins_dir)):
                 if self.enabled_plugins and folder_name not in self.enabled_plugins:
                     continue
                     
@@ -47,62 +131,444 @@ class PluginManager:
                         # Load manifest
                         with open(manifest_file, 'r') as f:
                             manifest = json.load(f)
-                        
-                        # Load plugin module
-                        spec = importlib.util.spec_from_file_location(f"plugin_{folder_name}", plugin_file)
-                        module = importlib.util.module_from_spec(spec)
-                        if spec and spec.loader:
-                            spec.loader.exec_module(module)
-                        
-                        # Instantiate plugin class
-                        plugin_class = None
-                        for attr_name in dir(module):
-                            attr = getattr(module, attr_name)
-                            if (isinstance(attr, type) and 
-                                issubclass(attr, BasePlugin) and 
-                                attr is not BasePlugin):
-                                plugin_class = attr
-                                break
-                        
-                        if plugin_class:
-                            self.plugins[folder_name] = plugin_class()
-                            self.metadata[folder_name] = manifest
-                            logger.info(f"Loaded plugin: {manifest.get('name', folder_name)} from {plugins_dir}")
+
+                        declared = manifest.get("hooks")
+                        if declared is not None:
+                            unknown = set(declared) - set(HOOKS)
+                            if unknown:
+                                logger.warning(f"Plugin {folder_name} declares unknown hooks: {', '.join(sorted(unknown))}")
+                            hooks = [hook for hook in HOOKS if hook in declared]
                         else:
-                            logger.error(f"No BasePlugin subclass found in {plugin_file}")
-                            
+                            hooks = list(HOOKS)
+
+                        self.plugins.pop(folder_name, None)
+                        self.metadata[folder_name] = manifest
+                        self._sources[folder_name] = plugin_file
+                        self._hooks[folder_name] = hooks
+                        logger.info(f"Registered plugin: {manifest.get('name', folder_name)} from {plugins_dir}")
                     except Exception as e:
                         logger.error(f"Failed to load plugin {folder_name} from {plugins_dir}: {str(e)}")
 
-    def before_prompt(self, prompt: str) -> str:
-        for plugin in self.plugins.values():
+        self._rebuild_dispatch()
+
+    def _run_order(self) -> tuple:
+        """
+        Orders plugins so each runs after the plugins in its manifest's
+        "depends_on", otherwise keeping load order (stable topological sort).
+        """
+        deps = {}
+        for name, manifest in self.metadata.items():
+            deps[name] = [dep for dep in manifest.get("depends_on", []) if dep in self.metadata]
+            missing = set(manifest.get("depends_on", [])) - set(deps[name])
+            if missing:
+                logger.warning(f"Plugin {name} depends on plugins that are not loaded: {', '.join(sorted(missing))}")
+
+        order, placed = [], set()
+        pending = list(self.metadata)
+        while pending:
+            ready = [name for name in pending if all(dep in placed for dep in deps[name])]
+            if not ready:
+                logger.error(f"Circular plugin dependencies between: {', '.join(pending)}; using load order")
+                ready = pending
+            # One pass at a time keeps load order among plugins that are ready together
+            order.append(ready[0])
+            placed.add(ready[0])
+            pending.remove(ready[0])
+        return tuple(order)
+
+    def _batches(self, names: tuple) -> tuple:
+        """
+        Groups consecutive plugins declared "concurrent" in their manifests into
+        batches, unless one depends on another of the same batch. Other plugins
+        get a batch of their own, so they see the result of everything before them.
+        """
+        batches, current = [], []
+        for name in names:
+            manifest = self.metadata[name]
+            if manifest.get("concurrent") and not set(manifest.get("depends_on", [])) & set(current):
+                current.append(name)
+                continue
+            if current:
+                batches.append(tuple(current))
+                current = []
+            if manifest.get("concurrent"):
+                current.append(name)
+            else:
+                batches.append((name,))
+        if current:
+            batches.append(tuple(current))
+        return tuple(batches)
+
+    def _rebuild_dispatch(self):
+        # Replaced wholesale, so hook calls iterate a consistent snapshot without locking
+        self.order = self._run_order()
+        self.dispatch = {
+            hook: tuple(name for name in self.order if hook in self._hooks.get(name, ()))
+            for hook in HOOKS
+        }
+        self.prompt_batches = self._batches(self.dispatch["before_prompt"])
+
+    def _load(self, name: str):
+        """
+        Returns the plugin instance, importing the plugin module on first use.
+        Returns None (and unregisters the plugin) if it cannot be loaded.
+        """
+        plugin = self.plugins.get(name)
+        if plugin is not None:
+            return plugin
+        with self._load_lock:
+            plugin = self.plugins.get(name)
+            if plugin is not None:
+                return plugin
+            plugin_file = self._sources[name]
+            manifest = self.metadata[name]
             try:
-                prompt = plugin.before_prompt(prompt)
+                start = time.perf_counter()
+                if manifest.get("isolation") == "process":
+                    # Imported and run in worker processes only
+                    plugin = ProcessPlugin(
+                        name, plugin_file, manifest.get("entry_point"),
+                        workers=int(manifest.get("workers", Config.PLUGIN_PROCESS_WORKERS)),
+                        timeout=self.timeout_ms / 1000 if self.timeout_ms > 0 else None,
+                    )
+                    overridden = plugin.hooks
+                else:
+                    plugin_class = import_plugin_class(name, plugin_file, manifest.get("entry_point"))
+                    plugin = plugin_class()
+                    overridden = overridden_hooks(plugin_class)
             except Exception as e:
-                logger.error(f"Error in before_prompt hook for a plugin: {str(e)}")
+                logger.error(f"Failed to load plugin {name}: {str(e)}")
+                self._hooks[name] = []
+                self._rebuild_dispatch()
+                return None
+
+            if manifest.get("hooks") is not None:
+                undeclared = set(overridden) - set(self._hooks[name])
+                if undeclared:
+                    logger.warning(f"Plugin {name} implements hooks missing from its manifest: {', '.join(sorted(undeclared))}")
+            # Hooks left to the BasePlugin no-ops are dropped from dispatch
+            self._hooks[name] = [hook for hook in self._hooks[name] if hook in overridden]
+            self.plugins[name] = plugin
+            self._rebuild_dispatch()
+            logger.info(f"Loaded plugin: {manifest.get('name', name)} in {(time.perf_counter() - start) * 1000:.1f} ms")
+            return plugin
+
+    def load_all(self):
+        """Imports every registered plugin now instead of on first use."""
+        for name in list(self.metadata):
+            self._load(name)
+
+    def budget_ms(self, name: str, hook: str) -> float:
+        """
+        Time budget of a hook: the manifest's "budget_ms" (a number, or a
+        {hook: ms} mapping), else PLUGIN_HOOK_BUDGET_MS.
+        """
+        budget = self.metadata.get(name, {}).get("budget_ms")
+        if isinstance(budget, dict):
+            budget = budget.get(hook)
+        return float(budget) if budget is not None else Config.PLUGIN_HOOK_BUDGET_MS
+
+    def _get_stats(self, name: str, hook: str) -> HookStats:
+        stats = self.stats.get((name, hook))
+        if stats is None:
+            with self._lock:
+                stats = self.stats.setdefault((name, hook), HookStats(self.budget_ms(name, hook)))
+        return stats
+
+    def is_quarantined(self, name: str) -> bool:
+        entry = self.quarantined.get(name)
+        if entry is None:
+            return False
+        if entry["until"] is not None and time.monotonic() >= entry["until"]:
+            if self._running.get(name):
+                # A timed-out call still holds a hook thread: wait until it returns
+                return True
+            # Quarantine served: the plugin gets a fresh overrun streak
+            self.release(name)
+            return False
+        return True
+
+    def quarantine(self, name: str, reason: str):
+        seconds = Config.PLUGIN_QUARANTINE_SECONDS
+        with self._lock:
+            self.quarantined[name] = {
+                "reason": reason,
+                "since": time.time(),
+                "until": time.monotonic() + seconds if seconds > 0 else None,
+            }
+        logger.warning(f"Plugin {name} quarantined: {reason}")
+
+    def release(self, name: str) -> bool:
+        """Lifts the quarantine of a plugin. Returns False if it was not quarantined."""
+        with self._lock:
+            if self.quarantined.pop(name, None) is None:
+                return False
+            for (plugin, _), stats in self.stats.items():
+                if plugin == name:
+                    stats.consecutive_overruns = 0
+        logger.info(f"Plugin {name} released from quarantine")
+        return True
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=Config.PLUGIN_HOOK_WORKERS, thread_name_prefix="plugin-hook")
+        return self._executor
+
+    def _submit(self, name: str, func, *args):
+        """
+        Runs a sync hook in the hook thread pool, in a copy of the caller's
+        context (so hooks still see the Flask app/request).
+
+        Returns:
+        tuple: (future, started) - `started` resolves to the perf_counter() time
+        a thread picked the call up, so the hook is timed from then and not
+        from its wait in the pool queue.
+        """
+        started = Future()
+        context = contextvars.copy_context()
+
+        def run():
+            with self._lock:
+                self._running[name] = self._running.get(name, 0) + 1
+            started.set_result(time.perf_counter())
+            try:
+                return context.run(func, *args)
+            finally:
+                with self._lock:
+                    self._running[name] -= 1
+        return self.executor.submit(run), started
+
+    def _abandon(self, name: str, hook: str):
+        # The thread cannot be interrupted and stays busy until the hook returns:
+        # stop calling the plugin now, before it ties up the whole pool
+        logger.error(f"{hook} hook of plugin {name} timed out after {self.timeout_ms} ms")
+        self.quarantine(name, f"{hook} call timed out after {self.timeout_ms:g} ms")
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop running async hooks and concurrent batches, on a daemon thread."""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="plugin-loop", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def _run_async(self, coro):
+        # Scheduled from the calling thread, so the coroutine runs in a copy of its context
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def _record(self, name: str, hook: str, stats: HookStats, elapsed_ms: float, error: bool, timed_out: bool):
+        if stats.record(elapsed_ms, error=error, timed_out=timed_out):
+            if not timed_out:
+                logger.warning(f"{hook} hook of plugin {name} took {elapsed_ms:.1f} ms (budget {stats.budget_ms:g} ms)")
+            if stats.consecutive_overruns >= Config.PLUGIN_QUARANTINE_AFTER:
+                self.quarantine(name, f"{stats.consecutive_overruns} consecutive {hook} calls over budget")
+
+    async def _acall(self, name: str, hook: str, *args):
+        """
+        Coroutine version of _call, run on the plugin event loop: async hooks are
+        awaited directly, sync hooks run in the hook thread pool (timed from when
+        a thread picks them up). Used for async hooks and for concurrent batches.
+
+        Returns:
+        tuple: (ok, result) - ok is False on error or timeout.
+        """
+        plugin = self._load(name)
+        if plugin is None:
+            return False, None
+        func = getattr(plugin, hook)
+        stats = self._get_stats(name, hook)
+        ok, result, error, timed_out = False, None, False, False
+        timeout = self.timeout_ms / 1000 if self.timeout_ms > 0 and not isinstance(plugin, ProcessPlugin) else None
+        pooled = not inspect.iscoroutinefunction(func)
+        # Only a pooled call cut off by our own timeout leaves a busy thread behind
+        stranded = pooled and timeout is not None
+        start = time.perf_counter()
+        try:
+            if pooled:
+                future, started = self._submit(name, func, *args)
+                try:
+                    # Shielded: cancelling the wait must not cancel `started` itself
+                    start = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(started)), timeout)
+                except asyncio.TimeoutError:
+                    if future.cancel():
+                        logger.warning(f"No free hook thread for {hook} of plugin {name}, call skipped")
+                        return False, None
+                    start = started.result()
+                awaitable = asyncio.wrap_future(future)
+                if timeout is not None:
+                    timeout = max(0.0, timeout - (time.perf_counter() - start))
+            else:
+                awaitable = func(*args)
+            result = await asyncio.wait_for(awaitable, timeout)
+            ok = True
+        except (asyncio.TimeoutError, HookTimeout):
+            timed_out = True
+            if stranded:
+                self._abandon(name, hook)
+            else:
+                logger.error(f"{hook} hook of plugin {name} timed out after {self.timeout_ms} ms")
+        except Exception as e:
+            error = True
+            logger.error(f"Error in {hook} hook for plugin {name}: {str(e)}")
+        self._record(name, hook, stats, (time.perf_counter() - start) * 1000, error, timed_out)
+        return ok, result
+
+    def _call(self, name: str, hook: str, *args):
+        """
+        Runs one plugin hook under its time budget.
+
+        With PLUGIN_HOOK_TIMEOUT_MS > 0 the hook runs in the hook thread pool and
+        the caller stops waiting once it has run for the timeout; the hook's
+        result is then discarded and the plugin quarantined (the thread cannot be
+        interrupted and finishes on its own). INLINE_HOOKS always run inline.
+
+        Returns:
+        tuple: (ok, result) - ok is False on error or timeout.
+        """
+        plugin = self._load(name)
+        if plugin is None:
+            return False, None
+        func = getattr(plugin, hook)
+        if inspect.iscoroutinefunction(func):
+            return self._run_async(self._acall(name, hook, *args))
+        stats = self._get_stats(name, hook)
+        ok, result, error, timed_out = False, None, False, False
+        # Process plugins enforce the timeout themselves (and can kill the worker)
+        pooled = self.timeout_ms > 0 and hook not in INLINE_HOOKS and not isinstance(plugin, ProcessPlugin)
+        start = time.perf_counter()
+        try:
+            if pooled:
+                timeout = self.timeout_ms / 1000
+                future, started = self._submit(name, func, *args)
+                try:
+                    start = started.result(timeout)
+                except HookTimeout:
+                    if future.cancel():
+                        logger.warning(f"No free hook thread for {hook} of plugin {name}, call skipped")
+                        return False, None
+                    start = started.result()
+                result = future.result(max(0.0, timeout - (time.perf_counter() - start)))
+            else:
+                result = func(*args)
+            ok = True
+        except HookTimeout:
+            timed_out = True
+            if pooled:
+                self._abandon(name, hook)
+            else:
+                logger.error(f"{hook} hook of plugin {name} timed out after {self.timeout_ms} ms")
+        except Exception as e:
+            error = True
+            logger.error(f"Error in {hook} hook for plugin {name}: {str(e)}")
+        self._record(name, hook, stats, (time.perf_counter() - start) * 1000, error, timed_out)
+        return ok, result
+
+    def _active_plugins(self, hook: str):
+        return [name for name in self.dispatch[hook] if not self.is_quarantined(name)]
+
+    def before_prompt(self, prompt: str) -> str:
+        for batch in self.prompt_batches:
+            names = [name for name in batch if not self.is_quarantined(name)]
+            if len(names) == 1:
+                ok, result = self._call(names[0], "before_prompt", prompt)
+                if ok:
+                    prompt = result
+            elif names:
+                # Import outside the event loop, so a first-time import does not stall it
+                for name in names:
+                    self._load(name)
+                prompt = self._run_async(self._enrich_concurrently(names, prompt))
         return prompt
 
+    async def _enrich_concurrently(self, names: List[str], prompt: str) -> str:
+        """
+        Runs a batch of concurrent before_prompt hooks on the same prompt and
+        merges their results deterministically.
+
+        Concurrent plugins are expected to enrich the prompt, i.e. to return it
+        with text added before and/or after. The additions are combined as if the
+        plugins had run one after another in batch order: prefixes of later
+        plugins go first, suffixes of later plugins go last. A plugin that
+        rewrites the prompt instead is run again, in sequence, on the merged result.
+        """
+        results = await asyncio.gather(*(self._acall(name, "before_prompt", prompt) for name in names))
+        prefixes, suffixes, rewrites = [], [], []
+        for name, (ok, result) in zip(names, results):
+            if not ok or result == prompt:
+                continue
+            position = result.find(prompt) if isinstance(result, str) else -1
+            if position < 0:
+                rewrites.append(name)
+                continue
+            prefixes.append(result[:position])
+            suffixes.append(result[position + len(prompt):])
+
+        merged = "".join(reversed(prefixes)) + prompt + "".join(suffixes)
+        for name in rewrites:
+            logger.warning(f"Concurrent plugin {name} rewrote the prompt instead of enriching it, running it in sequence")
+            ok, result = await self._acall(name, "before_prompt", merged)
+            if ok:
+                merged = result
+        return merged
+
     def after_response(self, response: str) -> str:
-        for plugin in self.plugins.values():
-            try:
-                response = plugin.after_response(response)
-            except Exception as e:
-                logger.error(f"Error in after_response hook for a plugin: {str(e)}")
+        for name in self._active_plugins("after_response"):
+            ok, result = self._call(name, "after_response", response)
+            if ok:
+                response = result
         return response
 
+    def stream_transformer(self):
+        """
+        Returns a StreamTransformer for a new streamed response, or None when
+        no loaded plugin overrides on_chunk/on_stream_end.
+        """
+        streaming = set(self.dispatch["on_chunk"]) | set(self.dispatch["on_stream_end"])
+        if not streaming:
+            return None
+        return StreamTransformer(self, [name for name in self.order if name in streaming])
+
     def on_session_start(self):
-        for plugin in self.plugins.values():
-            try:
-                plugin.on_session_start()
-            except Exception as e:
-                logger.error(f"Error in on_session_start hook for a plugin: {str(e)}")
+        for name in self._active_plugins("on_session_start"):
+            self._call(name, "on_session_start")
 
     def on_session_end(self):
-        for plugin in self.plugins.values():
-            try:
-                plugin.on_session_end()
-            except Exception as e:
-                logger.error(f"Error in on_session_end hook for a plugin: {str(e)}")
+        for name in self._active_plugins("on_session_end"):
+            self._call(name, "on_session_end")
+
+    def report(self) -> list:
+        """
+        Per-plugin cost report: hook latency histograms, budget overruns and
+        quarantine state.
+        """
+        report = []
+        for name in self.metadata:
+            quarantine = None
+            if self.is_quarantined(name):
+                entry = self.quarantined[name]
+                quarantine = {
+                    "reason": entry["reason"],
+                    "since": entry["since"],
+                    "remaining_seconds": round(entry["until"] - time.monotonic(), 1) if entry["until"] else None,
+                }
+            report.append({
+                "name": name,
+                "display_name": self.metadata.get(name, {}).get("name", name),
+                "version": self.metadata.get(name, {}).get("version"),
+                "loaded": name in self.plugins,
+                "workers": self.plugins[name].describe() if isinstance(self.plugins.get(name), ProcessPlugin) else None,
+                "hooks_dispatched": [hook for hook in HOOKS if name in self.dispatch[hook]],
+                "quarantined": quarantine,
+                "hooks": {hook: stats.to_dict() for (plugin, hook), stats in list(self.stats.items()) if plugin == name},
+            })
+        return report
 
 # Global instance of PluginManager
 plugin_manager = None
@@ -0,0 +1,80 @@
+import bisect
+import threading
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class HookStats:
+    """
+    Latency histogram and budget accounting for one hook of one plugin.
+    """
+
+    def __init__(self, budget_ms: float):
+        self.budget_ms = budget_ms
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.errors = 0
+        self.overruns = 0
+        self.timeouts = 0
+        # Overruns in a row; reset by any call that stays within budget
+        self.consecutive_overruns = 0
+        self._lock = threading.Lock()
+
+    def record(self, elapsed_ms: float, error: bool = False, timed_out: bool = False) -> bool:
+        """
+        Records one call.
+
+        Returns:
+        bool: True if the call exceeded the budget.
+        """
+        over = timed_out or elapsed_ms > self.budget_ms
+        with self._lock:
+            self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+            self.calls += 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+            self.errors += error
+            self.timeouts += timed_out
+            if over:
+                self.overruns += 1
+                self.consecutive_overruns += 1
+            else:
+                self.consecutive_overruns = 0
+        return over
+
+    def percentile(self, q: float) -> float:
+        """Upper bound (ms) of the bucket holding the q-th percentile (None if open-ended or no calls)."""
+        with self._lock:
+            if not self.calls:
+                return None
+            rank = q * self.calls
+            seen = 0
+            for i, count in enumerate(self.buckets):
+                seen += count
+                if seen >= rank:
+                    return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else None
+        return None
+
+    def to_dict(self) -> dict:
+        p50, p95, p99 = self.percentile(0.5), self.percentile(0.95), self.percentile(0.99)
+        with self._lock:
+            return {
+                "budget_ms": self.budget_ms,
+                "calls": self.calls,
+                "errors": self.errors,
+                "overruns": self.overruns,
+                "timeouts": self.timeouts,
+                "consecutive_overruns": self.consecutive_overruns,
+                "avg_ms": round(self.total_ms / self.calls, 3) if self.calls else None,
+                "max_ms": round(self.max_ms, 3),
+                "p50_ms": p50,
+                "p95_ms": p95,
+                "p99_ms": p99,
+                "histogram": {
+                    **{f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)},
+                    "le_inf": self.buckets[-1],
+                },
+            }
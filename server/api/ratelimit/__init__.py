@@ -0,0 +1,3 @@
+from .limiter import RateLimiter, init_rate_limiter, rate_limit, get_client_ip
+from .algorithms import TokenBucket, SlidingWindow
+from .stores import MemoryStore, MongoStore
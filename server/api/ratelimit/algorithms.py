@@ -0,0 +1,100 @@
+import math
+from typing import Optional, Tuple
+
+
+def parse_rate(spec: str) -> Tuple[int, float]:
+    """
+    Parses a rate specification such as "20/60" (20 requests per 60 seconds).
+
+    Args:
+    spec (str): "<requests>/<seconds>".
+
+    Returns:
+    tuple: (requests, seconds)
+    """
+    requests, seconds = spec.split("/", 1)
+    return int(requests), float(seconds)
+
+
+class TokenBucket:
+    """
+    Token bucket: allows bursts of up to `limit` requests, refilled continuously
+    at `limit / period` tokens per second.
+
+    State: {"t": tokens, "ts": last_refill_time}
+    """
+    name = "token_bucket"
+
+    def __init__(self, limit: int, period: float):
+        self.limit = limit
+        self.period = period
+        self.refill_rate = limit / period
+        # After a full period the bucket is full again, i.e. equivalent to no state
+        self.ttl = period
+
+    def apply(self, state: Optional[dict], now: float):
+        """
+        Consumes one token.
+
+        Returns:
+        tuple: (new_state, allowed, retry_after_seconds)
+        """
+        if state is None:
+            tokens = float(self.limit)
+        else:
+            tokens = min(float(self.limit), state["t"] + (now - state["ts"]) * self.refill_rate)
+
+        if tokens >= 1:
+            return {"t": tokens - 1, "ts": now}, True, 0.0
+        return {"t": tokens, "ts": now}, False, (1 - tokens) / self.refill_rate
+
+
+class SlidingWindow:
+    """
+    Sliding window counter: approximates a true sliding log with two fixed
+    windows, weighting the previous window by how much of it still overlaps.
+
+    State: {"w": window_index, "c": current_count, "p": previous_count}
+    """
+    name = "sliding_window"
+
+    def __init__(self, limit: int, period: float):
+        self.limit = limit
+        self.period = period
+        # The previous window stops mattering two periods later
+        self.ttl = period * 2
+
+    def apply(self, state: Optional[dict], now: float):
+        """
+        Counts one request.
+
+        Returns:
+        tuple: (new_state, allowed, retry_after_seconds)
+        """
+        window = math.floor(now / self.period)
+        elapsed = now - window * self.period
+
+        if state is None or state["w"] < window - 1:
+            current, previous = 0, 0
+        elif state["w"] == window - 1:
+            current, previous = 0, state["c"]
+        else:
+            current, previous = state["c"], state["p"]
+
+        estimate = previous * (1 - elapsed / self.period) + current
+        if estimate + 1 <= self.limit:
+            return {"w": window, "c": current + 1, "p": previous}, True, 0.0
+
+        if current + 1 > self.limit or previous == 0:
+            retry_after = self.period - elapsed
+        else:
+            # Wait until the previous window's weight has decayed enough
+            needed = self.period * (1 - (self.limit - 1 - current) / previous)
+            retry_after = max(0.0, needed - elapsed)
+        return {"w": window, "c": current, "p": previous}, False, retry_after
+
+
+ALGORITHMS = {
+    TokenBucket.name: TokenBucket,
+    SlidingWindow.name: SlidingWindow,
+}
@@ -0,0 +1,102 @@
+import logging
+import time
+from functools import wraps
+from typing import Dict
+from flask import request, jsonify
+from .algorithms import ALGORITHMS, parse_rate
+from .stores import MemoryStore, MongoStore
+
+logger = logging.getLogger(__name__)
+
+
+def get_client_ip():
+    """
+    Get client IP address from request. X-Forwarded-For is not read here: it
+    is client-supplied, so anyone could pick a new rate limit key per request.
+    Behind a reverse proxy, set TRUSTED_PROXY_HOPS so that remote_addr is
+    taken from the entries the proxies appended (see create_app()).
+    """
+    return request.remote_addr or '127.0.0.1'
+
+
+class RateLimiter:
+    """
+    Applies named rate-limit rules against a pluggable store.
+
+    A rule couples an algorithm (token bucket or sliding window) with its limit,
+    e.g. {"chat": {"algorithm": "token_bucket", "rate": "20/60"}}.
+    """
+
+    def __init__(self, store, rules: Dict[str, Dict[str, str]], enabled: bool = True):
+        self.store = store
+        self.enabled = enabled
+        self.rules = {}
+        for name, rule in rules.items():
+            limit, period = parse_rate(rule["rate"])
+            self.rules[name] = ALGORITHMS[rule.get("algorithm", "sliding_window")](limit, period)
+
+    def hit(self, rule_name, identity):
+        """
+        Records one request for `identity` under the given rule.
+
+        Returns:
+        tuple: (allowed, retry_after_seconds)
+        """
+        algorithm = self.rules.get(rule_name)
+        if not self.enabled or algorithm is None:
+            return True, 0.0
+        try:
+            return self.store.update(f"{rule_name}:{identity}", algorithm, time.time())
+        except Exception as e:
+            # A broken backend must not take the API down with it
+            logger.error(f"Rate limit store error for rule {rule_name}: {str(e)}")
+            return True, 0.0
+
+
+# Global instance of RateLimiter
+rate_limiter = None
+
+
+def init_rate_limiter(config, collection_getter=None):
+    """
+    Builds the global RateLimiter from the app configuration.
+
+    Args:
+    config: Flask config mapping.
+    collection_getter (callable): Returns the Mongo collection for the shared backend.
+    """
+    global rate_limiter
+    if config.get("RATE_LIMIT_BACKEND") == "mongo" and collection_getter:
+        store = MongoStore(collection_getter)
+    else:
+        store = MemoryStore(shards=config.get("RATE_LIMIT_SHARDS", 16))
+    rate_limiter = RateLimiter(store, config.get("RATE_LIMITS", {}), config.get("RATE_LIMIT_ENABLED", True))
+    return rate_limiter
+
+
+def rate_limit(rule_name, key_func=get_client_ip):
+    """
+    Route decorator enforcing a named rule. Rejected requests get a 429 with a
+    Retry-After header. CORS preflight requests are never counted.
+
+    Args:
+    rule_name (str): Key of the rule in Config.RATE_LIMITS.
+    key_func (callable): Returns the identity to limit (client IP by default).
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if rate_limiter is None or request.method == "OPTIONS":
+                return f(*args, **kwargs)
+            allowed, retry_after = rate_limiter.hit(rule_name, key_func())
+            if not allowed:
+                response = jsonify({
+                    'message': 'Too many requests. Please try again later.',
+                    'error': 'rate_limit_exceeded'
+                })
+                response.status_code = 429
+                response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+                return response
+            return f(*args, **kwargs)
+        return wrapper
+    return decorator
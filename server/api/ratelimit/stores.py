@@ -0,0 +1,107 @@
+import datetime
+import logging
+import threading
+import zlib
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryStore:
+    """
+    Process-local store split into independently locked shards.
+
+    Entries expire lazily: a stale entry is ignored when its key is next touched,
+    and each write evicts a couple of expired entries from the front of its shard
+    (least recently written first), so cleanup stays O(1) amortized per check.
+    """
+
+    EVICT_PER_WRITE = 2
+
+    def __init__(self, shards: int = 16, max_keys_per_shard: int = 10000):
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+        self.max_keys_per_shard = max_keys_per_shard
+
+    def _shard(self, key):
+        return self._shards[zlib.crc32(key.encode("utf-8")) % len(self._shards)]
+
+    def update(self, key, algorithm, now):
+        """
+        Atomically applies `algorithm` to the state stored under `key`.
+
+        Returns:
+        tuple: (allowed, retry_after_seconds)
+        """
+        lock, entries = self._shard(key)
+        with lock:
+            entry = entries.get(key)
+            state = entry[0] if entry and entry[1] > now else None
+            new_state, allowed, retry_after = algorithm.apply(state, now)
+            entries[key] = (new_state, now + algorithm.ttl)
+            entries.move_to_end(key)
+
+            for _ in range(self.EVICT_PER_WRITE):
+                oldest_key, (_, expires_at) = next(iter(entries.items()))
+                if expires_at > now and len(entries) <= self.max_keys_per_shard:
+                    break
+                del entries[oldest_key]
+        return allowed, retry_after
+
+
+class MongoStore:
+    """
+    Store shared by all workers, backed by a MongoDB collection.
+
+    Each key is a single document updated with optimistic concurrency (a version
+    compare-and-set), so every check is a constant number of indexed operations.
+    A TTL index on `expires_at` removes idle keys in the background.
+    """
+
+    MAX_RETRIES = 5
+
+    def __init__(self, collection_getter):
+        # Resolved lazily: the Mongo client only exists once the app is initialized
+        self._collection_getter = collection_getter
+        self._index_ready = False
+
+    def _collection(self):
+        collection = self._collection_getter()
+        if not self._index_ready:
+            collection.create_index("expires_at", expireAfterSeconds=0)
+            self._index_ready = True
+        return collection
+
+    def update(self, key, algorithm, now):
+        """
+        Atomically applies `algorithm` to the state stored under `key`.
+
+        Returns:
+        tuple: (allowed, retry_after_seconds)
+        """
+        from pymongo.errors import DuplicateKeyError
+
+        collection = self._collection()
+        expires_at = datetime.datetime.utcfromtimestamp(now + algorithm.ttl)
+        for _ in range(self.MAX_RETRIES):
+            doc = collection.find_one({"_id": key})
+            stale = doc is None or doc["expires_at"] <= datetime.datetime.utcfromtimestamp(now)
+            state = None if stale else doc["s"]
+            new_state, allowed, retry_after = algorithm.apply(state, now)
+
+            if doc is None:
+                try:
+                    collection.insert_one({"_id": key, "s": new_state, "v": 1, "expires_at": expires_at})
+                    return allowed, retry_after
+                except DuplicateKeyError:
+                    continue
+
+            result = collection.update_one(
+                {"_id": key, "v": doc["v"]},
+                {"$set": {"s": new_state, "expires_at": expires_at}, "$inc": {"v": 1}}
+            )
+            if result.matched_count:
+                return allowed, retry_after
+
+        # Heavy contention on a single key: err on the side of limiting
+        logger.warning(f"Rate limit state for {key} kept changing, rejecting request")
+        return False, 1.0
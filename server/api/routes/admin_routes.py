@@ -0,0 +1,113 @@
+from flask import Blueprint, request, jsonify, current_app
+from functools import wraps
+from datetime import datetime, timedelta
+import hmac
+import api
+from api.services.inference_stats import model_performance, GRANULARITIES
+from api.services.ollama_pool import get_ollama_pool
+
+admin_bp = Blueprint('admin', __name__)
+
+
+def require_admin(f):
+    """
+    Restricts a route to callers presenting ADMIN_TOKEN, either as
+    `Authorization: Bearer <token>` or in the `X-Admin-Token` header.
+    The admin API is disabled (404) when ADMIN_TOKEN is not set.
+    """
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        expected = current_app.config.get('ADMIN_TOKEN')
+        if not expected:
+            return jsonify({'message': 'Admin API is disabled'}), 404
+
+        token = request.headers.get('X-Admin-Token', '')
+        auth_header = request.headers.get('Authorization', '')
+        if not token and auth_header.startswith('Bearer '):
+            token = auth_header.split(' ', 1)[1]
+        if not hmac.compare_digest(token.encode('utf-8'), expected.encode('utf-8')):
+            return jsonify({'message': 'Invalid admin token'}), 403
+        return f(*args, **kwargs)
+    return wrapper
+
+
+@admin_bp.route('/admin/plugins', methods=['GET'])
+@require_admin
+def plugin_report():
+    """
+    Reports the cost of each loaded plugin.
+
+    Returns:
+    JSON: Per-plugin hook latency histograms (calls, avg/max/p50/p95/p99 ms),
+          budget overruns, timeouts, errors and quarantine state.
+    """
+    manager = api.plugin_manager
+    if manager is None:
+        return jsonify({'plugins': []}), 200
+    return jsonify({
+        'plugins': manager.report(),
+        'timeout_ms': manager.timeout_ms,
+    }), 200
+
+
+@admin_bp.route('/admin/plugins/<name>/release', methods=['POST'])
+@require_admin
+def release_plugin(name):
+    """
+    Lifts the quarantine of a plugin.
+
+    Returns:
+    HTTP 200: If the plugin was released
+    HTTP 404: If the plugin is not loaded or not quarantined
+    """
+    manager = api.plugin_manager
+    if manager is None or name not in manager.metadata:
+        return jsonify({'message': 'Plugin not found'}), 404
+    if not manager.release(name):
+        return jsonify({'message': 'Plugin is not quarantined'}), 404
+    return jsonify({'message': f'Plugin {name} released'}), 200
+
+
+@admin_bp.route('/admin/ollama', methods=['GET'])
+@require_admin
+def ollama_nodes():
+    """
+    Reports the state of each Ollama node used for local models.
+
+    Returns:
+    JSON: Per-node health, ejection time left, requests in flight, and
+          installed/loaded models as of the last catalog refresh.
+    """
+    return jsonify({'nodes': get_ollama_pool().describe()}), 200
+
+
+@admin_bp.route('/admin/analytics/models', methods=['GET'])
+@require_admin
+def model_analytics():
+    """
+    Per-model inference performance, aggregated from the hourly stats rollups.
+
+    Query params:
+    since, until (ISO 8601): Time range (default: the last 24 hours).
+    granularity (str): "hour" (default), "day" or "total".
+    model (str): Restrict to one model.
+
+    Returns:
+    JSON: One row per model and time bucket with message counts, fallback rate and
+          avg/p50/p95/p99 of latency, time to first token and tokens/sec.
+    """
+    granularity = request.args.get('granularity', 'hour')
+    if granularity not in GRANULARITIES:
+        return jsonify({'message': f'granularity must be one of {", ".join(GRANULARITIES)}'}), 400
+    try:
+        until = datetime.fromisoformat(request.args['until']) if request.args.get('until') else datetime.now()
+        since = datetime.fromisoformat(request.args['since']) if request.args.get('since') else until - timedelta(hours=24)
+    except ValueError:
+        return jsonify({'message': 'since and until must be ISO 8601 dates'}), 400
+
+    return jsonify({
+        'since': since.isoformat(),
+        'until': until.isoformat(),
+        'granularity': granularity,
+        'models': model_performance(since, until, granularity, request.args.get('model')),
+    }), 200
@@ -3,6 +3,7 @@ from api import mongo, bcrypt
 import jwt
 import datetime
 from bson import ObjectId
+from api.ratelimit import rate_limit
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -66,6 +67,7 @@ def register():
     return jsonify({'message': 'User registered successfully'}), 201
 
 @auth_bp.route('/api/login', methods=['POST'])
+@rate_limit('login')
 def login():
     """
     Authenticates a user with email and password.
@@ -1,12 +1,25 @@
-from flask import Blueprint, request, jsonify, Response, current_app
-import requests
+from flask import Blueprint, request, jsonify, Response, current_app, after_this_request
 from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
-from api import gemini_model, mongo, plugin_manager
+from werkzeug.exceptions import RequestEntityTooLarge
+from api import mongo, plugin_manager
 from bson import ObjectId
-from api.utils.file_utils import allowed_file, extract_text_from_pdf_bytes
+from api.utils.file_utils import allowed_file
+from api.utils.image_utils import is_processable_image
+from api.utils.upload_utils import SpooledUpload, UploadTooLarge
+from api.utils.drain import should_stop_streams
+from api.utils.message_codec import encode_message, decode_message, message_content
+from api.services.attachment_store import get_attachment_store
+from api.services.gemini_services import get_gemini_model, get_gemini_provider, upload_gemini_file
+from api.services.ollama_pool import get_ollama_pool
+from api.services.message_search import search_messages, MAX_QUERY_CHARS
+from api.services.session_transfer import export_lines, gzip_stream, open_import_stream, import_sessions, SessionImportError
+from api.services.inference_stats import ollama_token_stats, gemini_token_stats, build_message_stats, record_rollup
+from api.utils.http_cache import make_etag, etag_matches, not_modified, cached_json
+from api.ratelimit import rate_limit
+from api.metrics import record_ttft, record_ollama_stats, record_fallback, track_stream
 import json
-import google.generativeai as genai
+import time
 from api.config import Config
 import jwt
 from functools import wraps
@@ -56,9 +69,279 @@ def has_reached_message_limit(session_id):
     
     return user_msg_count >= limit
 
-def save_and_return(session_id, session_name, model_name, user_msg, bot_reply, uploaded_file, file_bytes, user_id=None):
+def with_revision(update):
     """
-    Saves conversation with file info and returns response JSON.
+    Stamps a session update with a fresh revision (version counter + updated_at),
+    so readers can build cheap validators without loading the messages.
+
+    Args:
+    update (dict): MongoDB update document.
+
+    Returns:
+    dict: The same update document with revision fields merged in.
+    """
+    update.setdefault("$set", {})["updated_at"] = datetime.now()
+    update.setdefault("$inc", {})["version"] = 1
+    return update
+
+# Projection used to validate cached session reads without fetching message bodies
+SESSION_REVISION_PROJECTION = {"version": 1, "updated_at": 1}
+
+def session_etag_parts(session):
+    """
+    Returns the values identifying the current revision of a session document.
+    Works on both full documents and SESSION_REVISION_PROJECTION results; every
+    write goes through with_revision(), so the version changes with the content.
+    """
+    return (
+        str(session["_id"]),
+        session.get("version", 0),
+        session.get("updated_at", ""),
+    )
+
+def readable_sessions_query(user_id, session_ids):
+    """
+    Returns the MongoDB filter for the sessions a caller may read: a logged-in
+    user's own sessions, or for guests the requested sessions that belong to
+    no user. None if a logged-in user has no sessions.
+
+    Args:
+    user_id (str): Caller from validate_user(), or None for guests.
+    session_ids (list): Session IDs requested by a guest (ignored for users).
+
+    Raises:
+    bson.errors.InvalidId: A guest session ID is malformed.
+    """
+    if user_id:
+        # If logged in, fetch sessions from user's list
+        user = mongo.db.users.find_one({"_id": ObjectId(user_id)}, {"chat_sessions": 1})
+        if not user or "chat_sessions" not in user:
+            return None
+        return {"_id": {"$in": [ObjectId(sid) for sid in user["chat_sessions"] if ObjectId.is_valid(sid)]}}
+
+    # If not logged in, fetch only the requested IDs that DO NOT have a user_id
+    # This prevents guests from peeking at user sessions even if they guess an ID
+    return {
+        "_id": {"$in": [ObjectId(sid) for sid in session_ids]},
+        "user_id": None # Strict check: guest can only see guest chats
+    }
+
+def serialize_session(session):
+    """
+    Returns a JSON-ready copy of a session document: ObjectIds become strings
+    and datetimes ISO strings. The document itself is left unchanged.
+    """
+    result = dict(session)
+    result["_id"] = str(session["_id"])
+    if "user_id" in session:
+        result["user_id"] = str(session["user_id"])
+    if "updated_at" in session:
+        result["updated_at"] = session["updated_at"].isoformat()
+    if "messages" in session:
+        messages = session["messages"]
+        if any("content_codec" in msg for msg in messages):
+            messages = [decode_message(msg) for msg in messages]
+        result["messages"] = [
+            {**msg, "timestamp": msg["timestamp"].isoformat()} if hasattr(msg.get("timestamp"), "isoformat") else msg
+            for msg in messages
+        ]
+    return result
+
+def mention_context(session_ids):
+    """
+    Builds the conversation context of the mentioned sessions, in mention order,
+    with a single query that only loads message roles and contents.
+
+    Args:
+    session_ids (list): Session IDs from the `mention_session_ids[]` form field.
+
+    Returns:
+    str: One "role: content" line per message (empty if nothing was found).
+    """
+    object_ids = [ObjectId(sid) for sid in session_ids if ObjectId.is_valid(sid)]
+    if not object_ids:
+        return ""
+    sessions = {
+        s["_id"]: s.get("messages", [])
+        for s in mongo.db.sessions.find(
+            {"_id": {"$in": object_ids}},
+            {"messages.role": 1, "messages.content": 1, "messages.content_codec": 1},
+        )
+    }
+    return "".join(
+        f"{m['role']}: {message_content(m)}\n"
+        for oid in object_ids
+        for m in sessions.get(oid, ())
+    )
+
+def build_prompt(user_msg, history_context):
+    """Prefixes the user's message with the context of mentioned sessions, if any."""
+    if not history_context:
+        return user_msg
+    return (
+        f"Here is some previous conversation context that you should consider:\n"
+        f"{history_context}\n\n"
+        f"Now, based on the above context, here is the user's new message:\n"
+        f"{user_msg}"
+    )
+
+def sse_event(payload):
+    """Encodes one server-sent event carrying a JSON payload."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+_encode_json_string = json.encoder.encode_basestring_ascii
+
+def sse_chunk(text):
+    """
+    Encodes a streamed text chunk; byte-identical to sse_event({'type': 'chunk', 'text': text})
+    but skips the generic encoder, since this runs once per token batch.
+    """
+    return f'data: {{"type": "chunk", "text": {_encode_json_string(text)}}}\n\n'
+
+def close_after_request(resource):
+    """
+    Schedules resource.close() (e.g. temp file removal) for when the response
+    has been built. File work finishes before streaming starts, so this is safe
+    for SSE responses too.
+    """
+    @after_this_request
+    def cleanup(response):
+        resource.close()
+        return response
+
+def spool_upload(uploaded_file):
+    """
+    Copies an uploaded file into a size-capped SpooledUpload (memory below the
+    spool threshold, temp file above) and schedules its cleanup for the end of
+    the request.
+
+    Returns:
+    SpooledUpload: The spooled file.
+    """
+    upload = SpooledUpload(
+        uploaded_file,
+        current_app.config["MAX_UPLOAD_SIZE"],
+        current_app.config["UPLOAD_SPOOL_THRESHOLD"],
+    )
+    close_after_request(upload)
+    return upload
+
+def gemini_media_part(upload):
+    """
+    Builds the Gemini content part for an uploaded media file. Images are
+    downscaled and stripped of metadata first; other small files are sent
+    inline and larger ones are streamed from disk through the File API.
+    """
+    if is_processable_image(upload.extension):
+        try:
+            data, mime_type = get_attachment_store().get_image(upload)
+            return {"mime_type": mime_type, "data": data}
+        except Exception as e:
+            # Undecodable image: let Gemini judge the original bytes
+            print(f"Image pre-processing failed for {upload.filename}:", e)
+
+    mime_type = upload.mimetype or "image/jpeg"
+    if upload.in_memory or upload.size <= current_app.config["GEMINI_INLINE_MAX_BYTES"]:
+        return {"mime_type": mime_type, "data": upload.read_bytes()}
+    return upload_gemini_file(upload.path, mime_type)
+
+def session_attachments(session_id):
+    """
+    Lists the attachments referenced by a session's messages, oldest first.
+
+    Returns:
+    list: Distinct `uploaded_file` entries that carry a content hash.
+    """
+    if session_id == "1" or not ObjectId.is_valid(session_id):
+        return []
+    session = mongo.db.sessions.find_one({"_id": ObjectId(session_id)}, {"messages.uploaded_file": 1})
+    attachments = {}
+    for m in (session or {}).get("messages", []):
+        info = m.get("uploaded_file") or {}
+        if info.get("sha256"):
+            attachments.setdefault(info["sha256"], info)
+    return list(attachments.values())
+
+def resolve_attachments(session_id, uploaded_file, attachment_ids, user_msg):
+    """
+    Collects the files the model should see for this turn.
+
+    A new upload is stored once by content hash. Without an upload, the PDFs
+    already attached to the session are reused (their extracted text comes from
+    the attachment store, so they are not opened or parsed again);
+    `attachment_ids` can name specific session attachments instead, including
+    images.
+
+    Returns:
+    tuple: (document_context, media, file_info, cache_hit) where document_context
+    is the retrieved PDF text, media the attachments to send as Gemini media parts,
+    file_info the `uploaded_file` entry for the user message (or None), and
+    cache_hit whether every document's text was already stored (None without documents).
+    """
+    store = get_attachment_store()
+    documents = []
+    media = []
+    file_info = None
+    cache_hit = None
+
+    def record_cache(stored):
+        nonlocal cache_hit
+        cache_hit = stored if cache_hit is None else cache_hit and stored
+
+    def document_text(attachment):
+        record_cache(store.has_derived(attachment.sha256, "text"))
+        return store.get_text(attachment)
+
+    if uploaded_file:
+        upload = spool_upload(uploaded_file)
+        sha256 = store.put(upload)
+        file_info = {
+            "name": upload.filename,
+            "type": upload.mimetype,
+            "size": upload.size,
+            "sha256": sha256,
+        }
+        if upload.extension == "pdf":
+            documents.append((sha256, document_text(upload)))
+        else:
+            media.append(upload)
+    else:
+        referenced = session_attachments(session_id)
+        if attachment_ids:
+            referenced = [a for a in referenced if a["sha256"] in attachment_ids]
+        else:
+            referenced = [a for a in referenced if a.get("name", "").lower().endswith(".pdf")]
+        for info in referenced:
+            if info.get("name", "").lower().endswith(".pdf"):
+                # Text already extracted: the original is not needed
+                text = store.get_derived(info["sha256"], "text")
+                if text is not None:
+                    record_cache(True)
+                    documents.append((info["sha256"], text.decode("utf-8")))
+                    continue
+            attachment = store.open(info["sha256"])
+            if attachment is None:
+                continue
+            close_after_request(attachment)
+            if attachment.extension == "pdf":
+                documents.append((attachment.sha256, document_text(attachment)))
+            else:
+                media.append(attachment)
+
+    # Only the parts relevant to the question, within the token budget
+    # (imported here: the retrieval stack loads NumPy, which is not needed at startup)
+    document_context = ""
+    if documents:
+        from api.services.document_index import retrieve_document_context
+        document_context = retrieve_document_context(documents, user_msg)
+    return document_context, media, file_info, cache_hit
+
+def save_and_return(session_id, session_name, model_name, user_msg, bot_reply, file_info=None, user_id=None, stats=None,
+                    generated=True):
+    """
+    Saves conversation with file info and inference stats and returns response JSON.
+    The stats only count towards the inference rollups if the model `generated`
+    the reply (not for placeholder replies such as "No reply.").
     
     Returns:
     JSON: Chat response and metadata.
@@ -68,11 +351,6 @@ def save_and_return(session_id, session_name, model_name, user_msg, bot_reply, u
             "role": "user",
             "content": user_msg,
             "timestamp": datetime.now() - timedelta(seconds=10),
-            "uploaded_file": {
-                "name": uploaded_file.filename,
-                "type": uploaded_file.mimetype,
-                "size": len(file_bytes),
-            },
         },
         {
             "role": "bot",
@@ -81,21 +359,30 @@ def save_and_return(session_id, session_name, model_name, user_msg, bot_reply, u
             "model_name": model_name,
         }
     ]
+    if file_info:
+        messages[0]["uploaded_file"] = file_info
+    if stats:
+        messages[1]["stats"] = stats
+        if generated:
+            record_rollup(model_name, stats, messages[1]["timestamp"])
+    messages = [encode_message(m) for m in messages]
 
     if session_id != "1":
         mongo.db.sessions.update_one(
             {"_id": ObjectId(session_id)},
-            {
+            with_revision({
                 "$push": {"messages": {"$each": messages}},
                 "$set": {"session_name": session_name or "How can I help you?"}
-            },
+            }),
         )
     else:
         session_doc = {
             "messages": messages,
             "created_at": datetime.now(),
             "session_name": session_name or "How can I help you?",
-            "user_id": user_id 
+            "user_id": user_id,
+            "updated_at": datetime.now(),
+            "version": 1
         }
         inserted = mongo.db.sessions.insert_one(session_doc)
         session_id = str(inserted.inserted_id)
@@ -111,7 +398,7 @@ def save_and_return(session_id, session_name, model_name, user_msg, bot_reply, u
         "response": bot_reply,
         "session_id": session_id,
         "timestamp": messages[1]["timestamp"].isoformat(),
-        "latency": 0
+        "latency": stats["latency_ms"] if stats else 0
     })
 
 
@@ -120,6 +407,7 @@ chat_bp = Blueprint('chat_bp', __name__)
 
 
 @chat_bp.route("/chat", methods=["POST"])
+@rate_limit("chat")
 def chat():
     """
     Handles user chat requests, processes messages, optional file input,
@@ -176,26 +464,8 @@ def chat():
             generation_config["stop_sequences"] = [stop_sequence]
 
         # Mentions: fetch context
-        mention_session_ids = request.form.getlist("mention_session_ids[]")
-        history_context = ""
-        if mention_session_ids:
-            print(mention_session_ids)
-            for m_id in mention_session_ids:
-                if ObjectId.is_valid(m_id):
-                    s = mongo.db.sessions.find_one({"_id": ObjectId(m_id)})
-                    if s:
-                        for m in s.get("messages", []):
-                            history_context += f"{m['role']}: {m['content']}\n"
-        # Handle uploaded file
-        if history_context:
-            combined_input = (
-                f"Here is some previous conversation context that you should consider:\n"
-                f"{history_context}\n\n"
-                f"Now, based on the above context, here is the user's new message:\n"
-                f"{user_msg}"
-            )
-        else:
-            combined_input = user_msg
+        history_context = mention_context(request.form.getlist("mention_session_ids[]"))
+        combined_input = build_prompt(user_msg, history_context)
 
         # ====== File Handling (optional) ======
         uploaded_file = request.files.get("uploaded_file")
@@ -204,34 +474,39 @@ def chat():
                 return jsonify({"error": "Unsupported file type"}), 400
             if uploaded_file.filename == "":
                 return jsonify({"error": "Empty file"}), 400
+            if model_type == "local":
+                return jsonify({"error": "Selected local model does not support files"}), 400
 
-            file_bytes = uploaded_file.read()
-            file_ext = uploaded_file.filename.rsplit(".", 1)[-1].lower()
-
+        # New upload, or attachments already stored for this session
+        document_context, media, file_info, cache_hit = resolve_attachments(
+            session_id, uploaded_file, request.form.getlist("attachment_ids[]"), user_msg
+        )
+        if document_context:
+            combined_input = f"{combined_input}\n\n[PDF Content Extracted]\n{document_context}"
+        if media:
             if model_type == "local":
                 return jsonify({"error": "Selected local model does not support files"}), 400
-            else:
-                # Preprocess file for Gemini
-                if file_ext == "pdf":
-                    extracted_text = extract_text_from_pdf_bytes(file_bytes)
-                    combined_input = f"{combined_input}\n\n[PDF Content Extracted]\n{extracted_text}"
-                else:
-                    # For image/video/etc, handle as media input
-                    # Here gemini_model accepts both text + media
-                    response = gemini_model.generate_content(
-                        [combined_input, {"mime_type": uploaded_file.mimetype or "image/jpeg", "data": file_bytes}],
-                        generation_config=generation_config
-                    )
-                    latency_ms = 0
-                    bot_reply = response.text or "No reply."
-                    # Save to DB (with uploaded_file info)
-                    return save_and_return(session_id, session_name, model_name, user_msg, bot_reply, uploaded_file,
-                                           file_bytes, user_id)
+            # For image/video/etc, handle as media input
+            # Here the Gemini model accepts both text + media
+            started = datetime.now()
+            response = get_gemini_provider().generate(
+                [combined_input, *(gemini_media_part(m) for m in media)], generation_config
+            )
+            latency_ms = int((datetime.now() - started).total_seconds() * 1000)
+            bot_reply = response.text or "No reply."
+            stats = build_message_stats("gemini", latency_ms, token_stats=gemini_token_stats(response), cache_hit=cache_hit)
+            # Save to DB (with uploaded_file info)
+            return save_and_return(session_id, session_name, model_name, user_msg, bot_reply, file_info, user_id, stats,
+                                   generated=bool(response.text))
 
         # ====== Model Handling (text only or text+mentions) ======
         bot_reply = "No reply."
         latency_ms = 0
+        # Only replies a model actually produced count towards the inference rollups
+        generated = False
         fallback_used = False
+        provider = "ollama" if model_type == "local" else "gemini"
+        token_stats = {}
         if model_type == "local":
             payload = {
                 "model": model_name,
@@ -254,9 +529,13 @@ def chat():
                 payload["system"] = system_prompt
             try:
                 latency_ms = datetime.now()
-                response = requests.post("http://localhost:11434/api/generate", json=payload, timeout=60)
+                response = get_ollama_pool().post(model_name, "/api/generate", json=payload, timeout=60)
                 latency_ms = int((datetime.now() - latency_ms).total_seconds() * 1000)
-                bot_reply = response.json().get("response", "No reply.")
+                result = response.json()
+                record_ollama_stats(model_name, result)
+                token_stats = ollama_token_stats(result)
+                bot_reply = result.get("response", "No reply.")
+                generated = "response" in result
                 
                 # Plugin: after_response
                 if plugin_manager:
@@ -264,22 +543,18 @@ def chat():
             except Exception as e:
                 # Fallback to gemini if available & requested
                 try:
-                    if gemini_model:
+                    if get_gemini_model():
+                        record_fallback(model_name, "gemini")
                         fallback_used = True
+                        provider = "gemini"
                         model_type = "cloud"
                         model_name = "gemini"
                         latency_ms = datetime.now()
-                        # Use model with system instruction if provided
-                        if system_prompt:
-                            model_with_system = genai.GenerativeModel(
-                                "models/gemini-2.5-flash",
-                                system_instruction=system_prompt
-                            )
-                            response = model_with_system.generate_content(combined_input, generation_config=generation_config)
-                        else:
-                            response = gemini_model.generate_content(combined_input, generation_config=generation_config)
+                        response = get_gemini_provider().generate(combined_input, generation_config, system_prompt)
                         latency_ms = int((datetime.now() - latency_ms).total_seconds() * 1000)
+                        token_stats = gemini_token_stats(response)
                         bot_reply = response.text or f"Local model failed, fallback used: {str(e)}"
+                        generated = bool(response.text)
                     else:
                         bot_reply = f"Local model error (no fallback): {str(e)}"
                 except Exception as inner_e:
@@ -289,17 +564,11 @@ def chat():
                 if model_name == "gemini":
                     print(combined_input)
                     latency_ms = datetime.now()
-                    # Use model with system instruction if provided
-                    if system_prompt:
-                        model_with_system = genai.GenerativeModel(
-                            "models/gemini-2.5-flash",
-                            system_instruction=system_prompt
-                        )
-                        response = model_with_system.generate_content(combined_input, generation_config=generation_config)
-                    else:
-                        response = gemini_model.generate_content(combined_input, generation_config=generation_config)
+                    response = get_gemini_provider().generate(combined_input, generation_config, system_prompt)
                     latency_ms = int((datetime.now() - latency_ms).total_seconds() * 1000)
+                    token_stats = gemini_token_stats(response)
                     bot_reply = response.text or "No Reply"
+                    generated = bool(response.text)
                     
                     # Plugin: after_response
                     if plugin_manager:
@@ -308,23 +577,32 @@ def chat():
                 bot_reply = f"Cloud model error: {str(e)}"
 
         # ====== Message Format ======
+        stats = build_message_stats(provider, latency_ms if isinstance(latency_ms, int) else 0,
+                                    token_stats=token_stats, fallback_used=fallback_used, cache_hit=cache_hit)
         messages = [
             {"role": "user", "content": user_msg, "timestamp": user_timestamp},
-            {"role": "bot", "content": bot_reply, "timestamp": datetime.now(), "model_name": model_name}
+            {"role": "bot", "content": bot_reply, "timestamp": datetime.now(), "model_name": model_name, "stats": stats}
         ]
+        if file_info:
+            messages[0]["uploaded_file"] = file_info
+        if generated:
+            record_rollup(model_name, stats, messages[1]["timestamp"])
+        messages = [encode_message(m) for m in messages]
 
         # save chat history to DB
         if session_id != "1":
             mongo.db.sessions.update_one(
                 {"_id": ObjectId(session_id)},
-                {"$push": {"messages": {"$each": messages}}},
+                with_revision({"$push": {"messages": {"$each": messages}}}),
             )
         else:
             session_doc = {
                 "session_name": session_name or "How can I help you?",
                 "messages": messages,
                 "created_at": datetime.now(),
-                "user_id": user_id
+                "user_id": user_id,
+                "updated_at": datetime.now(),
+                "version": 1
             }
             inserted = mongo.db.sessions.insert_one(session_doc)
             session_id = str(inserted.inserted_id)
@@ -350,6 +628,10 @@ def chat():
             "model_type": model_type,
         })
 
+    except (UploadTooLarge, RequestEntityTooLarge) as e:
+        message = str(e) if isinstance(e, UploadTooLarge) else "Request exceeds the maximum upload size"
+        return jsonify({"error": message}), 413
+
     except Exception as e:
         print("Error in /chat:", e)
         return jsonify({"error": str(e)}), 500
@@ -357,6 +639,7 @@ def chat():
 
 
 @chat_bp.route("/chat/stream", methods=["POST"])
+@rate_limit("chat")
 def chat_stream():
     try:
         # Validate user
@@ -377,7 +660,7 @@ def chat_stream():
             def error_generator():
                 err_msg = "Session limit reached. Please start a new chat."
                 # This matches the error format your frontend expects in line 969 of page.tsx
-                yield f"data: {json.dumps({'type': 'error', 'message': err_msg, 'limit_reached': True})}\n\n"
+                yield sse_event({'type': 'error', 'message': err_msg, 'limit_reached': True})
             
             return Response(error_generator(), mimetype='text/event-stream')
         
@@ -406,25 +689,8 @@ def chat_stream():
             generation_config["stop_sequences"] = [stop_sequence]
 
         # Mentions: fetch context
-        mention_session_ids = request.form.getlist("mention_session_ids[]")
-        history_context = ""
-        if mention_session_ids:
-            print(mention_session_ids)
-            for m_id in mention_session_ids:
-                if ObjectId.is_valid(m_id):
-                    s = mongo.db.sessions.find_one({"_id": ObjectId(m_id)})
-                    if s:
-                        for m in s.get("messages", []):
-                            history_context += f"{m['role']}: {m['content']}\n"
-        if history_context:
-            combined_input = (
-                f"Here is some previous conversation context that you should consider:\n"
-                f"{history_context}\n\n"
-                f"Now, based on the above context, here is the user's new message:\n"
-                f"{user_msg}"
-            )
-        else:
-            combined_input = user_msg
+        history_context = mention_context(request.form.getlist("mention_session_ids[]"))
+        combined_input = build_prompt(user_msg, history_context)
         
         # ====== File Handling (optional) ======
         uploaded_file = request.files.get("uploaded_file")
@@ -433,31 +699,53 @@ def chat_stream():
                 return jsonify({"error": "Unsupported file type"}), 400
             if uploaded_file.filename == "":
                 return jsonify({"error": "Empty file"}), 400
+            if model_type == "local":
+                return jsonify({"error": "Selected local model does not support files"}), 400
 
-            file_bytes = uploaded_file.read()
-            file_ext = uploaded_file.filename.rsplit(".", 1)[-1].lower()
-
+        # New upload, or attachments already stored for this session
+        document_context, media, file_info, cache_hit = resolve_attachments(
+            session_id, uploaded_file, request.form.getlist("attachment_ids[]"), user_msg
+        )
+        if document_context:
+            combined_input = f"{combined_input}\n\n[PDF Content Extracted]\n{document_context}"
+        if media:
             if model_type == "local":
                 return jsonify({"error": "Selected local model does not support files"}), 400
-            else:
-                # For file uploads, we'll use non-streaming for now
-                if file_ext == "pdf":
-                    extracted_text = extract_text_from_pdf_bytes(file_bytes)
-                    combined_input = f"{combined_input}\n\n[PDF Content Extracted]\n{extracted_text}"
-                else:
-                    response = gemini_model.generate_content(
-                        [combined_input, {"mime_type": uploaded_file.mimetype or "image/jpeg", "data": file_bytes}],
-                        generation_config=generation_config
-                    )
-                    bot_reply = response.text or "No reply."
-                    return save_and_return(session_id, session_name, model_name, user_msg, bot_reply, uploaded_file, file_bytes)
+            # For media, we'll use non-streaming for now
+            started = datetime.now()
+            response = get_gemini_provider().generate(
+                [combined_input, *(gemini_media_part(m) for m in media)], generation_config
+            )
+            latency_ms = int((datetime.now() - started).total_seconds() * 1000)
+            bot_reply = response.text or "No reply."
+            stats = build_message_stats("gemini", latency_ms, token_stats=gemini_token_stats(response), cache_hit=cache_hit)
+            return save_and_return(session_id, session_name, model_name, user_msg, bot_reply, file_info, user_id, stats,
+                                   generated=bool(response.text))
+
+        # Plugin: on_chunk (transforms chunks as they stream, before they are sent)
+        transformer = plugin_manager.stream_transformer() if plugin_manager else None
+
+        def transform(text):
+            return transformer.feed(text) if transformer else text
+
+        # Time to first token is measured from the start of the request
+        started_at = request.environ.get("privgpt.start", time.perf_counter())
 
         def generate_stream():
             bot_reply = ""
             start_time = datetime.now()
+            first_token_at = None
+            provider = "ollama" if model_type == "local" else "gemini"
+            token_stats = {}
+            fallback_used = False
+            # Model the reply is saved and aggregated under (gemini after a fallback, as in /chat)
+            reply_model = model_name
+            # Set on errors: the reply is saved, but not counted in the inference rollups
+            failed = False
+            interrupted = False
             
             # Send session info first
-            yield f"data: {json.dumps({'type': 'session_info', 'session_id': session_id})}\n\n"
+            yield sse_event({'type': 'session_info', 'session_id': session_id})
             
             try:
                 if model_type == "local":
@@ -481,124 +769,161 @@ def chat_stream():
                             payload["options"]["seed"] = seed
                         if system_prompt:
                             payload["system"] = system_prompt
-                        response = requests.post("http://localhost:11434/api/generate", json=payload, stream=True, timeout=60)
-                        response.raise_for_status()
-                        
-                        for line in response.iter_lines():
-                            if line:
-                                try:
-                                    chunk_data = json.loads(line.decode('utf-8'))
-                                    chunk_text = chunk_data.get("response", "")
-                                    if chunk_text:
-                                        bot_reply += chunk_text
-                                        yield f"data: {json.dumps({'type': 'chunk', 'text': chunk_text})}\n\n"
-                                    
-                                    if chunk_data.get("done", False):
-                                        break
-                                except json.JSONDecodeError:
-                                    continue
-                                except GeneratorExit:
+                        # The node stays busy (for load balancing) until the response is closed
+                        with get_ollama_pool().post(model_name, "/api/generate", json=payload, stream=True, timeout=60) as response:
+                            response.raise_for_status()
+
+                            for line in response.iter_lines():
+                                if should_stop_streams():
+                                    # Server shutting down: end now so the reply is still saved
+                                    interrupted = True
                                     break
+                                if line:
+                                    try:
+                                        chunk_data = json.loads(line.decode('utf-8'))
+                                        chunk_text = chunk_data.get("response", "")
+                                        if chunk_text and first_token_at is None:
+                                            first_token_at = time.perf_counter()
+                                            record_ttft("ollama", model_name, first_token_at - started_at)
+                                        if chunk_text:
+                                            chunk_text = transform(chunk_text)
+                                            if chunk_text:
+                                                bot_reply += chunk_text
+                                                yield sse_chunk(chunk_text)
+
+                                        if chunk_data.get("done", False):
+                                            # The final chunk carries eval_count/eval_duration
+                                            record_ollama_stats(model_name, chunk_data)
+                                            token_stats = ollama_token_stats(chunk_data)
+                                            break
+                                    except json.JSONDecodeError:
+                                        continue
+                                    except GeneratorExit:
+                                        break
                     except Exception as e:
                         # Fallback to gemini streaming
-                        if gemini_model:
-                            fallback_msg = f"[Local model failed, switching to gemini: {str(e)}]\n"
-                            bot_reply += fallback_msg
-                            yield f"data: {json.dumps({'type': 'chunk', 'text': fallback_msg})}\n\n"
+                        if get_gemini_model():
+                            record_fallback(model_name, "gemini")
+                            provider = "gemini"
+                            reply_model = "gemini"
+                            fallback_used = True
+                            fallback_msg = transform(f"[Local model failed, switching to gemini: {str(e)}]\n")
+                            if fallback_msg:
+                                bot_reply += fallback_msg
+                                yield sse_chunk(fallback_msg)
                             try:
-                                # Use model with system instruction if provided
-                                if system_prompt:
-                                    model_with_system = genai.GenerativeModel(
-                                        "models/gemini-2.5-flash",
-                                        system_instruction=system_prompt
-                                    )
-                                    response = model_with_system.generate_content(
-                                        combined_input,
-                                        generation_config=generation_config,
-                                        stream=True
-                                    )
-                                else:
-                                    response = gemini_model.generate_content(
-                                        combined_input,
-                                        generation_config=generation_config,
-                                        stream=True
-                                    )
+                                response = get_gemini_provider().stream(combined_input, generation_config, system_prompt)
                                 for chunk in response:
+                                    if should_stop_streams():
+                                        # Server shutting down: end now so the reply is still saved
+                                        interrupted = True
+                                        break
                                     try:
                                         chunk_text = chunk.text if chunk.text else ""
+                                        if chunk_text and first_token_at is None:
+                                            first_token_at = time.perf_counter()
+                                            record_ttft("gemini", "gemini", first_token_at - started_at)
                                         if chunk_text:
-                                            bot_reply += chunk_text
-                                            yield f"data: {json.dumps({'type': 'chunk', 'text': chunk_text})}\n\n"
+                                            chunk_text = transform(chunk_text)
+                                            if chunk_text:
+                                                bot_reply += chunk_text
+                                                yield sse_chunk(chunk_text)
+                                        # Usage metadata is cumulative; the last chunk has the totals
+                                        token_stats = gemini_token_stats(chunk) or token_stats
                                     except GeneratorExit:
                                         break
                             except Exception as ge:
                                 err_txt = f"[Fallback gemini error: {str(ge)}]"
+                                failed = True
                                 bot_reply += err_txt
-                                yield f"data: {json.dumps({'type': 'error', 'message': err_txt})}\n\n"
+                                yield sse_event({'type': 'error', 'message': err_txt})
                         else:
                             err_txt = f"[Local model error and no fallback: {str(e)}]"
+                            failed = True
                             bot_reply += err_txt
-                            yield f"data: {json.dumps({'type': 'error', 'message': err_txt})}\n\n"
+                            yield sse_event({'type': 'error', 'message': err_txt})
                                 
                 else:  # Cloud model (Gemini)
                     if model_name == "gemini":
-                        # Gemini streaming
-                        # Use model with system instruction if provided
-                        if system_prompt:
-                            model_with_system = genai.GenerativeModel(
-                                "models/gemini-2.5-flash",
-                                system_instruction=system_prompt
-                            )
-                            response = model_with_system.generate_content(
-                                combined_input,
-                                generation_config=generation_config,
-                                stream=True
-                            )
-                        else:
-                            response = gemini_model.generate_content(
-                                combined_input,
-                                generation_config=generation_config,
-                                stream=True
-                            )
+                        response = get_gemini_provider().stream(combined_input, generation_config, system_prompt)
 
                         for chunk in response:
+                            if should_stop_streams():
+                                # Server shutting down: end now so the reply is still saved
+                                interrupted = True
+                                break
                             try:
                                 chunk_text = chunk.text if chunk.text else ""
+                                if chunk_text and first_token_at is None:
+                                    first_token_at = time.perf_counter()
+                                    record_ttft("gemini", "gemini", first_token_at - started_at)
                                 if chunk_text:
-                                    bot_reply += chunk_text
-                                    yield f"data: {json.dumps({'type': 'chunk', 'text': chunk_text})}\n\n"
+                                    chunk_text = transform(chunk_text)
+                                    if chunk_text:
+                                        bot_reply += chunk_text
+                                        yield sse_chunk(chunk_text)
+                                # Usage metadata is cumulative; the last chunk has the totals
+                                token_stats = gemini_token_stats(chunk) or token_stats
                             except GeneratorExit:
                                 # Handle client disconnect/stop generation
                                 break
                     
             except Exception as e:
                 error_msg = f"Error: {str(e)}"
+                failed = True
                 bot_reply = error_msg
-                yield f"data: {json.dumps({'type': 'error', 'message': error_msg})}\n\n"
+                yield sse_event({'type': 'error', 'message': error_msg})
             
+            if interrupted:
+                note = transform("\n[Interrupted: the server is restarting, please retry]")
+                if note:
+                    bot_reply += note
+                    yield sse_chunk(note)
+
+            # Plugin: on_stream_end (text held back by streaming plugins)
+            if transformer:
+                tail = transformer.flush()
+                if tail:
+                    bot_reply += tail
+                    yield sse_chunk(tail)
+
             # Calculate latency
             end_time = datetime.now()
             latency_ms = int((end_time - start_time).total_seconds() * 1000)
+            ttft_ms = int((first_token_at - started_at) * 1000) if first_token_at is not None else None
             
             # Save to database only if we have some content
             if bot_reply.strip():
+                # Plugin: after_response (runs on the full reply, so it only affects
+                # what is saved; use on_chunk to change what is streamed)
+                if plugin_manager:
+                    bot_reply = plugin_manager.after_response(bot_reply)
+
+                stats = build_message_stats(provider, latency_ms, ttft_ms, token_stats, fallback_used, cache_hit)
                 messages = [
                     {"role": "user", "content": user_msg, "timestamp": user_timestamp},
-                    {"role": "bot", "content": bot_reply, "timestamp": end_time, "model_name": model_name}
+                    {"role": "bot", "content": bot_reply, "timestamp": end_time, "model_name": reply_model, "stats": stats}
                 ]
+                if file_info:
+                    messages[0]["uploaded_file"] = file_info
+                if not failed:
+                    record_rollup(reply_model, stats, end_time)
+                messages = [encode_message(m) for m in messages]
 
                 final_session_id = session_id
                 if session_id != "1":
                     mongo.db.sessions.update_one(
                         {"_id": ObjectId(session_id)},
-                        {"$push": {"messages": {"$each": messages}}},
+                        with_revision({"$push": {"messages": {"$each": messages}}}),
                     )
                 else:
                     session_doc = {
                         "session_name": session_name or "How can I help you?",
                         "messages": messages,
                         "created_at": datetime.now(),
-                        "user_id": user_id
+                        "user_id": user_id,
+                        "updated_at": datetime.now(),
+                        "version": 1
                     }
                     inserted = mongo.db.sessions.insert_one(session_doc)
                     final_session_id = str(inserted.inserted_id)
@@ -614,17 +939,11 @@ def chat_stream():
                             {"$push": {"chat_sessions": final_session_id}}
                         )
                 
-                # Plugin: after_response (for streaming, we process at the end)
-                if plugin_manager:
-                    bot_reply = plugin_manager.after_response(bot_reply)
-                    # Note: Original chunks were already sent, so this modification 
-                    # only affects what is SAVED to the database history.
-                
                 # Send completion message
-                yield f"data: {json.dumps({'type': 'complete', 'session_id': final_session_id, 'timestamp': end_time.isoformat(), 'latency': latency_ms})}\n\n"
+                yield sse_event({'type': 'complete', 'session_id': final_session_id, 'timestamp': end_time.isoformat(), 'latency': latency_ms})
 
         return Response(
-            generate_stream(),
+            track_stream(generate_stream()),
             mimetype='text/event-stream',
             headers={
                 'Cache-Control': 'no-cache',
@@ -634,63 +953,149 @@ def chat_stream():
             }
         )
 
+    except (UploadTooLarge, RequestEntityTooLarge) as e:
+        message = str(e) if isinstance(e, UploadTooLarge) else "Request exceeds the maximum upload size"
+        return jsonify({"error": message}), 413
+
     except Exception as e:
         print("Error in /chat/stream:", e)
         return jsonify({"error": str(e)}), 500
 
-@chat_bp.route("/chat/history", methods=["POST"])
+@chat_bp.route("/chat/history", methods=["GET", "POST"])
 def chat_history():
     """
-    Fetches chat history for given session IDs.
+    Fetches chat history for given session IDs (GET: repeated `session_ids`
+    query parameters; POST: JSON body, kept for existing clients).
+    GET supports conditional requests: a matching If-None-Match returns 304
+    after a revision-only query, without loading any message bodies.
 
     Returns:
     JSON: List of sessions with message history.
     """
     user_id = validate_user(request)
-    
-    if user_id:
-        # If logged in, fetch sessions from user's list
-        user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
-        if user and "chat_sessions" in user:
-             # Convert to ObjectIds
-             try:
-                 user_session_ids = [ObjectId(sid) for sid in user["chat_sessions"] if ObjectId.is_valid(sid)]
-                 sessions = mongo.db.sessions.find({"_id": {"$in": user_session_ids}}).sort("created_at", -1)
-             except Exception:
-                 sessions = []
+    try:
+        if request.method == "GET":
+            session_ids = request.args.getlist("session_ids")
         else:
-            sessions = []
-    else:
-        # If not logged in, fetch only the requested IDs that DO NOT have a user_id
-        # This prevents guests from peeking at user sessions even if they guess an ID
-        data = request.json or {}
-        id_list = data.get("session_ids", [])
-        try:
-            object_ids = [ObjectId(sid) for sid in id_list]
-        except Exception as e:
-            return jsonify({"error": "Invalid session ID format"}), 400
-            
-        sessions = mongo.db.sessions.find({
-            "_id": {"$in": object_ids},
-            "user_id": None # Strict check: guest can only see guest chats
-        }).sort("created_at", -1)
-
-    result = []
-    for session in sessions:
-        session["_id"] = str(session["_id"])
-        if "user_id" in session:
-            session["user_id"] = str(session["user_id"])
-            
-        for msg in session.get("messages", []):
-            if hasattr(msg["timestamp"], "isoformat"):
-                msg["timestamp"] = msg["timestamp"].isoformat()
-        result.append(session)
+            session_ids = (request.get_json(silent=True) or {}).get("session_ids", [])
+        query = readable_sessions_query(user_id, session_ids)
+    except Exception:
+        return jsonify({"error": "Invalid session ID format"}), 400
+
+    if query is None:
+        return cached_json([], make_etag(user_id, "empty"), vary="Authorization")
+
+    # Validate against revisions only; message bodies are fetched on a miss
+    revisions = mongo.db.sessions.find(query, SESSION_REVISION_PROJECTION).sort("created_at", -1)
+    etag = make_etag(user_id, *(part for rev in revisions for part in session_etag_parts(rev)))
+    if etag_matches(etag):
+        return not_modified(etag, vary="Authorization")
+
+    sessions = mongo.db.sessions.find(query).sort("created_at", -1)
+
+    result = [serialize_session(session) for session in sessions]
+    return cached_json(result, etag, vary="Authorization")
+
+@chat_bp.route("/chat/search", methods=["POST"])
+def search_chats():
+    """
+    Full-text search over the messages of the caller's sessions (for guests:
+    the guest sessions listed in `session_ids`), so clients can search without
+    loading the full history.
+
+    Returns:
+    JSON: Paginated hits with snippets and match offsets.
+    """
+    data = request.get_json(silent=True) or {}
+    text = str(data.get("query", "")).strip()[:MAX_QUERY_CHARS]
+    if not text:
+        return jsonify({"error": "Query is required"}), 400
+    try:
+        offset = max(0, int(data.get("offset", 0)))
+        limit = min(max(1, int(data.get("limit", 20))), 50)
+    except (TypeError, ValueError):
+        return jsonify({"error": "offset and limit must be integers"}), 400
+
+    user_id = validate_user(request)
+    try:
+        query = readable_sessions_query(user_id, data.get("session_ids", []))
+    except Exception:
+        return jsonify({"error": "Invalid session ID format"}), 400
+
+    result = {"hits": [], "next_offset": None}
+    if query is not None:
+        result = search_messages(query, text, offset, limit)
+    return jsonify({"query": text, "offset": offset, "limit": limit, **result})
+
+@chat_bp.route("/chat/export", methods=["GET"])
+def export_chats():
+    """
+    Streams the caller's sessions (for guests: the guest sessions listed in
+    `session_ids`) as NDJSON, gzip-compressed with ?gzip=1. The export is
+    produced from a database cursor while it is sent, so memory use stays
+    constant regardless of the number of sessions.
+
+    Returns:
+    Response: Streamed NDJSON download.
+    """
+    user_id = validate_user(request)
+    try:
+        query = readable_sessions_query(user_id, request.args.getlist("session_ids"))
+    except Exception:
+        return jsonify({"error": "Invalid session ID format"}), 400
+    if query is None:
+        query = {"_id": {"$in": []}}
+
+    filename = f"privgpt-sessions-{datetime.now():%Y%m%d-%H%M%S}.ndjson"
+    body = export_lines(query)
+    mimetype = "application/x-ndjson"
+    if request.args.get("gzip", "").lower() in ("1", "true"):
+        body = gzip_stream(body)
+        filename += ".gz"
+        mimetype = "application/gzip"
+    return Response(body, mimetype=mimetype, headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "no-store",
+    })
+
+@chat_bp.route("/chat/import", methods=["POST"])
+def import_chats():
+    """
+    Imports sessions from an export of this or another deployment (NDJSON,
+    optionally gzip-compressed), sent as the request body or as the `file`
+    form field. Sessions get new ids and belong to the caller (guest sessions
+    for guests); they are saved in batches while the upload is read.
+
+    Returns:
+    JSON: Numbers of imported sessions and messages, and old -> new session ids.
+    """
+    request.max_content_length = Config.IMPORT_MAX_SIZE
+    user_id = validate_user(request)
+    try:
+        if request.mimetype == "multipart/form-data":
+            upload = request.files.get("file")
+            if not upload:
+                return jsonify({"error": "Missing file"}), 400
+            stream = upload.stream
+        else:
+            stream = request.stream
+        result = import_sessions(open_import_stream(stream), user_id)
+    except SessionImportError as e:
+        return jsonify({"error": str(e), **e.imported}), 400
+    except RequestEntityTooLarge:
+        return jsonify({"error": "Import exceeds the maximum size"}), 413
+    except (OSError, EOFError) as e:
+        # Truncated or corrupt gzip data
+        return jsonify({"error": f"Could not read the import: {str(e)}"}), 400
+
+    return jsonify({"status": "imported", **result})
 
-    return jsonify(result)
 @chat_bp.route("/chat/<session_id>", methods=["GET"])
 def get_session_messages(session_id):
     """
     Retrieves all messages for a specific chat session.
+    Supports conditional requests: a matching If-None-Match returns 304 after
+    a revision-only query, without loading the messages.
 
     Args:
     session_id (str): MongoDB ObjectId of the session.
@@ -699,23 +1104,34 @@ def get_session_messages(session_id):
     JSON: Session ID and message list or error.
     """
     try:
+        limit = current_app.config.get("MAX_MESSAGES_PER_SESSION", 10)
+
+        if request.if_none_match:
+            revision = mongo.db.sessions.find_one({"_id": ObjectId(session_id)}, SESSION_REVISION_PROJECTION)
+            if revision:
+                etag = make_etag(limit, *session_etag_parts(revision))
+                if etag_matches(etag):
+                    return not_modified(etag)
+
         session = mongo.db.sessions.find_one({"_id": ObjectId(session_id)})
 
         if not session:
             return jsonify({"error": "Session not found"}), 404
 
+        etag = make_etag(limit, *session_etag_parts(session))
+
         # Convert timestamps to ISO format for JSON serialization
-        for msg in session.get("messages", []):
-            if "timestamp" in msg:
-                msg["timestamp"] = msg["timestamp"].isoformat()
-        
-        limit_reached = has_reached_message_limit(session_id)
+        messages = serialize_session(session).get("messages", [])
 
-        return jsonify({
+        # Same rule as has_reached_message_limit(), computed from the loaded document
+        user_msg_count = sum(1 for m in messages if m.get("role") == "user")
+        limit_reached = user_msg_count >= limit
+
+        return cached_json({
             "session_id": str(session["_id"]),
-            "messages": session["messages"],
+            "messages": messages,
             "limit_reached": limit_reached
-        })
+        }, etag)
 
     except Exception as e:
         return jsonify({"error": f"Invalid session ID: {str(e)}"}), 400
@@ -739,7 +1155,7 @@ def rename_session():
     try:
         result = mongo.db.sessions.update_one(
             {"_id": ObjectId(session_id)},
-            {"$set": {"session_name": new_name}}
+            with_revision({"$set": {"session_name": new_name}})
         )
 
         if result.matched_count == 0:
@@ -768,7 +1184,7 @@ def clear():
     try:
         result = mongo.db.sessions.update_one(
             {"_id": ObjectId(session_id)},
-            {"$set": {"messages": []}}
+            with_revision({"$set": {"messages": []}})
         )
 
         if result.matched_count == 0:
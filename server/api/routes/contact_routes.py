@@ -2,53 +2,10 @@ from flask import Blueprint, request, jsonify
 from api import mongo
 import datetime
 import re
-from functools import wraps
-import time
+from api.ratelimit import rate_limit, get_client_ip
 
 contact_bp = Blueprint('contact', __name__)
 
-# Simple in-memory rate limiting
-# In production, use Redis or a proper rate limiting library
-rate_limit_store = {}
-RATE_LIMIT_WINDOW = 60  # seconds
-RATE_LIMIT_MAX_REQUESTS = 5  # max requests per window per IP
-
-
-def get_client_ip():
-    """Get client IP address from request"""
-    if request.headers.get('X-Forwarded-For'):
-        return request.headers.get('X-Forwarded-For').split(',')[0].strip()
-    return request.remote_addr or '127.0.0.1'
-
-
-def check_rate_limit(ip):
-    """Check if IP has exceeded rate limit"""
-    current_time = time.time()
-    
-    # Clean up old entries
-    expired_ips = [
-        stored_ip for stored_ip, data in rate_limit_store.items()
-        if current_time - data['window_start'] > RATE_LIMIT_WINDOW
-    ]
-    for expired_ip in expired_ips:
-        del rate_limit_store[expired_ip]
-    
-    # Check/update rate limit for current IP
-    if ip in rate_limit_store:
-        data = rate_limit_store[ip]
-        if current_time - data['window_start'] > RATE_LIMIT_WINDOW:
-            # Reset window
-            rate_limit_store[ip] = {'window_start': current_time, 'count': 1}
-            return True
-        elif data['count'] >= RATE_LIMIT_MAX_REQUESTS:
-            return False
-        else:
-            data['count'] += 1
-            return True
-    else:
-        rate_limit_store[ip] = {'window_start': current_time, 'count': 1}
-        return True
-
 
 def validate_email(email):
     """Validate email format"""
@@ -57,6 +14,7 @@ def validate_email(email):
 
 
 @contact_bp.route('/api/contact', methods=['POST'])
+@rate_limit('contact')
 def submit_contact():
     """
     Handle contact form submission.
@@ -70,14 +28,7 @@ def submit_contact():
         "website": "string (honeypot, should be empty)"
     }
     """
-    # Rate limiting check
     client_ip = get_client_ip()
-    if not check_rate_limit(client_ip):
-        return jsonify({
-            'message': 'Too many requests. Please try again later.',
-            'error': 'rate_limit_exceeded'
-        }), 429
-    
     data = request.get_json()
     
     if not data:
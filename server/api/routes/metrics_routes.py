@@ -0,0 +1,33 @@
+from flask import Blueprint, Response, request, current_app, jsonify
+import hmac
+from api.metrics import exposition
+
+metrics_bp = Blueprint('metrics', __name__)
+
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Exposes server metrics in the Prometheus text format.
+
+    If METRICS_TOKEN is set, scrapers must send it as `Authorization: Bearer <token>`.
+    Without a token, metrics are only served to clients on the same host (not
+    through a reverse proxy), unless METRICS_PUBLIC is set.
+
+    Returns:
+    text/plain: Prometheus exposition (version 0.0.4)
+    HTTP 403: If the token is missing or wrong, or the client is not local
+    """
+    token = current_app.config.get('METRICS_TOKEN')
+    if not token and not current_app.config.get('METRICS_PUBLIC'):
+        # Requests relayed by a local proxy come from loopback too, but carry X-Forwarded-For
+        if request.remote_addr not in LOCAL_ADDRESSES or 'X-Forwarded-For' in request.headers:
+            return jsonify({'message': 'Metrics are only available locally; set METRICS_TOKEN'}), 403
+    elif token:
+        auth_header = request.headers.get('Authorization', '')
+        provided = auth_header.split(' ', 1)[1] if auth_header.startswith('Bearer ') else ''
+        if not hmac.compare_digest(provided.encode('utf-8'), token.encode('utf-8')):
+            return jsonify({'message': 'Invalid metrics token'}), 403
+    return Response(exposition(), mimetype='text/plain; version=0.0.4; charset=utf-8')
@@ -1,31 +1,48 @@
-from flask import Blueprint, jsonify, request
-from api.services.ollama_services import get_available_models, get_model_details
+from flask import Blueprint, jsonify, request, current_app
+from api.services.model_catalog import get_model_catalog
+from api.utils.http_cache import make_etag, etag_matches, not_modified, cached_json
 
 model_bp=Blueprint('model_bp', __name__)
 
+CLOUD_MODELS = ["gemini"]
+
+def _models_cache_control():
+    return f"public, max-age={current_app.config.get('MODELS_CACHE_MAX_AGE', 30)}"
+
 @model_bp.route("/models")
 def models():
     """
-    Returns available local and cloud models.
+    Returns available local and cloud models, served from the in-memory
+    model catalog (refreshed in the background).
+    The ETag is derived from the local model digests, so it changes whenever
+    a model is pulled or removed.
 
     Returns:
     JSON: Dictionary with local_models and cloud_models keys.
     """
 
-    local_models = get_available_models()
-    cloud_models = ["gemini"]
-    return jsonify({
+    catalog = get_model_catalog()
+    etag = make_etag(catalog.etag(), *CLOUD_MODELS)
+    if etag_matches(etag):
+        return not_modified(etag, _models_cache_control())
+
+    # Full model names including tags (e.g., "gemma3:1b" instead of just "gemma3")
+    local_models = catalog.model_names()
+    return cached_json({
         "local_models": local_models,
-        "cloud_models": cloud_models,
-    })
+        "cloud_models": CLOUD_MODELS,
+    }, etag, _models_cache_control())
 
-@model_bp.route("/model_info", methods=["POST"])
+@model_bp.route("/model_info", methods=["GET", "POST"])
 def model_info():
     """
     Returns detailed information about a specific model.
-    Expects JSON: { "model_name": "name", "model_type": "local"|"cloud" }
+    Expects `model_name` and `model_type` ("local"|"cloud") as query parameters
+    (GET) or as JSON (POST, kept for existing clients).
+    Local model details are cached by digest in the model catalog; GET requests
+    may also send If-None-Match to skip the payload entirely.
     """
-    data = request.json
+    data = request.args if request.method == "GET" else request.get_json(silent=True)
     if not data:
         return jsonify({"error": "No data provided"}), 400
 
@@ -36,7 +53,10 @@ def model_info():
         return jsonify({"error": "Model name is required"}), 400
 
     if model_type == "cloud":
-        return jsonify({
+        etag = make_etag("cloud", model_name)
+        if etag_matches(etag):
+            return not_modified(etag, "no-cache")
+        return cached_json({
             "license": "Proprietary",
             "modelfile": "N/A",
             "parameters": "Managed by Provider",
@@ -49,10 +69,18 @@ def model_info():
                 "parameter_size": "Unknown",
                 "quantization_level": "None"
             }
-        })
+        }, etag, "no-cache")
+
+    catalog = get_model_catalog()
+    digest = catalog.digest(model_name)
+    etag = make_etag("local", model_name, digest) if digest else None
+    if etag_matches(etag):
+        return not_modified(etag, "no-cache")
 
-    details = get_model_details(model_name)
+    details = catalog.details(model_name)
     if details:
+        if etag:
+            return cached_json(details, etag, "no-cache")
         return jsonify(details)
     
     return jsonify({"error": "Failed to fetch model info"}), 500
@@ -0,0 +1,195 @@
+"""
+Production entry point: serves the app with gunicorn (in requirements.txt;
+pip install gevent for --worker-class gevent).
+
+- gthread: each worker runs a thread pool; one thread per in-flight request or
+  SSE stream (SERVE_THREADS per worker).
+- gevent: each worker multiplexes up to SERVE_WORKER_CONNECTIONS requests on
+  greenlets; the cheapest way to hold many concurrent streams.
+
+The app is created once in the master process (preload) and the heap frozen
+before forking, so workers share its memory copy-on-write; each worker then
+creates its own MongoDB client, since a client is not fork-safe. On SIGTERM workers
+stop accepting connections and in-flight streams get SERVE_DRAIN_SECONDS to
+finish; streams still running shortly before that end cleanly (partial reply
+saved, completion event sent) instead of being cut mid-frame. With several
+workers, metrics are shared through METRICS_MULTIPROCESS_DIR (a temporary
+directory by default), so /metrics reports the whole server whichever worker
+answers the scrape.
+
+Usage (from the server/ directory):
+    python api/serve.py --worker-class gthread --workers 4 --threads 32
+    python api/serve.py --worker-class gevent --bind 0.0.0.0:8000
+"""
+import argparse
+import gc
+import importlib
+import os
+import shutil
+import signal
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORKER_CLASSES = ("gthread", "gevent")
+
+# Imported in the master before forking so every worker shares them (the app
+# itself imports them lazily to keep cold starts fast)
+PRELOAD_MODULES = ("numpy", "fitz", "PIL.Image", "google.generativeai")
+
+# Metrics directory created by main() (removed on exit), if METRICS_MULTIPROCESS_DIR was not set
+metrics_temp_dir = None
+
+
+def default_workers() -> int:
+    # Requests mostly wait on Ollama/Gemini; one process per core covers the CPU work
+    return max(2, os.cpu_count() or 1)
+
+
+def build_options(args) -> dict:
+    options = {
+        "bind": args.bind,
+        "workers": args.workers,
+        "worker_class": args.worker_class,
+        "preload_app": args.preload,
+        # Seconds in-flight requests (SSE streams) get after SIGTERM
+        "graceful_timeout": int(args.drain_seconds),
+        # Worker heartbeat; a stream in progress does not count as hung
+        "timeout": int(args.timeout),
+        "keepalive": 5,
+        "max_requests": args.max_requests,
+        "max_requests_jitter": max(1, args.max_requests // 10) if args.max_requests else 0,
+        "accesslog": "-" if args.access_log else None,
+        "when_ready": when_ready,
+        "post_fork": post_fork,
+        "post_worker_init": post_worker_init,
+        "worker_exit": worker_exit,
+        "child_exit": child_exit,
+        "on_exit": on_exit,
+    }
+    if args.worker_class == "gthread":
+        options["threads"] = args.threads
+    else:
+        options["worker_connections"] = args.worker_connections
+    return options
+
+
+def when_ready(server):
+    # Runs in the master after the app was preloaded, before workers fork:
+    # frozen objects are never touched by the collector, so their pages stay shared
+    if server.cfg.preload_app:
+        gc.freeze()
+        server.log.info(f"Preloaded app; {gc.get_freeze_count()} objects frozen and shared with workers")
+
+
+def post_fork(server, worker):
+    # The preloaded app's MongoClient (and its connection pool and monitor
+    # threads) belongs to the master: replace it before the worker serves
+    if server.cfg.preload_app:
+        from api import init_mongo
+        init_mongo(worker.app.wsgi())
+
+
+def post_worker_init(worker):
+    from api.utils.drain import begin_drain
+
+    handle_exit = signal.getsignal(signal.SIGTERM)
+
+    def drain_then_exit(sig, frame):
+        begin_drain(worker.cfg.graceful_timeout)
+        if callable(handle_exit):
+            handle_exit(sig, frame)
+    signal.signal(signal.SIGTERM, drain_then_exit)
+
+
+def worker_exit(server, worker):
+    # Last snapshot of this worker's metrics, before the master archives it
+    from api.metrics import telemetry
+    if telemetry.shared is not None:
+        telemetry.shared.write()
+
+
+def child_exit(server, worker):
+    from api.config import Config
+    if Config.METRICS_ENABLED and Config.METRICS_MULTIPROCESS_DIR:
+        from api.metrics.multiprocess import mark_process_dead
+        mark_process_dead(Config.METRICS_MULTIPROCESS_DIR, worker.pid)
+
+
+def on_exit(server):
+    if metrics_temp_dir:
+        shutil.rmtree(metrics_temp_dir, ignore_errors=True)
+
+
+def load_factory(spec: str):
+    module_name, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attr or "create_app")
+
+
+def main():
+    global metrics_temp_dir
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bind", default=os.getenv("SERVE_BIND", "0.0.0.0:5000"))
+    parser.add_argument("--worker-class", choices=WORKER_CLASSES, default=os.getenv("SERVE_WORKER_CLASS", "gthread"))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVE_WORKERS", 0)) or default_workers())
+    parser.add_argument("--threads", type=int, default=int(os.getenv("SERVE_THREADS", 32)),
+                        help="threads per gthread worker (concurrent requests/streams per worker)")
+    parser.add_argument("--worker-connections", type=int, default=int(os.getenv("SERVE_WORKER_CONNECTIONS", 1000)),
+                        help="concurrent requests per gevent worker")
+    parser.add_argument("--drain-seconds", type=int, default=int(os.getenv("SERVE_DRAIN_SECONDS", 60)))
+    parser.add_argument("--timeout", type=int, default=int(os.getenv("SERVE_TIMEOUT", 120)))
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("SERVE_MAX_REQUESTS", 0)),
+                        help="recycle workers after this many requests (0 = never)")
+    parser.add_argument("--no-preload", dest="preload", action="store_false",
+                        default=os.getenv("SERVE_PRELOAD", "true").lower() == "true")
+    parser.add_argument("--access-log", action="store_true")
+    parser.add_argument("--app", default="api:create_app", help="app factory, module:function")
+    args = parser.parse_args()
+
+    if args.worker_class == "gevent":
+        # Must happen before anything imports socket/ssl/threading, or the
+        # preloaded app would keep blocking versions of them
+        from gevent import monkey
+        monkey.patch_all()
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        sys.exit("gunicorn is not installed: pip install gunicorn (and gevent for --worker-class gevent)")
+
+    if args.preload:
+        for name in PRELOAD_MODULES:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                pass
+
+    if args.workers > 1:
+        # Each worker keeps its own metrics: share them, or a scrape would see one worker's
+        if not os.getenv("METRICS_MULTIPROCESS_DIR"):
+            metrics_temp_dir = os.environ["METRICS_MULTIPROCESS_DIR"] = tempfile.mkdtemp(prefix="privgpt-metrics-")
+        from api.metrics.multiprocess import clear_directory
+        os.makedirs(os.environ["METRICS_MULTIPROCESS_DIR"], exist_ok=True)
+        clear_directory(os.environ["METRICS_MULTIPROCESS_DIR"])
+
+    factory = load_factory(args.app)
+
+    class Server(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                if value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return factory()
+
+    Server(build_options(args)).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+import datetime
+import io
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from api import mongo
+from api.config import Config
+from api.utils.file_utils import extract_text_from_pdf_upload
+from api.utils.image_utils import image_cache, process_image_in_pool, processed_image_name, processed_image_mime_type
+from api.utils.upload_utils import CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Name of the original upload; derived artifacts are stored next to it (e.g. "text")
+ORIGINAL = "original"
+
+
+class LocalBlobBackend:
+    """Stores blobs as files under <root>/<sha[:2]>/<sha>/<name>."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, sha256, name):
+        return os.path.join(self.root, sha256[:2], sha256, name)
+
+    def exists(self, sha256, name):
+        return os.path.exists(self.path(sha256, name))
+
+    def write(self, sha256, name, fileobj):
+        path = self.path(sha256, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so concurrent readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(fileobj, out, CHUNK_SIZE)
+        os.replace(tmp_path, path)
+
+    def open(self, sha256, name):
+        return open(self.path(sha256, name), "rb")
+
+    def local_path(self, sha256, name):
+        return self.path(sha256, name)
+
+
+class GridFSBackend:
+    """Stores blobs in GridFS, named "<sha>/<name>"."""
+
+    def __init__(self, db_getter, collection: str = "attachment_blobs"):
+        self._db_getter = db_getter
+        self._collection = collection
+        self._fs = None
+
+    @property
+    def fs(self):
+        if self._fs is None:
+            import gridfs
+            self._fs = gridfs.GridFS(self._db_getter(), collection=self._collection)
+        return self._fs
+
+    def exists(self, sha256, name):
+        return self.fs.exists(filename=f"{sha256}/{name}")
+
+    def write(self, sha256, name, fileobj):
+        self.fs.put(fileobj, filename=f"{sha256}/{name}")
+
+    def open(self, sha256, name):
+        return self.fs.get_last_version(filename=f"{sha256}/{name}")
+
+    def local_path(self, sha256, name):
+        return None
+
+
+class StoredAttachment:
+    """
+    A stored original, exposing the same interface as SpooledUpload (filename,
+    mimetype, size, sha256, path, read_bytes(), close()) so the upload code paths
+    can consume it unchanged. Nothing is read until the content is needed.
+    """
+
+    def __init__(self, meta, backend):
+        self.filename = meta.get("name", meta["_id"])
+        self.mimetype = meta.get("mime_type")
+        self.extension = meta.get("extension", "")
+        self.size = meta.get("size", 0)
+        self.sha256 = meta["_id"]
+        self._backend = backend
+        self._temp_path = None
+        self._local_path = backend.local_path(self.sha256, ORIGINAL)
+
+    @property
+    def path(self):
+        """
+        Path of the content on disk; large GridFS blobs are materialized there
+        (like spooled uploads) on first access. None for small GridFS blobs.
+        """
+        if self._local_path is None and self._temp_path is None and not self.in_memory:
+            with self._backend.open(self.sha256, ORIGINAL) as src, tempfile.NamedTemporaryFile(
+                    prefix="privgpt-attachment-", suffix=f".{self.extension}", delete=False) as out:
+                shutil.copyfileobj(src, out, CHUNK_SIZE)
+            self._temp_path = out.name
+        return self._local_path or self._temp_path
+
+    @property
+    def in_memory(self) -> bool:
+        return self._local_path is None and self.size <= Config.UPLOAD_SPOOL_THRESHOLD
+
+    def read_bytes(self) -> bytes:
+        # Read from the copy on disk if there is one, without spooling a new one
+        path = self._local_path or self._temp_path
+        if path:
+            with open(path, "rb") as f:
+                return f.read()
+        with self._backend.open(self.sha256, ORIGINAL) as f:
+            return f.read()
+
+    def close(self):
+        if self._temp_path and os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+        self._temp_path = None
+
+
+class AttachmentStore:
+    """
+    Content-addressed attachment storage.
+
+    Each distinct file is stored once, keyed by its SHA-256, regardless of how
+    many users or sessions upload it. Metadata lives in the `attachments`
+    collection; derived artifacts (extracted text, downscaled images...) are
+    stored next to the original so later turns can reuse them without parsing.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._write_lock = threading.Lock()
+
+    @property
+    def meta(self):
+        return mongo.db.attachments
+
+    def put(self, upload) -> str:
+        """
+        Stores an upload unless identical content is already stored.
+
+        Args:
+        upload (SpooledUpload): The uploaded file.
+
+        Returns:
+        str: The attachment id (content SHA-256).
+        """
+        sha256 = upload.sha256
+        if self.meta.find_one({"_id": sha256}, {"_id": 1}) is None:
+            with self._write_lock:
+                if not self.backend.exists(sha256, ORIGINAL):
+                    if upload.path:
+                        with open(upload.path, "rb") as f:
+                            self.backend.write(sha256, ORIGINAL, f)
+                    else:
+                        self.backend.write(sha256, ORIGINAL, io.BytesIO(upload.read_bytes()))
+            self.meta.update_one(
+                {"_id": sha256},
+                {"$setOnInsert": {
+                    "name": upload.filename,
+                    "mime_type": upload.mimetype,
+                    "extension": upload.extension,
+                    "size": upload.size,
+                    "created_at": datetime.datetime.utcnow(),
+                    "derived": [],
+                }},
+                upsert=True,
+            )
+        return sha256
+
+    def open(self, sha256):
+        """
+        Returns:
+        StoredAttachment: The stored original, or None if unknown.
+        """
+        meta = self.meta.find_one({"_id": sha256})
+        if not meta:
+            return None
+        return StoredAttachment(meta, self.backend)
+
+    def get_derived(self, sha256, name):
+        """
+        Returns:
+        bytes: A derived artifact, or None if it has not been computed yet.
+        """
+        try:
+            if not self.backend.exists(sha256, name):
+                return None
+            with self.backend.open(sha256, name) as f:
+                return f.read()
+        except Exception as e:
+            logger.error(f"Failed to read derived artifact {name} of {sha256}: {e}")
+            return None
+
+    def has_derived(self, sha256, name) -> bool:
+        """True if a derived artifact has already been computed and stored."""
+        try:
+            return self.backend.exists(sha256, name)
+        except Exception:
+            return False
+
+    def put_derived(self, sha256, name, data: bytes):
+        """Stores a derived artifact next to the original."""
+        with self._write_lock:
+            if not self.backend.exists(sha256, name):
+                self.backend.write(sha256, name, io.BytesIO(data))
+        self.meta.update_one({"_id": sha256}, {"$addToSet": {"derived": name}})
+
+    def get_text(self, attachment) -> str:
+        """
+        Returns the extracted text of a stored PDF, parsing it only the first
+        time the content is seen.
+
+        Args:
+        attachment (SpooledUpload | StoredAttachment): The PDF.
+
+        Returns:
+        str: Extracted plain text.
+        """
+        cached = self.get_derived(attachment.sha256, "text")
+        if cached is not None:
+            return cached.decode("utf-8")
+        text = extract_text_from_pdf_upload(attachment)
+        self.put_derived(attachment.sha256, "text", text.encode("utf-8"))
+        return text
+
+    def get_image(self, attachment):
+        """
+        Returns the downscaled, metadata-free version of an image, looked up in
+        memory, then in the store, and only computed (in the image worker pool)
+        the first time the content is seen.
+
+        Args:
+        attachment (SpooledUpload | StoredAttachment): The image.
+
+        Returns:
+        tuple: (image_bytes, mime_type)
+        """
+        name = processed_image_name()
+        key = (attachment.sha256, name)
+        data = image_cache.get(key)
+        if data is None:
+            data = self.get_derived(attachment.sha256, name)
+            if data is None:
+                data = process_image_in_pool(attachment.read_bytes())
+                self.put_derived(attachment.sha256, name, data)
+            image_cache.set(key, data)
+        return data, processed_image_mime_type()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_attachment_store() -> AttachmentStore:
+    """
+    Returns the process-wide AttachmentStore for the configured backend.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if Config.ATTACHMENT_BACKEND == "local":
+                    backend = LocalBlobBackend(Config.ATTACHMENT_DIR)
+                else:
+                    backend = GridFSBackend(lambda: mongo.db)
+                _store = AttachmentStore(backend)
+    return _store
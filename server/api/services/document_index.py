@@ -0,0 +1,231 @@
+import logging
+import re
+import threading
+import time
+import zlib
+import numpy as np
+from api.config import Config
+from api.services.ollama_pool import get_ollama_pool
+from api.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+HASH_EMBEDDING_DIM = 1024
+EMBED_BATCH_SIZE = 64
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for prompt budgeting."""
+    return len(text) // 4 + 1
+
+
+def chunk_text(text: str, chunk_chars: int, overlap: int) -> list:
+    """
+    Splits text into overlapping chunks of about `chunk_chars` characters,
+    preferring to cut at paragraph or sentence boundaries.
+
+    Returns:
+    list: (start_offset, chunk_text) tuples in document order.
+    """
+    chunks = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(start + chunk_chars, length)
+        if end < length:
+            window = text[start:end]
+            cut = max(window.rfind("\n\n"), window.rfind(". "), window.rfind("\n"))
+            if cut > chunk_chars // 2:
+                end = start + cut + 1
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append((start, chunk))
+        if end >= length:
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+def _hash_embed(texts: list) -> np.ndarray:
+    """
+    Local stand-in embedder: feature-hashed bag of words and bigrams with
+    sublinear term frequency. Needs no model, and is good enough to rank
+    chunks by lexical overlap with the question.
+    """
+    matrix = np.zeros((len(texts), HASH_EMBEDDING_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = _TOKEN_RE.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for feature in features:
+            matrix[row, zlib.crc32(feature.encode("utf-8")) % HASH_EMBEDDING_DIM] += 1.0
+    np.log1p(matrix, out=matrix)
+    return matrix
+
+
+class Embedder:
+    """
+    Embeds text with the local Ollama embedding model, falling back to the
+    hashing embedder when the model is unavailable. After a failure Ollama is
+    not retried for `retry_after` seconds.
+    """
+
+    def __init__(self, model: str, retry_after: float = 60):
+        self.model = model
+        self.retry_after = retry_after
+        self._ollama_down_until = 0.0
+
+    def embed(self, texts: list, prefer: str = None):
+        """
+        Args:
+        texts (list): Texts to embed.
+        prefer (str): Embedder name to use ("ollama:<model>" or "hash"), so that
+                      queries are embedded the same way as the indexed chunks.
+
+        Returns:
+        tuple: (embedder_name, float32 matrix with one row per text)
+        """
+        ollama_name = f"ollama:{self.model}"
+        if prefer == ollama_name:
+            return ollama_name, self._ollama_embed(texts)
+        if prefer != "hash" and self.model and time.monotonic() >= self._ollama_down_until:
+            try:
+                return ollama_name, self._ollama_embed(texts)
+            except Exception as e:
+                logger.warning(f"Embedding model {self.model} unavailable, using hashing embedder: {e}")
+                self._ollama_down_until = time.monotonic() + self.retry_after
+        return "hash", _hash_embed(texts)
+
+    def _ollama_embed(self, texts):
+        vectors = []
+        for i in range(0, len(texts), EMBED_BATCH_SIZE):
+            res = get_ollama_pool().post(
+                self.model, "/api/embed",
+                json={"model": self.model, "input": texts[i:i + EMBED_BATCH_SIZE]},
+                timeout=60,
+            )
+            res.raise_for_status()
+            vectors.extend(res.json()["embeddings"])
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class DocumentIndex:
+    """
+    Chunked, embedded copy of one document. Rows of `matrix` are unit vectors,
+    so cosine similarity against a query is a single matrix-vector product.
+    """
+
+    def __init__(self, chunks: list, matrix: np.ndarray, embedder_name: str):
+        self.chunks = chunks
+        self.matrix = _normalize(matrix)
+        self.embedder_name = embedder_name
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + sum(len(c) for _, c in self.chunks)
+
+    def scores(self, query_vector: np.ndarray) -> np.ndarray:
+        return self.matrix @ query_vector
+
+
+_embedder = Embedder(Config.EMBEDDING_MODEL)
+# Indexes keyed by document content hash, shared by every session using the document
+_indexes = LRUCache(max_size=Config.DOCUMENT_INDEX_CACHE_MB * 1024 * 1024, sizeof=lambda index: index.nbytes)
+# sha256 -> lock held while that document is embedded; other documents build concurrently
+_build_locks = {}
+_build_locks_guard = threading.Lock()
+
+
+def get_document_index(sha256: str, text: str) -> DocumentIndex:
+    """
+    Returns the index of a document, building (chunking + embedding) it on first use.
+    Concurrent requests for the same document wait for a single build.
+
+    Args:
+    sha256 (str): Content hash of the source document.
+    text (str): Extracted document text.
+
+    Returns:
+    DocumentIndex: The cached or newly built index.
+    """
+    index = _indexes.get(sha256)
+    if index is not None:
+        return index
+    with _build_locks_guard:
+        build_lock = _build_locks.setdefault(sha256, threading.Lock())
+    try:
+        with build_lock:
+            index = _indexes.get(sha256)
+            if index is None:
+                chunks = chunk_text(text, Config.RETRIEVAL_CHUNK_CHARS, Config.RETRIEVAL_CHUNK_OVERLAP)
+                embedder_name, matrix = _embedder.embed([c for _, c in chunks] or [""])
+                index = DocumentIndex(chunks, matrix[:len(chunks)], embedder_name)
+                _indexes.set(sha256, index)
+    finally:
+        with _build_locks_guard:
+            _build_locks.pop(sha256, None)
+    return index
+
+
+def retrieve_document_context(documents: list, query: str, token_budget: int = None) -> str:
+    """
+    Selects the parts of the given documents most relevant to the query.
+
+    Documents that fit in the token budget as a whole are returned unchanged.
+    Otherwise each document is searched by cosine similarity (top-k per index)
+    and the best chunks across all documents are kept until the budget is
+    spent, then emitted in document order.
+
+    Args:
+    documents (list): (sha256, text) pairs of the documents attached to the session.
+    query (str): The user's question.
+    token_budget (int): Maximum tokens of context (defaults to RETRIEVAL_TOKEN_BUDGET).
+
+    Returns:
+    str: Context to inject into the prompt.
+    """
+    token_budget = Config.RETRIEVAL_TOKEN_BUDGET if token_budget is None else token_budget
+    documents = [(sha, text) for sha, text in documents if text]
+    if not documents:
+        return ""
+    if sum(estimate_tokens(text) for _, text in documents) <= token_budget:
+        return "\n\n".join(text for _, text in documents)
+
+    candidates = []
+    query_vectors = {}
+    for doc_number, (sha, text) in enumerate(documents):
+        index = get_document_index(sha, text)
+        if not index.chunks:
+            continue
+        if index.embedder_name not in query_vectors:
+            try:
+                _, vector = _embedder.embed([query], prefer=index.embedder_name)
+                query_vectors[index.embedder_name] = _normalize(vector)[0]
+            except Exception as e:
+                logger.warning(f"Query embedding failed, keeping leading chunks: {e}")
+                query_vectors[index.embedder_name] = None
+        if query_vectors[index.embedder_name] is None:
+            scores = -np.arange(len(index.chunks), dtype=np.float32)
+        else:
+            scores = index.scores(query_vectors[index.embedder_name])
+        top_k = min(Config.RETRIEVAL_TOP_K, len(scores))
+        for chunk_number in np.argpartition(-scores, top_k - 1)[:top_k]:
+            candidates.append((float(scores[chunk_number]), doc_number, int(chunk_number), index))
+
+    selected = []
+    used = 0
+    for score, doc_number, chunk_number, index in sorted(candidates, key=lambda c: -c[0]):
+        cost = estimate_tokens(index.chunks[chunk_number][1])
+        if used + cost > token_budget:
+            continue
+        selected.append((doc_number, index.chunks[chunk_number][0], index.chunks[chunk_number][1]))
+        used += cost
+
+    selected.sort()
+    return "\n[...]\n".join(chunk for _, _, chunk in selected)
@@ -0,0 +1,249 @@
+import logging
+import random
+import threading
+import time
+from api.config import Config
+from api.metrics import record_gemini_request, record_gemini_retry, record_gemini_throttle
+from api.ratelimit import MemoryStore, TokenBucket, limiter
+from api.ratelimit.algorithms import parse_rate
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL_NAME = "models/gemini-2.5-flash"
+
+# google.generativeai takes a long time to import, so it is only loaded (and
+# configured) the first time Gemini is actually used, not at app startup
+_genai = None
+_default_model = None
+_lock = threading.Lock()
+
+
+def get_genai():
+    """
+    Imports and configures the google.generativeai module on first use.
+
+    Returns:
+    module: The configured google.generativeai module.
+    """
+    global _genai
+    if _genai is None:
+        with _lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=Config.GEMINI_API_KEY)
+                _genai = genai
+    return _genai
+
+
+def get_gemini_model(system_prompt: str = None):
+    """
+    Returns the Gemini model, with a system instruction if one is given.
+
+    Args:
+    system_prompt (str): Optional system instruction.
+
+    Returns:
+    GenerativeModel: The model, or None if Gemini could not be configured.
+    """
+    global _default_model
+    try:
+        if system_prompt:
+            return get_genai().GenerativeModel(GEMINI_MODEL_NAME, system_instruction=system_prompt)
+        if _default_model is None:
+            _default_model = get_genai().GenerativeModel(GEMINI_MODEL_NAME)
+        return _default_model
+    except Exception as e:
+        print(f"Warning: Gemini API not configured correctly: {e}")
+        return None
+
+
+def upload_gemini_file(path: str, mime_type: str):
+    """
+    Uploads a file through the Gemini File API.
+
+    Returns:
+    File: Handle usable as a content part.
+    """
+    return get_genai().upload_file(path=path, mime_type=mime_type)
+
+
+# HTTP statuses worth retrying: timeouts, quota (429) and transient server errors
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class GeminiQuotaError(Exception):
+    """Raised when the client-side quota did not free up in time."""
+
+
+def _status_code(error: Exception):
+    # google.api_core errors carry the HTTP status as `code` (grpc errors have a method)
+    code = getattr(error, "code", None)
+    try:
+        return int(code) if code is not None and not callable(code) else None
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_reason(error: Exception):
+    """
+    Returns:
+    str: Why `error` is worth retrying (status code or error type), or None.
+    """
+    code = _status_code(error)
+    if code in RETRYABLE_STATUSES:
+        return str(code)
+    if isinstance(error, (ConnectionError, TimeoutError)) or type(error).__name__ in ("ConnectionError", "Timeout", "ConnectTimeout", "ReadTimeout"):
+        return type(error).__name__
+    return None
+
+
+class GeminiProvider:
+    """
+    Gemini calls with a deadline, retries and a client-side quota.
+
+    Every attempt first takes a token from a token bucket sized like the API
+    quota (`rate`, "<requests>/<seconds>"): bursts above it wait up to
+    `queue_seconds` for a token instead of failing with 429. Timeouts, 429s and
+    5xx errors are retried with exponential backoff and full jitter until
+    `max_retries` or the `deadline` (seconds for the whole call, waits
+    included) runs out. Streams are only retried before their first chunk.
+    """
+
+    def __init__(self, store=None, rate: str = None, deadline: float = 60, max_retries: int = 3,
+                 queue_seconds: float = 10, backoff_base: float = 0.5, backoff_max: float = 8,
+                 stream_timeout: float = 300):
+        self.store = store or MemoryStore(shards=1)
+        self.bucket = TokenBucket(*parse_rate(rate)) if rate else None
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.queue_seconds = queue_seconds
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stream_timeout = stream_timeout
+
+    def _acquire(self, expires: float):
+        """Waits for a quota token; raises GeminiQuotaError past `queue_seconds` or the deadline."""
+        if self.bucket is None:
+            return
+        started = time.monotonic()
+        give_up = min(started + self.queue_seconds, expires)
+        while True:
+            try:
+                allowed, retry_after = self.store.update("gemini:quota", self.bucket, time.time())
+            except Exception as e:
+                # A broken shared store must not block Gemini altogether
+                logger.error(f"Gemini quota store error: {str(e)}")
+                allowed, retry_after = True, 0.0
+            now = time.monotonic()
+            if allowed:
+                record_gemini_throttle(now - started)
+                return
+            if now + retry_after > give_up:
+                record_gemini_throttle(now - started, rejected=True)
+                raise GeminiQuotaError(f"Gemini request quota reached, retry in {max(1, int(retry_after + 0.999))}s")
+            time.sleep(retry_after)
+
+    def _backoff(self, attempt: int, error: Exception, expires: float):
+        """Sleeps before retry `attempt`, or re-raises `error` when retrying is not allowed."""
+        reason = retry_reason(error)
+        if reason is None or attempt > self.max_retries:
+            raise error
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+        if time.monotonic() + delay >= expires:
+            raise error
+        record_gemini_retry(reason)
+        logger.warning(f"Gemini call failed ({reason}), retry {attempt} in {delay:.2f}s: {error}")
+        time.sleep(delay)
+
+    @staticmethod
+    def _model(system_prompt: str):
+        model = get_gemini_model(system_prompt)
+        if model is None:
+            raise RuntimeError("Gemini API is not configured")
+        return model
+
+    def generate(self, contents, generation_config=None, system_prompt: str = None):
+        """
+        Non-streamed generate_content() with deadline, retries and quota.
+
+        Returns:
+        GenerateContentResponse: The first successful response.
+        """
+        expires = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            try:
+                self._acquire(expires)
+                model = self._model(system_prompt)
+                response = model.generate_content(
+                    contents, generation_config=generation_config,
+                    request_options={"timeout": max(1.0, expires - time.monotonic())},
+                )
+                record_gemini_request("success")
+                return response
+            except GeminiQuotaError:
+                record_gemini_request("throttled")
+                raise
+            except Exception as e:
+                attempt += 1
+                try:
+                    self._backoff(attempt, e, expires)
+                except Exception:
+                    record_gemini_request("error")
+                    raise
+
+    def stream(self, contents, generation_config=None, system_prompt: str = None):
+        """
+        Streamed generate_content(): yields the response chunks. Errors before
+        the first chunk are retried like generate(); later ones are raised.
+        """
+        expires = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            try:
+                self._acquire(expires)
+                model = self._model(system_prompt)
+                chunks = iter(model.generate_content(
+                    contents, generation_config=generation_config, stream=True,
+                    request_options={"timeout": self.stream_timeout},
+                ))
+                first = next(chunks, None)
+                break
+            except GeminiQuotaError:
+                record_gemini_request("throttled")
+                raise
+            except Exception as e:
+                attempt += 1
+                try:
+                    self._backoff(attempt, e, expires)
+                except Exception:
+                    record_gemini_request("error")
+                    raise
+        record_gemini_request("success")
+        if first is not None:
+            yield first
+            yield from chunks
+
+
+_provider = None
+
+
+def get_gemini_provider() -> GeminiProvider:
+    """
+    Returns the process-wide GeminiProvider, creating it on first use. Its quota
+    lives in the rate limiter's store, so it is shared by all workers with
+    RATE_LIMIT_BACKEND=mongo.
+    """
+    global _provider
+    if _provider is None:
+        with _lock:
+            if _provider is None:
+                _provider = GeminiProvider(
+                    store=limiter.rate_limiter.store if limiter.rate_limiter is not None else None,
+                    rate=Config.GEMINI_RATE_LIMIT,
+                    deadline=Config.GEMINI_DEADLINE_SECONDS,
+                    max_retries=Config.GEMINI_MAX_RETRIES,
+                    queue_seconds=Config.GEMINI_QUEUE_SECONDS,
+                    stream_timeout=Config.GEMINI_STREAM_TIMEOUT_SECONDS,
+                )
+    return _provider
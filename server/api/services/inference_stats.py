@@ -0,0 +1,218 @@
+import bisect
+import datetime
+import logging
+from pymongo.errors import DuplicateKeyError
+from api import mongo
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds; a value v falls in the first bucket with v <= bound,
+# values above the last bound in an open-ended bucket
+LATENCY_EDGES_MS = (50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 7500,
+                    10000, 15000, 20000, 30000, 60000, 120000)
+TOKENS_PER_SECOND_EDGES = (1, 2, 5, 10, 15, 20, 30, 40, 50, 75, 100, 150, 200, 300)
+
+# Histogrammed message stats -> bucket edges
+HISTOGRAMS = {
+    "latency_ms": LATENCY_EDGES_MS,
+    "ttft_ms": LATENCY_EDGES_MS,
+    "tokens_per_second": TOKENS_PER_SECOND_EDGES,
+}
+
+GRANULARITIES = ("hour", "day", "total")
+
+_index_ready = False
+
+
+def ollama_token_stats(data: dict) -> dict:
+    """Token counts and generation speed from an Ollama response (or final stream chunk)."""
+    stats = {"prompt_tokens": data.get("prompt_eval_count"), "eval_tokens": data.get("eval_count")}
+    if data.get("eval_count") and data.get("eval_duration"):
+        stats["tokens_per_second"] = round(data["eval_count"] / (data["eval_duration"] / 1e9), 2)
+    return stats
+
+
+def gemini_token_stats(response) -> dict:
+    """Token counts from the usage metadata of a Gemini response or stream chunk (empty if absent)."""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return {}
+    return {
+        "prompt_tokens": getattr(usage, "prompt_token_count", None),
+        "eval_tokens": getattr(usage, "candidates_token_count", None),
+    }
+
+
+def build_message_stats(provider: str, latency_ms: int, ttft_ms: int = None, token_stats: dict = None,
+                        fallback_used: bool = False, cache_hit: bool = None) -> dict:
+    """
+    Builds the `stats` stored on a bot message.
+
+    Args:
+    provider (str): "ollama" or "gemini" (the provider that actually answered).
+    latency_ms (int): Total generation time.
+    ttft_ms (int): Time to first token (streaming only).
+    token_stats (dict): prompt_tokens, eval_tokens and optionally tokens_per_second.
+    fallback_used (bool): True if the requested model failed and Gemini answered.
+    cache_hit (bool): True if every attached document was served from the attachment
+                      store without parsing (None when there were no documents).
+
+    Returns:
+    dict: Message stats.
+    """
+    token_stats = token_stats or {}
+    stats = {
+        "provider": provider,
+        "latency_ms": latency_ms,
+        "ttft_ms": ttft_ms,
+        "prompt_tokens": token_stats.get("prompt_tokens"),
+        "eval_tokens": token_stats.get("eval_tokens"),
+        "tokens_per_second": token_stats.get("tokens_per_second"),
+        "fallback_used": fallback_used,
+        "cache_hit": cache_hit,
+    }
+    if stats["tokens_per_second"] is None and stats["eval_tokens"] and latency_ms:
+        # No server-side timing (Gemini): measure over the generation phase
+        generation_ms = latency_ms - (ttft_ms or 0)
+        if generation_ms > 0:
+            stats["tokens_per_second"] = round(stats["eval_tokens"] / (generation_ms / 1000), 2)
+    return stats
+
+
+def _ensure_index():
+    global _index_ready
+    if not _index_ready:
+        mongo.db.model_stats_rollups.create_index([("model", 1), ("bucket", 1)], unique=True)
+        _index_ready = True
+
+
+def record_rollup(model_name: str, stats: dict, timestamp: datetime.datetime = None):
+    """
+    Adds one message's stats to the hourly rollup of its model: counters, sums
+    and histogram bucket counts, updated with a single $inc upsert.
+    Failures are logged and never affect the chat request.
+    """
+    timestamp = timestamp or datetime.datetime.now()
+    bucket = timestamp.replace(minute=0, second=0, microsecond=0)
+    inc = {
+        "count": 1,
+        "fallback_count": int(bool(stats.get("fallback_used"))),
+        "cache_hits": int(stats.get("cache_hit") is True),
+        "prompt_tokens": stats.get("prompt_tokens") or 0,
+        "eval_tokens": stats.get("eval_tokens") or 0,
+    }
+    for field, edges in HISTOGRAMS.items():
+        value = stats.get(field)
+        if value is None:
+            continue
+        inc[f"{field}_sum"] = value
+        inc[f"{field}_count"] = 1
+        inc[f"{field}_hist.b{bisect.bisect_left(edges, value)}"] = 1
+
+    try:
+        _ensure_index()
+        for attempt in range(2):
+            try:
+                mongo.db.model_stats_rollups.update_one(
+                    {"model": model_name, "bucket": bucket}, {"$inc": inc}, upsert=True)
+                break
+            except DuplicateKeyError:
+                # Two first writers raced on the upsert; the retry updates the winner's doc
+                if attempt:
+                    raise
+    except Exception as e:
+        logger.error(f"Failed to record stats rollup for {model_name}: {e}")
+
+
+def histogram_percentile(counts: list, edges: tuple, q: float):
+    """
+    Estimates the q-th percentile from histogram bucket counts, interpolating
+    linearly inside the bucket (the open-ended last bucket returns its lower bound).
+    """
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for i, count in enumerate(counts):
+        if count and seen + count >= rank:
+            lower = edges[i - 1] if i > 0 else 0
+            if i >= len(edges):
+                return lower
+            return round(lower + (edges[i] - lower) * (rank - seen) / count, 2)
+        seen += count
+    return edges[-1]
+
+
+def _bucket_expression(granularity: str):
+    if granularity == "hour":
+        return "$bucket"
+    if granularity == "day":
+        return {"$dateFromParts": {
+            "year": {"$year": "$bucket"}, "month": {"$month": "$bucket"}, "day": {"$dayOfMonth": "$bucket"},
+        }}
+    return None
+
+
+def model_performance(since: datetime.datetime, until: datetime.datetime, granularity: str = "hour",
+                      model_name: str = None) -> list:
+    """
+    Per-model performance from the rollups, grouped by time bucket.
+
+    Args:
+    since, until (datetime): Time range (rollup hours in [since, until)).
+    granularity (str): "hour", "day" or "total" (one row per model).
+    model_name (str): Restrict to one model.
+
+    Returns:
+    list: One dict per (model, bucket) with counts, averages and p50/p95/p99 of
+    latency, TTFT and tokens/sec.
+    """
+    match = {"bucket": {"$gte": since, "$lt": until}}
+    if model_name:
+        match["model"] = model_name
+
+    group = {
+        "_id": {"model": "$model", "bucket": _bucket_expression(granularity)},
+        "count": {"$sum": "$count"},
+        "fallback_count": {"$sum": "$fallback_count"},
+        "cache_hits": {"$sum": "$cache_hits"},
+        "prompt_tokens": {"$sum": "$prompt_tokens"},
+        "eval_tokens": {"$sum": "$eval_tokens"},
+    }
+    for field, edges in HISTOGRAMS.items():
+        group[f"{field}_sum"] = {"$sum": f"${field}_sum"}
+        group[f"{field}_count"] = {"$sum": f"${field}_count"}
+        for i in range(len(edges) + 1):
+            group[f"{field}_b{i}"] = {"$sum": f"${field}_hist.b{i}"}
+
+    pipeline = [
+        {"$match": match},
+        {"$group": group},
+        {"$sort": {"_id.model": 1, "_id.bucket": 1}},
+    ]
+
+    rows = []
+    for doc in mongo.db.model_stats_rollups.aggregate(pipeline):
+        bucket = doc["_id"].get("bucket")
+        row = {
+            "model": doc["_id"]["model"],
+            "bucket": bucket.isoformat() if bucket else None,
+            "messages": doc["count"],
+            "fallback_rate": round(doc["fallback_count"] / doc["count"], 4) if doc["count"] else None,
+            "cache_hits": doc["cache_hits"],
+            "prompt_tokens": doc["prompt_tokens"],
+            "eval_tokens": doc["eval_tokens"],
+        }
+        for field, edges in HISTOGRAMS.items():
+            counts = [doc.get(f"{field}_b{i}", 0) for i in range(len(edges) + 1)]
+            observed = doc[f"{field}_count"]
+            row[field] = {
+                "count": observed,
+                "avg": round(doc[f"{field}_sum"] / observed, 2) if observed else None,
+                "p50": histogram_percentile(counts, edges, 0.50),
+                "p95": histogram_percentile(counts, edges, 0.95),
+                "p99": histogram_percentile(counts, edges, 0.99),
+            }
+        rows.append(row)
+    return rows
@@ -0,0 +1,171 @@
+import logging
+import re
+from api import mongo
+from api.utils.message_codec import message_content
+
+logger = logging.getLogger(__name__)
+
+# Characters of message text returned around the first match
+SNIPPET_CHARS = 160
+SNIPPET_LEAD = 60
+
+MAX_QUERY_CHARS = 200
+
+# Only what is needed to locate hits and build snippets
+SEARCH_PROJECTION = {"session_name": 1, "messages.role": 1, "messages.content": 1,
+                     "messages.content_codec": 1, "messages.timestamp": 1}
+
+TEXT_INDEX_NAME = "sessions_text"
+
+_index_ready = False
+
+
+def ensure_text_index():
+    """
+    Creates the text index over message contents (and session names) on first
+    use. Returns False if the database cannot build one.
+    """
+    global _index_ready
+    if not _index_ready:
+        try:
+            # Compressed messages (see message_codec) are indexed through their search terms
+            mongo.db.sessions.create_index(
+                [("messages.content", "text"), ("messages.search_terms", "text"), ("session_name", "text")],
+                name=TEXT_INDEX_NAME,
+                weights={"messages.content": 10, "messages.search_terms": 10, "session_name": 2},
+            )
+            _index_ready = True
+        except Exception as e:
+            logger.warning(f"Text index unavailable, searching with regular expressions: {e}")
+            return False
+    return True
+
+
+def query_terms(text: str) -> list:
+    """Words of a search query, lowercased and deduplicated (quotes and negations dropped)."""
+    terms = []
+    for word in re.findall(r"\w+", text.lower()):
+        if word not in terms:
+            terms.append(word)
+    return terms
+
+
+def term_prefix(term: str) -> str:
+    """Strips common English suffixes, so highlights also find the other word forms the index matched."""
+    for suffix in ("ing", "es", "ed", "s"):
+        if term.endswith(suffix) and len(term) - len(suffix) >= 3:
+            return term[:-len(suffix)]
+    return term
+
+
+def match_offsets(content: str, pattern) -> list:
+    """
+    Returns:
+    list: [start, end] character offsets of every match in `content`.
+    """
+    return [[m.start(), m.end()] for m in pattern.finditer(content)]
+
+
+def build_snippet(content: str, offsets: list) -> tuple:
+    """
+    Cuts the text around the first match, on word boundaries where possible.
+
+    Returns:
+    tuple: (snippet, highlights) with highlight offsets relative to the snippet.
+    """
+    start = max(0, offsets[0][0] - SNIPPET_LEAD)
+    if start:
+        space = content.find(" ", start, offsets[0][0])
+        start = space + 1 if space != -1 else start
+    end = min(len(content), start + SNIPPET_CHARS)
+    if end < len(content):
+        space = content.rfind(" ", offsets[0][1], end)
+        end = space if space != -1 else end
+
+    prefix = "…" if start else ""
+    snippet = prefix + content[start:end] + ("…" if end < len(content) else "")
+    highlights = [
+        [s - start + len(prefix), min(e, end) - start + len(prefix)]
+        for s, e in offsets if s >= start and s < end
+    ]
+    return snippet, highlights
+
+
+def _sessions(scope: dict, text: str):
+    """Sessions in `scope` matching `text`, best first, text index if possible."""
+    if ensure_text_index():
+        try:
+            cursor = mongo.db.sessions.find(
+                {**scope, "$text": {"$search": text}},
+                {**SEARCH_PROJECTION, "score": {"$meta": "textScore"}},
+            ).sort([("score", {"$meta": "textScore"})])
+            # Surface a missing or unusable index now rather than mid-iteration
+            first = next(cursor, None)
+            if first is not None:
+                yield first
+                yield from cursor
+            return
+        except Exception as e:
+            logger.warning(f"Text search failed, searching with regular expressions: {e}")
+
+    terms = query_terms(text)
+    pattern = "|".join(re.escape(t) for t in terms)
+    yield from mongo.db.sessions.find(
+        {**scope, "$or": [{field: {"$regex": pattern, "$options": "i"}}
+                          for field in ("messages.content", "messages.search_terms", "session_name")]},
+        SEARCH_PROJECTION,
+    ).sort("updated_at", -1)
+
+
+def search_messages(scope: dict, text: str, offset: int = 0, limit: int = 20) -> dict:
+    """
+    Full-text search over the messages of the sessions matching `scope`.
+
+    Sessions are ranked by text score (the text index stems words, so "searches"
+    also finds "search"); within a session, hits follow message order. Only the
+    sessions needed for the requested page are read, with a projection
+    limited to message roles, contents and timestamps.
+
+    Args:
+    scope (dict): MongoDB filter restricting the searched sessions.
+    text (str): Search query.
+    offset (int): Number of hits to skip.
+    limit (int): Maximum number of hits to return.
+
+    Returns:
+    dict: {"hits": [...], "next_offset": int or None}. Each hit has the session
+    id and name, the message index, role and timestamp, a snippet with
+    highlight offsets, and the match offsets in the full message.
+    """
+    terms = query_terms(text)
+    if not terms:
+        return {"hits": [], "next_offset": None}
+    # Word-prefix matches approximate the index's stemming for highlighting
+    pattern = re.compile(r"\b(?:" + "|".join(re.escape(term_prefix(t)) for t in terms) + r")\w*", re.IGNORECASE)
+
+    hits = []
+    seen = 0
+    for session in _sessions(scope, text):
+        for index, message in enumerate(session.get("messages", [])):
+            content = message_content(message) or ""
+            offsets = match_offsets(content, pattern)
+            if not offsets:
+                continue
+            seen += 1
+            if seen <= offset:
+                continue
+            if len(hits) == limit:
+                return {"hits": hits, "next_offset": offset + limit}
+            snippet, highlights = build_snippet(content, offsets)
+            timestamp = message.get("timestamp")
+            hits.append({
+                "session_id": str(session["_id"]),
+                "session_name": session.get("session_name"),
+                "message_index": index,
+                "role": message.get("role"),
+                "timestamp": timestamp.isoformat() if hasattr(timestamp, "isoformat") else timestamp,
+                "snippet": snippet,
+                "highlights": highlights,
+                "offsets": offsets,
+            })
+    return {"hits": hits, "next_offset": None}
@@ -0,0 +1,208 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from api.config import Config
+from api.services import ollama_services
+from api.utils.http_cache import make_etag
+
+logger = logging.getLogger(__name__)
+
+
+class ModelCatalog:
+    """
+    In-memory catalog of local Ollama models.
+
+    The tag list is refreshed by a background thread every `refresh_interval`
+    seconds, and /api/show results are cached by model digest (they only change
+    when a model is pulled again); failed lookups (unknown models) are cached
+    for `miss_ttl` seconds. Upstream calls are single-flight: concurrent callers
+    wait for the in-progress refresh, or the in-progress /api/show call for the
+    same model, instead of issuing their own.
+    """
+
+    def __init__(self, refresh_interval: float = 30, details_cache_size: int = 128, miss_ttl: float = 10):
+        self.refresh_interval = refresh_interval
+        self.details_cache_size = details_cache_size
+        self.miss_ttl = miss_ttl
+        self._models = []
+        self._digests = {}
+        self._etag = make_etag()
+        self._refreshed_at = 0.0
+        self._details = OrderedDict()
+        # cache key -> monotonic time until which the model is reported as unknown
+        self._missing = OrderedDict()
+        # cache key -> lock held by the thread fetching that model's details
+        self._details_inflight = {}
+        self._refresh_lock = threading.Lock()
+        # Guards the caches above; never held during an upstream call
+        self._details_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ----- background refresh -----
+
+    def start(self):
+        """
+        Starts the background refresh thread (idempotent). Started lazily on first
+        use so that forked workers each run their own refresher.
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="model-catalog-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.refresh_interval)
+
+    def refresh(self):
+        """
+        Reloads the tag list from Ollama. If a refresh is already running, waits
+        for it to finish and reuses its result. If Ollama cannot be reached, the
+        last list is kept until the next refresh.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            # Another thread is already talking to Ollama; piggyback on its result
+            with self._refresh_lock:
+                return
+        try:
+            try:
+                models = ollama_services.fetch_model_tags()
+            except Exception as e:
+                logger.warning(f"Model catalog refresh failed, keeping the last model list: {e}")
+                # Retried by the next background refresh, not by every request
+                self._refreshed_at = time.monotonic()
+                return
+            models = sorted(models, key=lambda m: m.get("name", ""))
+            digests = {}
+            for m in models:
+                for key in (m.get("name"), m.get("model")):
+                    if key:
+                        digests[key] = m.get("digest")
+            # Swap in new state atomically (single reference assignments)
+            self._models = models
+            self._digests = digests
+            self._etag = make_etag(*(f"{m.get('name')}@{m.get('digest')}" for m in models))
+            self._refreshed_at = time.monotonic()
+        finally:
+            self._refresh_lock.release()
+
+    def _ensure_fresh(self):
+        self.start()
+        # Cold start, or the refresher could not keep up (e.g. serverless freeze)
+        if time.monotonic() - self._refreshed_at > self.refresh_interval * 2:
+            self.refresh()
+
+    # ----- read API -----
+
+    def models(self):
+        """
+        Returns:
+        list: Raw model dictionaries from the last /api/tags refresh.
+        """
+        self._ensure_fresh()
+        return self._models
+
+    def model_names(self):
+        """
+        Returns:
+        list: Sorted full model names (e.g. "gemma3:1b").
+        """
+        return [m["name"] for m in self.models() if "name" in m]
+
+    def etag(self):
+        """
+        Returns:
+        str: Validator that changes whenever a model is added, removed or re-pulled.
+        """
+        self._ensure_fresh()
+        return self._etag
+
+    def digest(self, model_name):
+        """
+        Returns:
+        str: Digest of the given model, or None if it is not installed.
+        """
+        self._ensure_fresh()
+        return self._digests.get(model_name)
+
+    def details(self, model_name):
+        """
+        Returns the /api/show payload of a model, served from the digest-keyed cache.
+
+        Args:
+        model_name (str): The name of the model to inspect.
+
+        Returns:
+        dict: Model details, or None if the model is unknown or Ollama failed.
+        """
+        digest = self.digest(model_name)
+        cache_key = digest or f"name:{model_name}"
+        found, details = self._cached_details(cache_key)
+        if found:
+            return details
+        with self._details_lock:
+            fetch_lock = self._details_inflight.setdefault(cache_key, threading.Lock())
+        # Only callers asking for the same model wait for this fetch
+        with fetch_lock:
+            found, details = self._cached_details(cache_key)
+            if found:
+                return details
+            try:
+                details = ollama_services.get_model_details(model_name)
+                with self._details_lock:
+                    if not details:
+                        self._missing[cache_key] = time.monotonic() + self.miss_ttl
+                        if len(self._missing) > self.details_cache_size:
+                            self._missing.popitem(last=False)
+                    elif digest:
+                        self._details[cache_key] = details
+                        if len(self._details) > self.details_cache_size:
+                            self._details.popitem(last=False)
+            finally:
+                with self._details_lock:
+                    self._details_inflight.pop(cache_key, None)
+            return details
+
+    def _cached_details(self, cache_key):
+        """
+        Returns:
+        tuple: (found, details); details is None for a recently failed lookup.
+        """
+        with self._details_lock:
+            cached = self._details.get(cache_key)
+            if cached is not None:
+                self._details.move_to_end(cache_key)
+                return True, cached
+            expires = self._missing.get(cache_key)
+            if expires is not None:
+                if expires > time.monotonic():
+                    return True, None
+                del self._missing[cache_key]
+        return False, None
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_model_catalog() -> ModelCatalog:
+    """
+    Returns the process-wide ModelCatalog, creating it on first use.
+    """
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = ModelCatalog(refresh_interval=Config.MODEL_CATALOG_REFRESH_INTERVAL)
+    return _catalog
@@ -0,0 +1,229 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from api.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Errors meaning the node itself is unreachable or stuck (HTTP errors are answers)
+NODE_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+
+class OllamaNode:
+    """Routing and health state of one Ollama server."""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.leases = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.last_error = None
+        # Installed models (/api/tags) and models loaded in memory (/api/ps);
+        # None until the first successful probe
+        self.tags = None
+        self.loaded = set()
+
+    @property
+    def models(self):
+        return None if self.tags is None else {m.get("name") for m in self.tags}
+
+    def is_ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def describe(self, now: float) -> dict:
+        return {
+            "url": self.url,
+            "healthy": not self.is_ejected(now) and self.consecutive_failures == 0,
+            "ejected_for_s": round(max(0.0, self.ejected_until - now), 1),
+            "outstanding": self.outstanding,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "models": sorted(self.models or ()),
+            "loaded": sorted(self.loaded),
+        }
+
+
+class OllamaPool:
+    """
+    Routes local-model requests across several Ollama servers.
+
+    A request goes to a node that has the model installed, preferring nodes that
+    already have it loaded in memory (no cold load), and among those the node
+    with the fewest requests in flight. Nodes failing `eject_after` times in a
+    row (connection errors or timeouts, from requests or probes) are ejected for
+    `eject_seconds`; after that they get trial traffic again and are readmitted
+    by the first success. Installed and loaded models are refreshed by probe(),
+    which the model catalog calls on every background refresh.
+    """
+
+    def __init__(self, urls: list, eject_after: int = 3, eject_seconds: float = 30, connect_timeout: float = 2):
+        if not urls:
+            raise ValueError("OllamaPool needs at least one node URL")
+        self.nodes = [OllamaNode(url) for url in urls]
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.connect_timeout = connect_timeout
+        self._lock = threading.Lock()
+        self._probe_executor = ThreadPoolExecutor(max_workers=min(8, len(self.nodes)), thread_name_prefix="ollama-probe")
+
+    # ----- health -----
+
+    def _success(self, node: OllamaNode):
+        with self._lock:
+            if node.consecutive_failures or node.ejected_until:
+                logger.info(f"Ollama node {node.url} readmitted")
+            node.consecutive_failures = 0
+            node.ejected_until = 0.0
+            node.last_error = None
+
+    def _failure(self, node: OllamaNode, error: Exception):
+        with self._lock:
+            node.consecutive_failures += 1
+            node.last_error = str(error)
+            if node.consecutive_failures >= self.eject_after:
+                if not node.is_ejected(time.monotonic()):
+                    logger.warning(f"Ollama node {node.url} ejected for {self.eject_seconds}s: {error}")
+                node.ejected_until = time.monotonic() + self.eject_seconds
+
+    # ----- routing -----
+
+    def candidates(self, model: str) -> list:
+        """
+        Returns:
+        list: Nodes to try for `model`, best first.
+        """
+        now = time.monotonic()
+        with self._lock:
+            nodes = [n for n in self.nodes if not n.is_ejected(now)] or list(self.nodes)
+            # Nodes not probed yet may have the model too
+            installed = [n for n in nodes if n.models is None or model in n.models] or nodes
+            return sorted(installed, key=lambda n: (model not in n.loaded, n.outstanding, n.leases))
+
+    def _acquire(self, node: OllamaNode):
+        with self._lock:
+            node.outstanding += 1
+            node.leases += 1
+
+    def _release(self, node: OllamaNode):
+        with self._lock:
+            node.outstanding -= 1
+
+    def post(self, model: str, path: str, timeout: float = 60, **kwargs) -> requests.Response:
+        """
+        POSTs to `path` on the best node for `model`, failing over to the next
+        node when one cannot be reached.
+
+        The node counts as busy until the response is closed, so streamed
+        responses must be closed (or used as a context manager) when done.
+
+        Returns:
+        requests.Response: The response of the first reachable node.
+        """
+        last_error = None
+        for node in self.candidates(model):
+            self._acquire(node)
+            try:
+                response = requests.post(f"{node.url}{path}", timeout=(self.connect_timeout, timeout), **kwargs)
+            except requests.ConnectionError as e:
+                # Nothing was processed; another node can take the request
+                self._release(node)
+                self._failure(node, e)
+                last_error = e
+                continue
+            except Exception as e:
+                self._release(node)
+                if isinstance(e, NODE_ERRORS):
+                    self._failure(node, e)
+                raise
+
+            self._success(node)
+            if response.ok and path == "/api/generate":
+                with self._lock:
+                    node.loaded.add(model)
+            if not kwargs.get("stream"):
+                self._release(node)
+                return response
+            return _release_on_close(response, lambda: self._release(node))
+        raise last_error or requests.ConnectionError("No Ollama nodes configured")
+
+    # ----- discovery -----
+
+    def _probe_node(self, node: OllamaNode):
+        try:
+            tags = requests.get(f"{node.url}/api/tags", timeout=(self.connect_timeout, 5))
+            tags.raise_for_status()
+            ps = requests.get(f"{node.url}/api/ps", timeout=(self.connect_timeout, 5))
+            loaded = {m.get("name") for m in ps.json().get("models", [])} if ps.ok else set()
+        except Exception as e:
+            self._failure(node, e)
+            return
+        with self._lock:
+            node.tags = tags.json().get("models", [])
+            node.loaded = loaded
+        self._success(node)
+
+    def probe(self):
+        """Refreshes health, installed and loaded models of every node, in parallel."""
+        list(self._probe_executor.map(self._probe_node, self.nodes))
+
+    def model_tags(self) -> list:
+        """
+        Returns:
+        list: Union of the models installed on reachable nodes (first node wins
+        on duplicates). Raises if no node could be probed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            probed = [n for n in self.nodes if n.tags is not None and not n.is_ejected(now)]
+            if not probed:
+                errors = "; ".join(f"{n.url}: {n.last_error}" for n in self.nodes if n.last_error)
+                raise requests.ConnectionError(f"No Ollama node reachable ({errors or 'not probed yet'})")
+            union = {}
+            for node in probed:
+                for model in node.tags:
+                    union.setdefault(model.get("name"), model)
+        return list(union.values())
+
+    def describe(self) -> list:
+        now = time.monotonic()
+        with self._lock:
+            return [node.describe(now) for node in self.nodes]
+
+
+def _release_on_close(response: requests.Response, release):
+    close = response.close
+    released = threading.Event()
+
+    def close_and_release():
+        try:
+            close()
+        finally:
+            if not released.is_set():
+                released.set()
+                release()
+    response.close = close_and_release
+    return response
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_ollama_pool() -> OllamaPool:
+    """
+    Returns the process-wide OllamaPool (OLLAMA_NODES), creating it on first use.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = OllamaPool(
+                    Config.OLLAMA_NODES,
+                    eject_after=Config.OLLAMA_EJECT_AFTER,
+                    eject_seconds=Config.OLLAMA_EJECT_SECONDS,
+                    connect_timeout=Config.OLLAMA_CONNECT_TIMEOUT,
+                )
+    return _pool
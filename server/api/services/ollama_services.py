@@ -1,19 +1,40 @@
-import requests
+from api.services.ollama_pool import get_ollama_pool
 
-def get_available_models():
+def fetch_model_tags():
     """
-    Fetches list of available local models from Ollama.
+    Fetches the raw list of local models from the /api/tags endpoint of every
+    Ollama node (also refreshing which models each node has loaded).
+    Raises if no node is reachable.
 
     Returns:
-    list: Names of available local models (with full tags).
+    list: Model dictionaries (name, digest, size, details...), the union across nodes.
+    """
+    pool = get_ollama_pool()
+    pool.probe()
+    return pool.model_tags()
+
+def get_model_tags():
+    """
+    Same as fetch_model_tags(), but returns an empty list on failure.
+
+    Returns:
+    list: Model dictionaries (name, digest, size, details...), empty on failure.
     """
     try:
-        res = requests.get("http://localhost:11434/api/tags", timeout=5)
-        # Return full model names including tags (e.g., "gemma3:1b" instead of just "gemma3")
-        return sorted(m['name'] for m in res.json().get("models", []))
+        return fetch_model_tags()
     except:
         return []
 
+def get_available_models():
+    """
+    Fetches list of available local models from Ollama.
+
+    Returns:
+    list: Names of available local models (with full tags).
+    """
+    # Return full model names including tags (e.g., "gemma3:1b" instead of just "gemma3")
+    return sorted(m['name'] for m in get_model_tags())
+
 def get_model_details(model_name):
     """
     Fetches detailed information for a specific local model from Ollama.
@@ -25,7 +46,7 @@ def get_model_details(model_name):
     dict: The JSON response from Ollama's /api/show endpoint, or None if failed.
     """
     try:
-        res = requests.post("http://localhost:11434/api/show", json={"name": model_name}, timeout=5)
+        res = get_ollama_pool().post(model_name, "/api/show", json={"name": model_name}, timeout=5)
         if res.status_code == 200:
             return res.json()
         return None
@@ -0,0 +1,212 @@
+import datetime
+import gzip
+import io
+import zlib
+from bson import ObjectId, json_util
+from bson.json_util import RELAXED_JSON_OPTIONS
+from api import mongo
+from api.utils.message_codec import encode_message, decode_message
+
+EXPORT_FORMAT = "privgpt-sessions"
+EXPORT_VERSION = 1
+
+# Sessions held in memory per insert_many() during an import
+IMPORT_BATCH_SIZE = 100
+# Longest accepted NDJSON line (a message cannot exceed MongoDB's document limit)
+MAX_LINE_BYTES = 16 * 1024 * 1024
+
+# Session fields carried by export lines; messages are exported as their own lines
+SESSION_FIELDS = ("session_name", "created_at", "updated_at")
+# Uploaded files are described but not linked: an imported sha256 would give
+# access to whatever attachment of this deployment has that hash
+UPLOADED_FILE_FIELDS = ("name", "type", "size")
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class SessionImportError(ValueError):
+    """Raised for malformed import data; `imported` holds what was saved before it."""
+
+    def __init__(self, message: str, imported: dict):
+        super().__init__(message)
+        self.imported = imported
+
+
+def _line(record: dict) -> bytes:
+    # Relaxed extended JSON keeps dates and ObjectIds round-trippable, still readable
+    return (json_util.dumps(record, json_options=RELAXED_JSON_OPTIONS) + "\n").encode("utf-8")
+
+
+def export_lines(query: dict, batch_size: int = 20):
+    """
+    Streams the sessions matching `query` as NDJSON lines: a header, then each
+    session followed by its messages (oldest session first). Sessions are read
+    through a cursor in small batches, so memory use does not grow with the
+    size of the account.
+
+    Yields:
+    bytes: One encoded line per record.
+    """
+    yield _line({"type": "export", "format": EXPORT_FORMAT, "version": EXPORT_VERSION,
+                 "exported_at": datetime.datetime.now()})
+    cursor = mongo.db.sessions.find(query).sort("created_at", 1).batch_size(batch_size)
+    for session in cursor:
+        session_id = str(session["_id"])
+        yield _line({"type": "session", "id": session_id, **{k: session.get(k) for k in SESSION_FIELDS}})
+        for message in session.get("messages", []):
+            yield _line({"type": "message", "session": session_id, **decode_message(message)})
+
+
+def gzip_stream(chunks, level: int = 6, flush_bytes: int = 64 * 1024):
+    """
+    Gzip-compresses a stream of byte chunks incrementally, emitting compressed
+    output roughly every `flush_bytes` of input.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    pending = 0
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_bytes:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def open_import_stream(stream):
+    """
+    Wraps a request body for line reading, decompressing it if it is gzip.
+
+    Returns:
+    file-like: Binary stream supporting readline().
+    """
+    buffered = stream if hasattr(stream, "peek") else io.BufferedReader(stream, 64 * 1024)
+    if buffered.peek(2)[:2] == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=buffered, mode="rb")
+    return buffered
+
+
+def _as_datetime(value, default: datetime.datetime) -> datetime.datetime:
+    # Dates arrive as datetimes from extended JSON; accept ISO strings, else use the default
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return default
+
+
+def _import_message(record: dict, default_time: datetime.datetime) -> dict:
+    """Builds a message document from an import record, keeping known fields only."""
+    message = {"role": record["role"], "content": record["content"],
+               "timestamp": _as_datetime(record.get("timestamp"), default_time)}
+    if record.get("role") == "bot" and isinstance(record.get("model_name"), str):
+        message["model_name"] = record["model_name"]
+    if isinstance(record.get("stats"), dict):
+        message["stats"] = record["stats"]
+    if isinstance(record.get("uploaded_file"), dict):
+        message["uploaded_file"] = {k: record["uploaded_file"][k] for k in UPLOADED_FILE_FIELDS
+                                    if k in record["uploaded_file"]}
+    return message
+
+
+def import_sessions(stream, user_id: str = None, batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """
+    Imports an NDJSON export (see export_lines()) from a binary stream.
+
+    Every session gets a new id (ids from the source deployment are remapped),
+    belongs to `user_id` (None for guests) and is appended to the user's
+    session list. Only known session and message fields are stored; dates that
+    are missing or invalid are set to the time of import. Sessions are saved with insert_many() in batches of
+    `batch_size`, so memory use is bounded by one batch.
+
+    Args:
+    stream: Binary file-like object with readline() (see open_import_stream()).
+    user_id (str): Owner of the imported sessions, or None for guest sessions.
+    batch_size (int): Sessions per insert_many().
+
+    Returns:
+    dict: {"sessions": int, "messages": int, "id_map": {old_id: new_id}}.
+
+    Raises:
+    SessionImportError: On malformed data; the batches saved before it are kept.
+    """
+    owner = ObjectId(user_id) if user_id else None
+    imported = {"sessions": 0, "messages": 0, "id_map": {}}
+    batch = []
+    current = None
+    current_source_id = None
+
+    def flush():
+        if not batch:
+            return
+        mongo.db.sessions.insert_many([doc for _, doc in batch], ordered=True)
+        new_ids = [str(doc["_id"]) for _, doc in batch]
+        if owner:
+            mongo.db.users.update_one({"_id": owner}, {"$push": {"chat_sessions": {"$each": new_ids}}})
+        for source_id, doc in batch:
+            imported["id_map"][source_id] = str(doc["_id"])
+            imported["messages"] += len(doc["messages"])
+        imported["sessions"] += len(batch)
+        batch.clear()
+
+    line_number = 0
+    header_seen = False
+    while True:
+        raw = stream.readline(MAX_LINE_BYTES + 1)
+        if not raw:
+            break
+        line_number += 1
+        if len(raw) > MAX_LINE_BYTES:
+            raise SessionImportError(f"Line {line_number} is too long", imported)
+        if not raw.strip():
+            continue
+        try:
+            record = json_util.loads(raw)
+        except (ValueError, TypeError) as e:
+            raise SessionImportError(f"Line {line_number} is not valid JSON: {e}", imported)
+        kind = record.pop("type", None) if isinstance(record, dict) else None
+
+        if not header_seen:
+            if kind != "export" or record.get("format") != EXPORT_FORMAT:
+                raise SessionImportError("Not a session export (missing header line)", imported)
+            if record.get("version", 0) > EXPORT_VERSION:
+                raise SessionImportError(f"Unsupported export version {record.get('version')}", imported)
+            header_seen = True
+            continue
+
+        if kind == "session":
+            if current is not None:
+                batch.append((current_source_id, current))
+                if len(batch) >= batch_size:
+                    flush()
+            now = datetime.datetime.now()
+            current_source_id = str(record.get("id"))
+            name = record.get("session_name")
+            current = {
+                "_id": ObjectId(),
+                "session_name": name if isinstance(name, str) and name else "Imported chat",
+                "messages": [],
+                "created_at": _as_datetime(record.get("created_at"), now),
+                "updated_at": _as_datetime(record.get("updated_at"), now),
+                "user_id": user_id,
+                "version": 1,
+            }
+        elif kind == "message":
+            if current is None or str(record.pop("session", None)) != current_source_id:
+                raise SessionImportError(f"Line {line_number}: message outside of its session", imported)
+            if record.get("role") not in ("user", "bot") or not isinstance(record.get("content"), str):
+                raise SessionImportError(f"Line {line_number}: message needs a role and text content", imported)
+            # Exports carry plain text; storage fields are set by this deployment's codec
+            current["messages"].append(encode_message(_import_message(record, now)))
+        # Unknown record types from newer exports are skipped
+
+    if not header_seen:
+        raise SessionImportError("Empty import", imported)
+    if current is not None:
+        batch.append((current_source_id, current))
+    flush()
+    return imported
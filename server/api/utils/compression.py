@@ -0,0 +1,148 @@
+import zlib
+from flask import request
+from werkzeug.wsgi import ClosingIterator
+from api.config import Config
+
+# Brotli is optional (pip install brotli); gzip is always available
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "text/event-stream",
+    "text/plain",
+    "text/html",
+}
+
+# Streams whose chunks must reach the client as soon as they are produced
+LIVE_STREAM_MIMETYPES = {"text/event-stream"}
+# Other streams (exports) are flushed once this much input has accumulated
+STREAM_FLUSH_BYTES = 64 * 1024
+
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        # Ends the current deflate block on a byte boundary: the client can
+        # decode everything sent so far
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def available_encodings(live: bool = False) -> list:
+    """
+    Encodings this server can produce, in order of preference. Brotli
+    compresses whole bodies better, but its per-frame flushes cost more than
+    gzip's (benchmarks/bench_compression.py), so live streams prefer gzip.
+    """
+    if brotli is None:
+        return ["gzip"]
+    return ["gzip", "br"] if live else ["br", "gzip"]
+
+
+def make_encoder(encoding: str):
+    if encoding == "br":
+        return BrotliEncoder(Config.COMPRESSION_BROTLI_QUALITY)
+    return GzipEncoder(Config.COMPRESSION_GZIP_LEVEL)
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    encoder = make_encoder(encoding)
+    return encoder.compress(data) + encoder.finish()
+
+
+def compress_chunks(chunks, encoding: str, live: bool):
+    """
+    Compresses a streamed body chunk by chunk. Live streams (SSE) are flushed
+    after every chunk, i.e. after every event the app yields, so compression
+    never holds back a token; other streams are flushed every STREAM_FLUSH_BYTES.
+
+    Args:
+    chunks: Iterable of bytes.
+    encoding (str): "gzip" or "br".
+    live (bool): Flush after every chunk.
+    """
+    encoder = make_encoder(encoding)
+    pending = 0
+    for chunk in chunks:
+        data = encoder.compress(chunk)
+        pending += len(chunk)
+        if live or pending >= STREAM_FLUSH_BYTES:
+            data += encoder.flush()
+            pending = 0
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+def compress_response(response):
+    """
+    after_request hook: compresses the response body with the best encoding
+    the client accepts (Accept-Encoding), if its type is compressible and it is
+    at least COMPRESSION_MIN_BYTES long. Streamed responses are compressed
+    incrementally (see compress_chunks()) when COMPRESSION_STREAMS is on.
+    """
+    if (
+        request.method == "HEAD"
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or "Content-Encoding" in response.headers
+        or "no-transform" in response.headers.get("Cache-Control", "")
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    live = response.is_streamed and response.mimetype in LIVE_STREAM_MIMETYPES
+    encoding = request.accept_encodings.best_match(available_encodings(live))
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        if not Config.COMPRESSION_STREAMS:
+            return response
+        # The original body is still closed on disconnect (ends the stream's
+        # generator, releases its upstream connection)
+        source = response.response
+        response.response = ClosingIterator(
+            compress_chunks(response.iter_encoded(), encoding, live),
+            getattr(source, "close", None),
+        )
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < Config.COMPRESSION_MIN_BYTES:
+            return response
+        response.set_data(compress_bytes(data, encoding))
+
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_compression(app):
+    """Registers response compression on the Flask app."""
+    app.after_request(compress_response)
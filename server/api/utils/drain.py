@@ -0,0 +1,34 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the server's hard deadline at which streams are wrapped up, so
+# the partial reply can still be saved and the final SSE event sent
+STREAM_STOP_MARGIN = 5.0
+
+_stop_streams_at = None
+
+
+def begin_drain(grace_seconds: float):
+    """
+    Marks this worker as shutting down. In-flight streams keep going until
+    shortly before `grace_seconds` have passed, then end cleanly.
+
+    Args:
+    grace_seconds (float): Time the server gives in-flight requests to finish.
+    """
+    global _stop_streams_at
+    if _stop_streams_at is None:
+        margin = min(STREAM_STOP_MARGIN, grace_seconds / 2)
+        _stop_streams_at = time.monotonic() + grace_seconds - margin
+        logger.info(f"Draining: in-flight streams have {grace_seconds - margin:.0f}s to finish")
+
+
+def is_draining() -> bool:
+    return _stop_streams_at is not None
+
+
+def should_stop_streams() -> bool:
+    """True once a draining worker has to cut its remaining streams short."""
+    return _stop_streams_at is not None and time.monotonic() >= _stop_streams_at
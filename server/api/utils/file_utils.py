@@ -1,6 +1,13 @@
-import fitz
-# Allowed image extensions
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'mp4', 'pdf', 'mp3'}
+import hashlib
+from api.config import Config
+from api.utils.cache import LRUCache
+from api.utils.workers import get_process_pool
+# Allowed image extensions (GIF and WebP are re-encoded before they reach
+# Gemini, see image_utils)
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'mp4', 'pdf', 'mp3'}
+
+# Extracted PDF text keyed by (sha256, limits), bounded by total characters
+_pdf_text_cache = LRUCache(max_size=Config.PDF_TEXT_CACHE_CHARS)
 
 
 def allowed_file(filename):
@@ -15,20 +22,123 @@ def allowed_file(filename):
     """
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def extract_text_from_pdf_bytes(file_bytes: bytes) -> str:
+def _open_pdf(source):
+    # PyMuPDF is imported on first use to keep it out of app startup
+    import fitz
+    # Paths are opened by MuPDF directly, which reads pages from disk on demand
+    if isinstance(source, str):
+        return fitz.open(source, filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+def _extract_page_range(source, start: int, stop: int, max_chars: int) -> list:
+    """
+    Extracts the text of pages [start, stop), stopping early once `max_chars`
+    characters have been collected. Runs in pool workers as well as inline.
+
+    Args:
+    source (bytes | str): PDF content, or path of a PDF file.
+
+    Returns:
+    list: Text of each extracted page.
+    """
+    pages = []
+    total = 0
+    with _open_pdf(source) as doc:
+        for page_number in range(start, stop):
+            text = doc.load_page(page_number).get_text()
+            pages.append(text)
+            total += len(text)
+            if max_chars and total >= max_chars:
+                break
+    return pages
+
+def extract_text_from_pdf_bytes(file_bytes: bytes, max_pages: int = None, max_chars: int = None) -> str:
     """
     Extracts text content from PDF file bytes.
 
     Args:
     file_bytes (bytes): PDF file content.
+    max_pages (int): Maximum number of pages to read (defaults to PDF_MAX_PAGES).
+    max_chars (int): Maximum number of characters to return (defaults to PDF_MAX_CHARS).
+
+    Returns:
+    str: Extracted plain text from PDF.
+    """
+    return _extract_text(file_bytes, hashlib.sha256(file_bytes).hexdigest(), max_pages, max_chars)
+
+def extract_text_from_pdf_upload(upload, max_pages: int = None, max_chars: int = None) -> str:
+    """
+    Extracts text content from a SpooledUpload without loading spooled files
+    into memory; the content hash computed while spooling is reused.
+
+    Args:
+    upload (SpooledUpload): The uploaded PDF.
+    max_pages (int): Maximum number of pages to read (defaults to PDF_MAX_PAGES).
+    max_chars (int): Maximum number of characters to return (defaults to PDF_MAX_CHARS).
 
     Returns:
     str: Extracted plain text from PDF.
     """
+    source = upload.path if upload.path else upload.read_bytes()
+    return _extract_text(source, upload.sha256, max_pages, max_chars)
+
+def _extract_text(source, sha256: str, max_pages: int = None, max_chars: int = None) -> str:
+    """
+    Shared implementation of the PDF extractors.
+
+    Results are cached by the SHA-256 of the content, so re-uploading the same
+    document costs one hash. Documents with at least PDF_PARALLEL_MIN_PAGES pages
+    are split into page ranges and extracted in a process pool; workers receive
+    the file path instead of the bytes when the document is on disk.
+
+    Args:
+    source (bytes | str): PDF content, or path of a PDF file.
+    sha256 (str): Hex SHA-256 of the content.
+    max_pages (int): Maximum number of pages to read (defaults to PDF_MAX_PAGES).
+    max_chars (int): Maximum number of characters to return (defaults to PDF_MAX_CHARS).
+
+    Returns:
+    str: Extracted plain text from PDF.
+    """
+    max_pages = Config.PDF_MAX_PAGES if max_pages is None else max_pages
+    max_chars = Config.PDF_MAX_CHARS if max_chars is None else max_chars
+
+    cache_key = (sha256, max_pages, max_chars)
+    cached = _pdf_text_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    with _open_pdf(source) as doc:
+        page_count = doc.page_count
+    if max_pages:
+        page_count = min(page_count, max_pages)
+
+    workers = Config.PDF_WORKERS
+    if workers > 1 and page_count >= Config.PDF_PARALLEL_MIN_PAGES:
+        # A few ranges per worker keeps the pool balanced when page sizes vary
+        range_size = max(1, -(-page_count // (workers * 2)))
+        pool = get_process_pool("pdf", workers)
+        futures = [
+            pool.submit(_extract_page_range, source, start, min(start + range_size, page_count), max_chars)
+            for start in range(0, page_count, range_size)
+        ]
+        pages = []
+        total = 0
+        for i, future in enumerate(futures):
+            chunk = future.result()
+            pages.extend(chunk)
+            total += sum(len(p) for p in chunk)
+            if max_chars and total >= max_chars:
+                # Early stop: the remaining ranges are no longer needed
+                for pending in futures[i + 1:]:
+                    pending.cancel()
+                break
+    else:
+        pages = _extract_page_range(source, 0, page_count, max_chars)
+
+    text = "\n\n".join(pages).strip()
+    if max_chars:
+        text = text[:max_chars]
 
-    text = ""
-    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
-        for page in doc:
-            text += page.get_text()
-            text += "\n\n"
-    return text.strip()
\ No newline at end of file
+    _pdf_text_cache.set(cache_key, text)
+    return text
@@ -0,0 +1,84 @@
+import hashlib
+from flask import request, jsonify, Response
+
+# Responses that belong to a single caller must never be stored by shared caches,
+# but the browser may keep them as long as it revalidates with If-None-Match.
+PRIVATE_REVALIDATE = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """
+    Builds a compact, deterministic ETag value from the given parts.
+
+    Args:
+    *parts: Any values whose string form identifies a representation version
+            (ids, version counters, timestamps, digests...).
+
+    Returns:
+    str: Hex digest usable as an (unquoted) ETag value.
+    """
+    h = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def etag_matches(etag) -> bool:
+    """
+    Checks whether the current request's If-None-Match header matches the ETag.
+    Uses weak comparison, as required for If-None-Match. Only GET and HEAD
+    requests are answered with 304 (RFC 9110), so this is always False for
+    the POST variants of cacheable reads.
+
+    Args:
+    etag (str): Unquoted ETag value of the current representation.
+
+    Returns:
+    bool: True if the client already holds this representation.
+    """
+    if not etag or request.method not in ("GET", "HEAD") or not request.if_none_match:
+        return False
+    return request.if_none_match.contains_weak(etag)
+
+
+def not_modified(etag, cache_control=PRIVATE_REVALIDATE, vary=None) -> Response:
+    """
+    Builds an empty 304 response carrying the validator headers.
+
+    Args:
+    etag (str): Unquoted ETag value.
+    cache_control (str): Cache-Control header value.
+    vary (str): Optional Vary header value.
+
+    Returns:
+    Response: 304 Not Modified response.
+    """
+    response = Response(status=304)
+    return _apply_cache_headers(response, etag, cache_control, vary)
+
+
+def cached_json(payload, etag, cache_control=PRIVATE_REVALIDATE, vary=None) -> Response:
+    """
+    Serializes a payload to JSON and attaches ETag/Cache-Control headers.
+
+    Args:
+    payload: JSON-serializable object.
+    etag (str): Unquoted ETag value for the payload.
+    cache_control (str): Cache-Control header value.
+    vary (str): Optional Vary header value.
+
+    Returns:
+    Response: 200 JSON response with caching headers.
+    """
+    response = jsonify(payload)
+    return _apply_cache_headers(response, etag, cache_control, vary)
+
+
+def _apply_cache_headers(response, etag, cache_control, vary):
+    # Weak validators: the body may be re-encoded (e.g. compressed) on the way out
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = cache_control
+    if vary:
+        response.vary.add(vary)
+    return response
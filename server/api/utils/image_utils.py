@@ -0,0 +1,80 @@
+import io
+from api.config import Config
+from api.utils.cache import LRUCache
+from api.utils.workers import get_process_pool
+
+# Extensions the pre-processing stage can decode and re-encode
+PROCESSABLE_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+OUTPUT_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+# Processed images keyed by (sha256, processed_image_name()), bounded by bytes
+image_cache = LRUCache(max_size=Config.IMAGE_CACHE_MB * 1024 * 1024)
+
+
+def is_processable_image(extension: str) -> bool:
+    return extension.lower() in PROCESSABLE_IMAGE_EXTENSIONS
+
+
+def preprocess_image(data: bytes, max_dimension: int, quality: int, output_format: str = "JPEG") -> bytes:
+    """
+    Decodes an image, applies its EXIF orientation, downscales it to fit in
+    `max_dimension` x `max_dimension` and re-encodes it without metadata.
+    Runs in the image worker pool.
+
+    Args:
+    data (bytes): Encoded source image.
+    max_dimension (int): Maximum width/height in pixels.
+    quality (int): Encoder quality (1-95) for lossy formats.
+    output_format (str): Pillow format name ("JPEG", "WEBP" or "PNG").
+
+    Returns:
+    bytes: The re-encoded image.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as source:
+        # draft() lets the JPEG decoder skip detail we are about to throw away
+        if source.format == "JPEG":
+            source.draft("RGB", (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(source)
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        if output_format == "JPEG" and image.mode not in ("RGB", "L"):
+            # JPEG has no alpha channel: flatten onto white
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+
+        out = io.BytesIO()
+        # No exif/icc/info is passed on, so metadata is stripped
+        image.save(out, format=output_format, quality=quality, optimize=True)
+        return out.getvalue()
+
+
+def process_image_in_pool(data: bytes) -> bytes:
+    """
+    Runs preprocess_image() with the configured settings in the image worker pool.
+
+    Args:
+    data (bytes): Encoded source image.
+
+    Returns:
+    bytes: The re-encoded image.
+    """
+    pool = get_process_pool("image", Config.IMAGE_WORKERS)
+    return pool.submit(
+        preprocess_image, data, Config.IMAGE_MAX_DIMENSION, Config.IMAGE_QUALITY, Config.IMAGE_FORMAT
+    ).result()
+
+
+def processed_image_name() -> str:
+    """
+    Name of the processed variant for the current settings; used both as the
+    derived artifact name in the attachment store and in the memory cache key.
+    """
+    return f"image-{Config.IMAGE_MAX_DIMENSION}-q{Config.IMAGE_QUALITY}.{Config.IMAGE_FORMAT.lower()}"
+
+
+def processed_image_mime_type() -> str:
+    return OUTPUT_MIME_TYPES[Config.IMAGE_FORMAT]
@@ -0,0 +1,106 @@
+import re
+import zlib
+from api.config import Config
+
+WORD_RE = re.compile(r"\w+")
+# Compressed bodies must save at least this fraction to be stored compressed
+MIN_SAVING = 0.1
+# Fields only present in storage
+STORAGE_FIELDS = ("content_codec", "search_terms")
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def _zlib_compress(data: bytes) -> bytes:
+    return zlib.compress(data, 6)
+
+
+CODECS = {"zlib": (_zlib_compress, zlib.decompress)}
+if zstandard is not None:
+    CODECS["zstd"] = (_zstd_compress, _zstd_decompress)
+
+
+def resolve_codec(name: str):
+    """
+    Maps a MESSAGE_COMPRESSION setting to an available codec name: "auto"
+    prefers zstd (pip install zstandard) and falls back to zlib; "zstd" also
+    falls back to zlib when the module is missing. "" or "none" disables
+    compression.
+    """
+    name = (name or "").lower()
+    if name in ("", "none", "off"):
+        return None
+    if name in ("auto", "zstd"):
+        return "zstd" if "zstd" in CODECS else "zlib"
+    if name not in CODECS:
+        raise ValueError(f"Unknown message codec: {name}")
+    return name
+
+
+def search_terms(text: str) -> str:
+    """
+    Distinct words of a text, lowercased, in order of first occurrence: what
+    the search index needs from a compressed message, at a fraction of its size.
+    """
+    return " ".join(dict.fromkeys(WORD_RE.findall(text.lower())))
+
+
+def encode_message(message: dict, codec: str = None, min_bytes: int = None) -> dict:
+    """
+    Returns the message as it should be stored: `content` compressed (as
+    binary, with `content_codec` and the `search_terms` of the text, so that
+    search still finds every word) when it is at least `min_bytes` long and
+    compression pays off, otherwise unchanged.
+
+    Args:
+    message (dict): Message with a str `content`.
+    codec (str): Codec name (defaults to MESSAGE_COMPRESSION).
+    min_bytes (int): Size threshold (defaults to MESSAGE_COMPRESSION_MIN_BYTES).
+    """
+    codec = resolve_codec(Config.MESSAGE_COMPRESSION if codec is None else codec)
+    content = message.get("content")
+    if codec is None or not isinstance(content, str):
+        return message
+    min_bytes = Config.MESSAGE_COMPRESSION_MIN_BYTES if min_bytes is None else min_bytes
+    raw = content.encode("utf-8")
+    if len(raw) < min_bytes:
+        return message
+    packed = CODECS[codec][0](raw)
+    terms = search_terms(content)
+    if len(packed) + len(terms) > len(raw) * (1 - MIN_SAVING):
+        return message
+    return {**message, "content": packed, "content_codec": codec, "search_terms": terms}
+
+
+def message_content(message: dict) -> str:
+    """Returns the text of a stored message, decompressing it if needed."""
+    content = message.get("content")
+    codec = message.get("content_codec")
+    if codec is None or isinstance(content, str):
+        return content
+    if codec not in CODECS:
+        raise ValueError(f"Message stored with unavailable codec {codec} (pip install zstandard)")
+    return CODECS[codec][1](bytes(content)).decode("utf-8")
+
+
+def decode_message(message: dict) -> dict:
+    """
+    Returns a stored message as the API presents it: plain-text `content`,
+    without the storage fields. Uncompressed messages are returned as is.
+    """
+    if "content_codec" not in message:
+        return message
+    decoded = {k: v for k, v in message.items() if k not in STORAGE_FIELDS}
+    decoded["content"] = message_content(message)
+    return decoded
@@ -0,0 +1,90 @@
+import hashlib
+import io
+import os
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Raised when an uploaded file exceeds the configured size limit."""
+
+    def __init__(self, max_size):
+        super().__init__(f"File exceeds the maximum upload size of {max_size // (1024 * 1024)} MB")
+        self.max_size = max_size
+
+
+class SpooledUpload:
+    """
+    Bounded-memory copy of an uploaded file.
+
+    The upload stream is consumed in fixed-size chunks while its SHA-256 is
+    computed. Files up to `spool_threshold` bytes stay in memory; larger ones are
+    spooled to a named temporary file so consumers (PDF parser, Gemini File API)
+    can read them from disk. Reading past `max_size` raises UploadTooLarge.
+
+    Use as a context manager, or call close() to remove the temporary file.
+    """
+
+    def __init__(self, file_storage, max_size: int, spool_threshold: int):
+        self.filename = file_storage.filename
+        self.mimetype = file_storage.mimetype
+        self.extension = self.filename.rsplit(".", 1)[-1].lower() if "." in self.filename else ""
+        self.size = 0
+        self.path = None
+        self._buffer = io.BytesIO()
+
+        digest = hashlib.sha256()
+        spool = None
+        try:
+            while True:
+                chunk = file_storage.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.size += len(chunk)
+                if self.size > max_size:
+                    raise UploadTooLarge(max_size)
+                digest.update(chunk)
+
+                if spool is None and self.size > spool_threshold:
+                    spool = tempfile.NamedTemporaryFile(prefix="privgpt-upload-", suffix=f".{self.extension}", delete=False)
+                    self.path = spool.name
+                    spool.write(self._buffer.getbuffer())
+                    self._buffer = None
+                (spool or self._buffer).write(chunk)
+        except BaseException:
+            if spool is not None:
+                spool.close()
+            self.close()
+            raise
+        if spool is not None:
+            spool.close()
+
+        self.sha256 = digest.hexdigest()
+
+    @property
+    def in_memory(self) -> bool:
+        return self.path is None
+
+    def read_bytes(self) -> bytes:
+        """
+        Returns the full content. Only meant for payloads that are already known
+        to be small enough (e.g. inline Gemini parts).
+        """
+        if self.path is None:
+            return self._buffer.getvalue()
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def close(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+        self._buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,39 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_mp_context():
+    """
+    Multiprocessing context for worker processes: forkserver where available,
+    else spawn, so workers never fork a threaded web worker.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def get_process_pool(name: str, max_workers: int) -> ProcessPoolExecutor:
+    """
+    Returns a named, shared process pool for CPU-heavy request work.
+
+    Pools are created on first use. Workers start from a clean interpreter
+    (forkserver/spawn) rather than forking the threaded web worker.
+
+    Args:
+    name (str): Pool name (one pool per kind of work, e.g. "pdf", "image").
+    max_workers (int): Number of worker processes.
+
+    Returns:
+    ProcessPoolExecutor: The pool.
+    """
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=get_mp_context())
+                _pools[name] = pool
+    return pool
@@ -0,0 +1,122 @@
+"""
+Benchmarks response compression (api/utils/compression.py) on realistic
+payloads: /chat/history bodies built from a synthetic session corpus (see
+bench_message_codec.py) and a /chat/stream SSE reply flushed per frame.
+
+For each gzip level and brotli quality it reports the compressed size, the
+CPU cost per MB of JSON and the transfer time at --mbps, i.e. whether a level
+pays for itself on the given link. The SSE section shows what per-frame
+flushing costs against compressing the finished reply in one go.
+
+Usage (from the server/ directory):
+    python benchmarks/bench_compression.py --sessions 20 --messages 20
+    python benchmarks/bench_compression.py --mbps 10
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from werkzeug.http import http_date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_message_codec import make_sessions
+from api.config import Config
+from api.routes.chat_routes import serialize_session
+from api.utils import compression
+from api.utils.compression import compress_bytes, compress_chunks
+
+GZIP_LEVELS = (1, 4, 5, 6, 9)
+BROTLI_QUALITIES = (1, 4, 5, 6, 11)
+
+
+def history_payloads(args) -> list:
+    # One /chat/history body per --per-request sessions; dates rendered as Flask's jsonify() does
+    sessions = [serialize_session(s) for s in make_sessions(args.sessions, args.messages)]
+    return [json.dumps(sessions[i:i + args.per_request], default=http_date).encode("utf-8")
+            for i in range(0, len(sessions), args.per_request)]
+
+
+def sse_frames(text: str, tokens_per_frame: int) -> list:
+    words = text.split(" ")
+    frames = []
+    for i in range(0, len(words), tokens_per_frame):
+        chunk = " ".join(words[i:i + tokens_per_frame]) + " "
+        frames.append(f"data: {json.dumps({'type': 'chunk', 'text': chunk})}\n\n".encode("utf-8"))
+    return frames
+
+
+def configure(encoding: str, level: int):
+    if encoding == "br":
+        Config.COMPRESSION_BROTLI_QUALITY = level
+    else:
+        Config.COMPRESSION_GZIP_LEVEL = level
+
+
+def timed(fn, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return result, statistics.median(timings)
+
+
+def run_history(payloads, args):
+    raw = sum(len(p) for p in payloads)
+    link = args.mbps * 1e6 / 8
+    print(f"\n/chat/history: {len(payloads)} bodies, {raw / 1e6:.2f} MB of JSON, link {args.mbps} Mbit/s")
+    print(f"{'encoding':<9} {'MB':>7} {'ratio':>6} {'cpu ms/MB':>10} {'transfer ms':>12} {'total ms':>9}")
+    print(f"{'identity':<9} {raw / 1e6:>7.2f} {1:>6.2f} {0:>10.1f} {raw / link * 1e3:>12.0f} {raw / link * 1e3:>9.0f}")
+    candidates = [("gzip", level) for level in GZIP_LEVELS]
+    if compression.brotli is not None:
+        candidates += [("br", quality) for quality in BROTLI_QUALITIES]
+    for encoding, level in candidates:
+        configure(encoding, level)
+        sizes, cpu = timed(lambda: [len(compress_bytes(p, encoding)) for p in payloads], args.repeat)
+        size = sum(sizes)
+        print(f"{encoding + ' ' + str(level):<9} {size / 1e6:>7.2f} {raw / size:>6.2f} {cpu / (raw / 1e6) * 1e3:>10.1f}"
+              f" {size / link * 1e3:>12.0f} {(cpu + size / link) * 1e3:>9.0f}")
+    if compression.brotli is None:
+        print("brotli skipped: pip install brotli")
+
+
+def run_sse(text: str, args):
+    frames = sse_frames(text, args.tokens_per_frame)
+    raw = sum(len(f) for f in frames)
+    body = b"".join(frames)
+    print(f"\n/chat/stream: {len(frames)} frames, {raw} bytes, {args.tokens_per_frame} tokens per frame")
+    print(f"{'encoding':<9} {'whole':>8} {'per frame':>10} {'overhead':>9} {'us/frame':>9}")
+    for encoding in compression.available_encodings(live=True):
+        configure(encoding, Config.COMPRESSION_BROTLI_QUALITY if encoding == "br" else Config.COMPRESSION_GZIP_LEVEL)
+        whole = len(compress_bytes(body, encoding))
+        chunks, cpu = timed(lambda: list(compress_chunks(frames, encoding, live=True)), args.repeat)
+        streamed = sum(len(c) for c in chunks)
+        print(f"{encoding:<9} {whole:>8} {streamed:>10} {streamed / whole - 1:>+9.0%} {cpu / len(frames) * 1e6:>9.1f}")
+    print(f"{'identity':<9} {raw:>8} {raw:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=20, help="messages per session")
+    parser.add_argument("--per-request", type=int, default=5, help="sessions per /chat/history body")
+    parser.add_argument("--mbps", type=float, default=50, help="client bandwidth, Mbit/s")
+    parser.add_argument("--tokens-per-frame", type=int, default=1,
+                        help="tokens per SSE frame (1 for Ollama, more for Gemini chunks)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    gzip_level, brotli_quality = Config.COMPRESSION_GZIP_LEVEL, Config.COMPRESSION_BROTLI_QUALITY
+    payloads = history_payloads(args)
+    run_history(payloads, args)
+    Config.COMPRESSION_GZIP_LEVEL, Config.COMPRESSION_BROTLI_QUALITY = gzip_level, brotli_quality
+    reply = max((m["content"] for s in json.loads(payloads[0]) for m in s["messages"] if m["role"] == "bot"), key=len)
+    run_sse(reply, args)
+
+
+if __name__ == "__main__":
+    main()
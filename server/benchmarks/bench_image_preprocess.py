@@ -0,0 +1,88 @@
+"""
+Benchmarks the image pre-processing stage on a synthetic 12 MP phone photo.
+
+Reports bytes saved, processing time (cold, in the worker pool, and warm from
+the memory cache) and the estimated end-to-end request latency difference for a
+given uplink bandwidth to Gemini.
+
+Usage (from the server/ directory):
+    python benchmarks/bench_image_preprocess.py --uplink-mbps 20
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+from api.config import Config
+from api.utils import image_utils
+
+
+def make_photo(width: int, height: int) -> bytes:
+    # Smooth gradients plus sensor-like noise compress roughly like a real photo
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    rng = np.random.default_rng(42)
+    channels = [
+        (x / width * 255 + rng.normal(0, 12, (height, width))),
+        (y / height * 255 + rng.normal(0, 12, (height, width))),
+        ((x + y) / (width + height) * 255 + rng.normal(0, 12, (height, width))),
+    ]
+    pixels = np.clip(np.stack(channels, axis=-1), 0, 255).astype(np.uint8)
+    image = Image.fromarray(pixels, "RGB")
+    exif = Image.Exif()
+    exif[0x010F] = "BenchCam"  # Make
+    exif[0x0112] = 1  # Orientation
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=95, exif=exif)
+    return out.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--uplink-mbps", type=float, default=20.0, help="bandwidth from the server to Gemini")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    original = make_photo(args.width, args.height)
+
+    # Start the pool outside the measurement
+    image_utils.process_image_in_pool(make_photo(64, 64))
+
+    cold = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        processed = image_utils.process_image_in_pool(original)
+        cold = min(cold, time.perf_counter() - start)
+
+    key = ("bench", image_utils.processed_image_name())
+    image_utils.image_cache.set(key, processed)
+    start = time.perf_counter()
+    image_utils.image_cache.get(key)
+    warm = time.perf_counter() - start
+
+    bytes_per_s = args.uplink_mbps * 1e6 / 8
+    upload_before = len(original) / bytes_per_s
+    upload_after = len(processed) / bytes_per_s
+
+    with Image.open(io.BytesIO(processed)) as img:
+        size, has_exif = img.size, bool(img.getexif())
+
+    print(f"Source: {args.width}x{args.height} JPEG, {len(original) / 1024:.0f} KiB")
+    print(f"Output: {size[0]}x{size[1]} {Config.IMAGE_FORMAT} q{Config.IMAGE_QUALITY}, "
+          f"{len(processed) / 1024:.0f} KiB, EXIF kept: {has_exif}")
+    print(f"Bytes saved: {(len(original) - len(processed)) / 1024:.0f} KiB "
+          f"({(1 - len(processed) / len(original)) * 100:.1f}%)")
+    print(f"Processing: cold {cold * 1000:.1f} ms, cached {warm * 1e6:.1f} us")
+    print(f"Upload at {args.uplink_mbps:g} Mbit/s: {upload_before * 1000:.0f} ms -> {upload_after * 1000:.0f} ms")
+    print(f"Request latency difference: cold {(upload_after + cold - upload_before) * 1000:+.0f} ms, "
+          f"cached {(upload_after + warm - upload_before) * 1000:+.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmarks message compression at rest (api/utils/message_codec.py) on a
+synthetic corpus of chat sessions: storage size, write cost (encoding the
+messages of a reply) and read cost (BSON decoding plus serialize_session(),
+i.e. what a /chat/history read pays per session), for each available codec.
+
+Usage (from the server/ directory):
+    python benchmarks/bench_message_codec.py --sessions 200 --messages 20
+    python benchmarks/bench_message_codec.py --min-bytes 1024
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import BSON, ObjectId
+from api.routes.chat_routes import serialize_session
+from api.utils.message_codec import CODECS, encode_message
+
+# Bot reply sizes (characters): short answers up to long documents summaries
+REPLY_SIZES = (300, 1200, 4000, 12000, 40000)
+
+
+def make_text(rng: random.Random, vocabulary: list, chars: int) -> str:
+    # Zipf-like word frequencies, sentences and the occasional code block, so
+    # the text compresses roughly like real model output
+    words = []
+    size = 0
+    while size < chars:
+        if rng.random() < 0.02:
+            block = "\n```python\n" + "\n".join(
+                f"    {rng.choice(vocabulary)} = {rng.choice(vocabulary)}({rng.randint(0, 99)})" for _ in range(6)
+            ) + "\n```\n"
+            words.append(block)
+            size += len(block)
+            continue
+        word = vocabulary[min(int(rng.paretovariate(1.1)) - 1, len(vocabulary) - 1)]
+        if rng.random() < 0.08:
+            word += "."
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)[:chars]
+
+
+def make_sessions(count: int, messages: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    letters = "etaoinshrdlucmfwypvbgkqjxz"
+    vocabulary = ["".join(rng.choice(letters[:rng.randint(8, 26)]) for _ in range(rng.randint(2, 10)))
+                  for _ in range(3000)]
+    now = datetime.now()
+    sessions = []
+    for _ in range(count):
+        items = []
+        for i in range(messages):
+            user = i % 2 == 0
+            size = rng.randint(40, 400) if user else rng.choice(REPLY_SIZES)
+            message = {"role": "user" if user else "bot", "content": make_text(rng, vocabulary, size),
+                       "timestamp": now - timedelta(minutes=messages - i)}
+            if not user:
+                message["model_name"] = "llama3:8b"
+                message["stats"] = {"provider": "ollama", "latency_ms": rng.randint(200, 9000)}
+            items.append(message)
+        sessions.append({"_id": ObjectId(), "session_name": "Benchmark", "user_id": str(ObjectId()),
+                         "created_at": now, "updated_at": now, "version": messages, "messages": items})
+    return sessions
+
+
+def run_codec(name, sessions, args) -> dict:
+    # Write path: encode every message as it would be saved
+    started = time.perf_counter()
+    stored = [{**s, "messages": [encode_message(m, name or "none", args.min_bytes) for m in s["messages"]]}
+              for s in sessions]
+    encode_s = time.perf_counter() - started
+    documents = [BSON.encode(s) for s in stored]
+
+    # Read path: decode the BSON (what the driver does) and serialize for the API
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        for data in documents:
+            serialize_session(BSON(data).decode())
+        timings.append(time.perf_counter() - started)
+
+    compressed = sum(1 for s in stored for m in s["messages"] if "content_codec" in m)
+    return {
+        "bytes": sum(len(d) for d in documents),
+        "compressed": compressed,
+        "encode_us": encode_s / sum(len(s["messages"]) for s in sessions) * 1e6,
+        "read_us": statistics.median(timings) / len(documents) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=20, help="messages per session")
+    parser.add_argument("--min-bytes", type=int, default=4096, help="compression threshold")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    sessions = make_sessions(args.sessions, args.messages)
+    total = sum(len(s["messages"]) for s in sessions)
+    print(f"{args.sessions} sessions x {args.messages} messages, threshold {args.min_bytes} bytes")
+    print(f"{'codec':<6} {'stored MB':>10} {'saved':>6} {'compressed':>11} {'write us/msg':>13} {'read us/session':>16}")
+    plain = None
+    for name in (None, *CODECS):
+        row = run_codec(name, sessions, args)
+        plain = plain or row
+        print(f"{name or 'none':<6} {row['bytes'] / 1e6:>10.2f} {1 - row['bytes'] / plain['bytes']:>6.0%}"
+              f" {row['compressed']:>5}/{total:<5} {row['encode_us']:>13.1f} {row['read_us']:>16.1f}")
+    if "zstd" not in CODECS:
+        print("\nzstd skipped: pip install zstandard")
+
+
+if __name__ == "__main__":
+    main()
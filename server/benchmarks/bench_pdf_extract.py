@@ -0,0 +1,85 @@
+"""
+Benchmarks PDF text extraction on a generated multi-hundred-page document.
+
+Compares the original serial extraction loop with extract_text_from_pdf_bytes()
+cold (page-parallel) and warm (content-hash cache hit).
+
+Usage (from the server/ directory):
+    python benchmarks/bench_pdf_extract.py --pages 400 --repeat 3
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+from api.utils import file_utils
+
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud "
+    "exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat. "
+)
+
+
+def make_pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(40, 40, 560, 800), f"Page {n + 1}\n" + LOREM * 12, fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def serial_baseline(file_bytes: bytes) -> str:
+    # The extraction loop as it was before caching/parallelism
+    text = ""
+    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
+        for page in doc:
+            text += page.get_text()
+            text += "\n\n"
+    return text.strip()
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pdf = make_pdf(args.pages)
+    print(f"Document: {args.pages} pages, {len(pdf) / 1024:.0f} KiB, {file_utils.Config.PDF_WORKERS} workers")
+
+    serial_s, expected = timed(lambda: serial_baseline(pdf), args.repeat)
+
+    # Warm the pool up so process start-up is not billed to the first measurement
+    file_utils.extract_text_from_pdf_bytes(make_pdf(file_utils.Config.PDF_PARALLEL_MIN_PAGES))
+
+    def cold():
+        file_utils._pdf_text_cache.clear()
+        return file_utils.extract_text_from_pdf_bytes(pdf, max_chars=0)
+
+    parallel_s, text = timed(cold, args.repeat)
+    assert text == expected, "parallel extraction differs from the serial baseline"
+    cached_s, _ = timed(lambda: file_utils.extract_text_from_pdf_bytes(pdf, max_chars=0), args.repeat)
+
+    print(f"{'serial baseline':<20}{serial_s * 1000:>10.1f} ms")
+    print(f"{'parallel (cold)':<20}{parallel_s * 1000:>10.1f} ms  x{serial_s / parallel_s:.2f}")
+    print(f"{'cache hit':<20}{cached_s * 1000:>10.1f} ms  x{serial_s / cached_s:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmarks plugin startup and per-request hook dispatch with many installed plugins.
+
+Generates N synthetic plugins, a fraction of which implement before_prompt and
+after_response, and measures:
+- startup: registering plugins from manifests (lazy) vs. importing them all (eager)
+- per-request hook cost: precomputed per-hook dispatch lists vs. calling every
+  plugin for every hook (the previous behaviour)
+
+Usage (from the server/ directory):
+    python benchmarks/bench_plugin_dispatch.py --plugins 100 --active 0.1
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.plugins.base import HOOKS
+from api.plugins.manager import PluginManager
+
+ACTIVE_PLUGIN = '''
+import re
+from api.plugins.base import BasePlugin
+
+WORD = re.compile(r"\\w+")
+
+class Plugin{n}(BasePlugin):
+    def before_prompt(self, prompt):
+        return prompt
+
+    def after_response(self, response):
+        return response
+'''
+
+IDLE_PLUGIN = '''
+import re
+from api.plugins.base import BasePlugin
+
+WORD = re.compile(r"\\w+")
+
+class Plugin{n}(BasePlugin):
+    def on_session_end(self):
+        pass
+'''
+
+
+def make_plugins(root: str, count: int, active_ratio: float, declare_hooks: bool):
+    active_every = max(1, round(1 / active_ratio)) if active_ratio > 0 else count + 1
+    for n in range(count):
+        folder = os.path.join(root, f"plugin_{n:04d}")
+        os.makedirs(folder)
+        active = n % active_every == 0
+        with open(os.path.join(folder, "plugin.py"), "w") as f:
+            f.write((ACTIVE_PLUGIN if active else IDLE_PLUGIN).format(n=n))
+        manifest = {"name": f"Plugin {n}", "version": "1.0.0"}
+        if declare_hooks:
+            manifest["hooks"] = ["before_prompt", "after_response"] if active else ["on_session_end"]
+        with open(os.path.join(folder, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+
+
+def timed(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def request_hooks(manager, chunks: int):
+    prompt = manager.before_prompt("hello")
+    transformer = manager.stream_transformer()
+    for _ in range(chunks):
+        if transformer:
+            transformer.feed("chunk ")
+    if transformer:
+        transformer.flush()
+    return manager.after_response(prompt)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plugins", type=int, default=100)
+    parser.add_argument("--active", type=float, default=0.1, help="fraction of plugins implementing the chat hooks")
+    parser.add_argument("--chunks", type=int, default=50, help="streamed chunks per simulated request")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--timeout-ms", type=float, default=0,
+                        help="PLUGIN_HOOK_TIMEOUT_MS to use (0 = inline calls, measures dispatch alone)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as declared_dir, tempfile.TemporaryDirectory() as detected_dir:
+        make_plugins(declared_dir, args.plugins, args.active, declare_hooks=True)
+        make_plugins(detected_dir, args.plugins, args.active, declare_hooks=False)
+
+        def startup(plugin_dir, eager):
+            def run():
+                manager = PluginManager([plugin_dir])
+                manager.load_plugins()
+                if eager:
+                    manager.load_all()
+                # Fresh module names next round, so imports are not served from sys.modules
+                for name in list(sys.modules):
+                    if name.startswith("plugin_plugin_"):
+                        del sys.modules[name]
+            return timed(run, 3)
+
+        print(f"{args.plugins} plugins, {args.active:.0%} implementing before_prompt/after_response")
+        print(f"Startup, lazy (manifests only):     {startup(declared_dir, False) * 1000:8.1f} ms")
+        print(f"Startup, eager (import every module): {startup(declared_dir, True) * 1000:6.1f} ms")
+
+        for label, plugin_dir in (("declared hooks", declared_dir), ("override detection", detected_dir)):
+            manager = PluginManager([plugin_dir])
+            manager.load_plugins()
+            manager.timeout_ms = args.timeout_ms
+            # Import everything up front: a lazy import would rebuild the dispatch lists mid-run
+            manager.load_all()
+            precomputed = dict(manager.dispatch)
+            every_plugin = {hook: tuple(manager.metadata) for hook in HOOKS}
+
+            manager.dispatch = every_plugin
+            baseline = timed(lambda: [request_hooks(manager, args.chunks) for _ in range(args.requests)], 3)
+            manager.dispatch = precomputed
+            optimized = timed(lambda: [request_hooks(manager, args.chunks) for _ in range(args.requests)], 3)
+
+            per_request = lambda total: total / args.requests * 1e6
+            print(f"Per-request hooks ({label}): every plugin {per_request(baseline):8.1f} us, "
+                  f"dispatch lists {per_request(optimized):8.1f} us ({baseline / optimized:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
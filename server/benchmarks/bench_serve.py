@@ -0,0 +1,172 @@
+"""
+Compares the production worker modes of api/serve.py: throughput, latency and
+memory under concurrent SSE streams, and graceful drain on SIGTERM.
+
+Each mode runs the real server (gunicorn, as a subprocess) against the fake
+Ollama server, the fake Gemini provider and an in-memory MongoDB per worker.
+Memory is the proportional set size (PSS) of the master and its workers, so
+pages shared copy-on-write after preloading are counted once (Linux only).
+
+Usage (from the server/ directory, with gunicorn and gevent installed):
+    python benchmarks/bench_serve.py --concurrency 64 --requests 256
+    python benchmarks/bench_serve.py --modes gthread,gevent --workers 2
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, SERVER_DIR)
+
+import requests
+
+import fake_ollama
+import loadtest
+
+# mode -> extra serve.py arguments
+MODES = {
+    "gthread": ["--worker-class", "gthread"],
+    "gthread-no-preload": ["--worker-class", "gthread", "--no-preload"],
+    "gevent": ["--worker-class", "gevent"],
+}
+
+
+def create_bench_app():
+    """App factory for the server under test: in-memory MongoDB and fake Gemini."""
+    import mongomock
+    import fake_gemini
+    from api import create_app, mongo
+
+    app = create_app()
+    mongo.cx = mongomock.MongoClient()
+    mongo.db = mongo.cx.privgpt
+    fake_gemini.install(ttft_ms=100)
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def pss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1])
+    return 0
+
+
+def process_tree(pid: int) -> list:
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            for child in f.read().split():
+                pids.extend(process_tree(int(child)))
+    except OSError:
+        pass
+    return pids
+
+
+def memory_mb(pid: int):
+    try:
+        return sum(pss_kb(p) for p in process_tree(pid)) / 1024
+    except OSError:
+        return None
+
+
+def start_server(mode: str, args, env: dict):
+    port = free_port()
+    command = [sys.executable, os.path.join(SERVER_DIR, "api", "serve.py"), *MODES[mode],
+               "--bind", f"127.0.0.1:{port}", "--workers", str(args.workers), "--threads", str(args.threads),
+               "--drain-seconds", str(args.drain_seconds), "--app", "bench_serve:create_bench_app"]
+    process = subprocess.Popen(command, env=env, cwd=SERVER_DIR,
+                               stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{mode}: server exited with code {process.returncode}")
+        try:
+            requests.get(url, timeout=1)
+            return process, url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{mode}: server did not start")
+
+
+def drain_check(process, url: str, load_args, streams: int) -> tuple:
+    """Starts `streams` streams, sends SIGTERM mid-way and counts the ones that completed."""
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(loadtest.one_request(url, load_args)))
+               for _ in range(streams)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.5)
+    process.send_signal(signal.SIGTERM)
+    for thread in threads:
+        thread.join()
+    process.wait(timeout=120)
+    return sum(r["ok"] for r in results), streams
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=32, help="threads per gthread worker")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--ttft-ms", type=float, default=200.0)
+    parser.add_argument("--response-tokens", type=int, default=64)
+    parser.add_argument("--drain-seconds", type=int, default=30)
+    parser.add_argument("--verbose", action="store_true", help="show server logs")
+    args = parser.parse_args()
+
+    ollama = fake_ollama.start_fake_ollama(tokens_per_second=args.tokens_per_second, ttft_ms=args.ttft_ms,
+                                           response_tokens=args.response_tokens, models=["llama3:8b"])
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([BENCH_DIR, SERVER_DIR]),
+        "OLLAMA_URL": fake_ollama.url(ollama),
+        "RATE_LIMIT_ENABLED": "false",
+        "GEMINI_RATE_LIMIT": "",
+        "PLUGINS_DIRS": tempfile.mkdtemp(prefix="bench-serve-no-plugins-"),
+    }
+    load_args = SimpleNamespace(endpoint="stream", model_type="local", model="llama3:8b", message="Hello there",
+                                response_tokens=args.response_tokens, timeout=120)
+
+    print(f"{args.workers} workers, {args.concurrency} concurrent streams, "
+          f"{args.response_tokens} tokens at {args.tokens_per_second:.0f} tok/s per stream")
+    print(f"{'mode':<20} {'idle MB':>8} {'load MB':>8} {'req/s':>7} {'p50 ms':>7} {'p95 ms':>7}"
+          f" {'ttft p95':>8} {'errors':>6} {'drained':>8}")
+    for mode in args.modes.split(","):
+        process, url = start_server(mode, args, env)
+        try:
+            loadtest.one_request(url, load_args)
+            idle = memory_mb(process.pid)
+            row = loadtest.run_level(url, load_args, args.concurrency, args.requests)
+            loaded = memory_mb(process.pid)
+            completed, started = drain_check(process, url, load_args, min(args.concurrency, 16))
+        finally:
+            if process.poll() is None:
+                process.kill()
+        fmt = lambda v: "-" if v is None else f"{v:.0f}"
+        print(f"{mode:<20} {fmt(idle):>8} {fmt(loaded):>8} {row['throughput']:>7.1f}"
+              f" {fmt(row['latency_ms']['p50']):>7} {fmt(row['latency_ms']['p95']):>7}"
+              f" {fmt(row['ttft_ms']['p95']):>8} {row['errors']:>6} {completed:>4}/{started:<3}")
+
+
+if __name__ == "__main__":
+    main()
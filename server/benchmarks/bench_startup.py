@@ -0,0 +1,92 @@
+"""
+Measures cold start: the time to import the app and run create_app() in a
+fresh interpreter, and which modules are loaded by then.
+
+Heavy optional dependencies (Gemini SDK, PyMuPDF, NumPy, Pillow) must only be
+imported when first used; the script fails if any of them is loaded at startup,
+or if the median startup time exceeds --max-ms, so it can catch regressions.
+With --importtime it also prints the slowest imports (from `python -X importtime`).
+
+Usage (from the server/ directory):
+    python benchmarks/bench_startup.py --runs 5 --importtime 20 --max-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must stay out of startup
+LAZY_MODULES = ("google.generativeai", "fitz", "numpy", "PIL")
+
+STARTUP_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+from api import create_app
+create_app()
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "ms": elapsed * 1000,
+    "modules": len(sys.modules),
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+""" % (LAZY_MODULES,)
+
+
+def run_once() -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", STARTUP_SNIPPET],
+        cwd=SERVER_DIR, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def import_times(top: int) -> list:
+    """(cumulative_us, self_us, module) of the slowest imports of one startup."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "from api import create_app; create_app()"],
+        cwd=SERVER_DIR, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), module.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="print the N slowest imports")
+    parser.add_argument("--max-ms", type=float, default=None, help="fail if the median startup exceeds this")
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    times = [r["ms"] for r in results]
+    print(f"create_app() cold start over {args.runs} runs: "
+          f"median {statistics.median(times):.0f} ms, min {min(times):.0f} ms, max {max(times):.0f} ms")
+    print(f"Modules loaded: {results[0]['modules']}")
+
+    if args.importtime:
+        print(f"\nSlowest imports (cumulative / self, ms):")
+        for cumulative_us, self_us, module in import_times(args.importtime):
+            print(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {module}")
+
+    failed = False
+    loaded = results[0]["loaded"]
+    if loaded:
+        print(f"\nFAIL: loaded at startup, should be lazy: {', '.join(loaded)}")
+        failed = True
+    if args.max_ms is not None and statistics.median(times) > args.max_ms:
+        print(f"\nFAIL: median startup above {args.max_ms:g} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+A fake google.generativeai module for load tests without a Gemini key.
+
+`install()` replaces the module used by api.services.gemini_services, so every
+Gemini call in the app (cloud models and local-model fallback) is answered
+in-process with configurable time to first token, tokens/sec and failure rate.
+Responses carry `text` and `usage_metadata` like the real SDK's.
+"""
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from fake_ollama import WORDS
+
+
+class FakeGeminiError(Exception):
+    # Like google.api_core's ServiceUnavailable, so the app retries it
+    code = 503
+
+
+class FakeGemini:
+    """Stands in for the google.generativeai module."""
+
+    def __init__(self, tokens_per_second: float = 80.0, ttft_ms: float = 400.0, response_tokens: int = 64,
+                 failure_rate: float = 0.0, seed: int = None):
+        self.tokens_per_second = tokens_per_second
+        self.ttft_ms = ttft_ms
+        self.response_tokens = response_tokens
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+
+    def configure(self, **kwargs):
+        pass
+
+    def GenerativeModel(self, model_name: str, system_instruction: str = None):
+        return FakeGenerativeModel(self, model_name)
+
+    def upload_file(self, path: str, mime_type: str):
+        return SimpleNamespace(name=f"files/{abs(hash(path))}", uri=f"fake://{path}", mime_type=mime_type)
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            self.requests += 1
+            failed = self.random.random() < self.failure_rate
+            self.failures += failed
+        return failed
+
+
+class FakeGenerativeModel:
+    def __init__(self, gemini: FakeGemini, model_name: str):
+        self.gemini = gemini
+        self.model_name = model_name
+
+    def generate_content(self, contents, generation_config=None, stream=False, **kwargs):
+        gemini = self.gemini
+        if gemini.should_fail():
+            raise FakeGeminiError("503 simulated Gemini failure")
+        max_tokens = (generation_config or {}).get("max_output_tokens") or gemini.response_tokens
+        tokens = [WORDS[i % len(WORDS)] + " " for i in range(min(gemini.response_tokens, max_tokens))]
+        prompt = contents if isinstance(contents, str) else str(contents[0])
+        prompt_tokens = len(prompt.split())
+        interval = 1 / gemini.tokens_per_second if gemini.tokens_per_second > 0 else 0
+
+        time.sleep(gemini.ttft_ms / 1000)
+        if not stream:
+            time.sleep(interval * max(len(tokens) - 1, 0))
+            return _response("".join(tokens), prompt_tokens, len(tokens))
+
+        def chunks():
+            # Like the real API, tokens arrive a few at a time with cumulative usage
+            for i in range(0, len(tokens), 4):
+                if i:
+                    time.sleep(interval * 4)
+                yield _response("".join(tokens[i:i + 4]), prompt_tokens, min(i + 4, len(tokens)))
+        return chunks()
+
+
+def _response(text: str, prompt_tokens: int, candidates_tokens: int):
+    return SimpleNamespace(
+        text=text,
+        usage_metadata=SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=candidates_tokens),
+    )
+
+
+def install(**options) -> FakeGemini:
+    """
+    Routes the app's Gemini calls to a FakeGemini.
+
+    Args:
+    options: FakeGemini settings (tokens_per_second, ttft_ms, response_tokens, failure_rate...).
+
+    Returns:
+    FakeGemini: The installed fake (for its request/failure counters).
+    """
+    from api.services import gemini_services
+
+    fake = FakeGemini(**options)
+    with gemini_services._lock:
+        gemini_services._genai = fake
+        gemini_services._default_model = None
+    return fake
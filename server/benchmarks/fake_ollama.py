@@ -0,0 +1,249 @@
+"""
+A fake Ollama server for load tests: no GPU, no models, just the HTTP API with
+controllable speed and failures.
+
+Implements /api/generate (streaming and non-streaming), /api/tags, /api/show,
+/api/ps and /api/embed. Generation waits `ttft_ms` before the first token, then
+emits tokens at `tokens_per_second`; `failure_rate` is the fraction of generate
+calls answered with HTTP 500 (which makes the app fall back to Gemini).
+
+Usage (from the server/ directory):
+    python benchmarks/fake_ollama.py --port 11500 --tokens-per-second 40 --ttft-ms 300
+    OLLAMA_URL=http://127.0.0.1:11500 python api/app.py
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_MODELS = ("llama3:8b", "gemma3:1b", "nomic-embed-text:latest")
+EMBEDDING_DIM = 64
+KEEP_ALIVE = timedelta(minutes=5)
+
+WORDS = ("the", "model", "answers", "with", "a", "few", "plain", "words", "about", "your", "question",
+         "and", "then", "keeps", "going", "until", "it", "reaches", "the", "token", "limit.")
+
+
+class FakeOllama:
+    """Model catalog, timing and failure settings shared by all request handlers."""
+
+    def __init__(self, models=DEFAULT_MODELS, tokens_per_second: float = 40.0, ttft_ms: float = 300.0,
+                 response_tokens: int = 64, failure_rate: float = 0.0, seed: int = None):
+        self.models = list(models)
+        self.tokens_per_second = tokens_per_second
+        self.ttft_ms = ttft_ms
+        self.response_tokens = response_tokens
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        # model -> expiry of its keep-alive, reported by /api/ps
+        self.loaded = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+
+    def model_entry(self, name: str) -> dict:
+        digest = hashlib.sha256(name.encode()).hexdigest()
+        return {
+            "name": name,
+            "model": name,
+            "modified_at": "2025-01-01T00:00:00Z",
+            "size": 4_000_000_000,
+            "digest": digest,
+            "details": {"format": "gguf", "family": name.split(":")[0], "parameter_size": "8B",
+                        "quantization_level": "Q4_0"},
+        }
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            self.requests += 1
+            failed = self.random.random() < self.failure_rate
+            self.failures += failed
+        return failed
+
+    def touch(self, name: str):
+        with self.lock:
+            self.loaded[name] = datetime.now(timezone.utc) + KEEP_ALIVE
+
+    def running(self) -> list:
+        now = datetime.now(timezone.utc)
+        with self.lock:
+            self.loaded = {name: expiry for name, expiry in self.loaded.items() if expiry > now}
+            loaded = dict(self.loaded)
+        return [
+            {**self.model_entry(name), "expires_at": expiry.isoformat(), "size_vram": 4_000_000_000}
+            for name, expiry in loaded.items()
+        ]
+
+    def tokens(self, num_predict: int = None):
+        count = min(self.response_tokens, num_predict or self.response_tokens)
+        return [WORDS[i % len(WORDS)] + " " for i in range(count)]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeOllama/1.0"
+
+    @property
+    def fake(self) -> FakeOllama:
+        return self.server.fake
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # Clients drop idle keep-alive connections without a goodbye
+            pass
+
+    def read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_json(self, data: dict, status: int = 200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self.send_json({"models": [self.fake.model_entry(name) for name in self.fake.models]})
+        elif self.path == "/api/ps":
+            self.send_json({"models": self.fake.running()})
+        elif self.path == "/":
+            self.send_response(200)
+            self.send_header("Content-Length", "17")
+            self.end_headers()
+            self.wfile.write(b"Ollama is running")
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        try:
+            data = self.read_json()
+        except ValueError:
+            self.send_json({"error": "invalid JSON"}, 400)
+            return
+        name = data.get("model") or data.get("name")
+        if self.path in ("/api/generate", "/api/show", "/api/embed") and name not in self.fake.models:
+            self.send_json({"error": f"model '{name}' not found"}, 404)
+        elif self.path == "/api/generate":
+            self.generate(name, data)
+        elif self.path == "/api/show":
+            entry = self.fake.model_entry(name)
+            self.send_json({"modelfile": f"FROM {name}", "parameters": "", "template": "{{ .Prompt }}",
+                            "details": entry["details"], "model_info": {"general.architecture": "llama"}})
+        elif self.path == "/api/embed":
+            inputs = data.get("input") or []
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            self.send_json({"model": name, "embeddings": [embed(text) for text in inputs]})
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def generate(self, name: str, data: dict):
+        if self.fake.should_fail():
+            self.send_json({"error": "simulated failure"}, 500)
+            return
+        self.fake.touch(name)
+        tokens = self.fake.tokens((data.get("options") or {}).get("num_predict"))
+        interval = 1 / self.fake.tokens_per_second if self.fake.tokens_per_second > 0 else 0
+        prompt_tokens = len((data.get("prompt") or "").split())
+        started = time.perf_counter()
+
+        def final(extra=None):
+            total = time.perf_counter() - started
+            return {
+                "model": name, "created_at": datetime.now(timezone.utc).isoformat(), "response": "", "done": True,
+                "done_reason": "stop", "total_duration": int(total * 1e9), "load_duration": 0,
+                "prompt_eval_count": prompt_tokens, "prompt_eval_duration": int(self.fake.ttft_ms * 1e6),
+                "eval_count": len(tokens), "eval_duration": int(max(total - self.fake.ttft_ms / 1000, 1e-6) * 1e9),
+                **(extra or {}),
+            }
+
+        time.sleep(self.fake.ttft_ms / 1000)
+        if data.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for i, token in enumerate(tokens):
+                    if i:
+                        time.sleep(interval)
+                    self.write_chunk({"model": name, "response": token, "done": False})
+                self.write_chunk(final())
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # Client went away (stopped generation)
+                self.close_connection = True
+        else:
+            time.sleep(interval * max(len(tokens) - 1, 0))
+            self.send_json(final({"response": "".join(tokens)}))
+
+    def write_chunk(self, data: dict):
+        line = json.dumps(data).encode() + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+
+def embed(text: str) -> list:
+    # Deterministic pseudo-embedding so retrieval still ranks something
+    digest = hashlib.sha256(text.encode()).digest()
+    return [(digest[i % len(digest)] - 128) / 128 for i in range(EMBEDDING_DIM)]
+
+
+def start_fake_ollama(host: str = "127.0.0.1", port: int = 0, **options) -> ThreadingHTTPServer:
+    """
+    Starts a fake Ollama server in a background thread.
+
+    Args:
+    host, port (str, int): Address to bind (port 0 picks a free port).
+    options: FakeOllama settings (tokens_per_second, ttft_ms, response_tokens, failure_rate...).
+
+    Returns:
+    ThreadingHTTPServer: The running server; its URL is `url(server)`, stop it with shutdown().
+    """
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.fake = FakeOllama(**options)
+    threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True).start()
+    return server
+
+
+def url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--models", default=",".join(DEFAULT_MODELS), help="comma-separated model names")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--ttft-ms", type=float, default=300.0)
+    parser.add_argument("--response-tokens", type=int, default=64)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = start_fake_ollama(args.host, args.port, models=args.models.split(","),
+                               tokens_per_second=args.tokens_per_second, ttft_ms=args.ttft_ms,
+                               response_tokens=args.response_tokens, failure_rate=args.failure_rate)
+    print(f"Fake Ollama listening on {url(server)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
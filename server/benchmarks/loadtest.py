@@ -0,0 +1,224 @@
+"""
+Load-tests /chat and /chat/stream of the real Flask app without a GPU or a Gemini key.
+
+By default the app runs in-process behind a threaded WSGI server, wired to:
+- a fake Ollama HTTP server (benchmarks/fake_ollama.py) with configurable TTFT,
+  tokens/sec and failure rate (failures exercise the Gemini fallback)
+- a fake Gemini provider (benchmarks/fake_gemini.py)
+- an in-memory MongoDB (mongomock), or a real one with --mongo-uri
+Pass --url to load an already running server instead (its Ollama, Gemini and
+MongoDB are then whatever it is configured with).
+
+For each concurrency level it reports throughput, latency and time-to-first-token
+percentiles, and errors. --capacity doubles the number of concurrent streams until
+p95 TTFT exceeds --ttft-slo-ms or errors exceed --max-error-rate, and reports the
+largest level that met both.
+
+Usage (from the server/ directory):
+    python benchmarks/loadtest.py --endpoint stream --concurrency 1,8,32 --requests 200
+    python benchmarks/loadtest.py --endpoint stream --capacity --ttft-slo-ms 1000
+    python benchmarks/loadtest.py --endpoint chat --model-type cloud --model gemini
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+import requests
+
+import fake_gemini
+import fake_ollama
+
+
+def start_app(args) -> str:
+    """Starts the app with fake backends in this process; returns its base URL."""
+    ollama = fake_ollama.start_fake_ollama(
+        tokens_per_second=args.tokens_per_second, ttft_ms=args.ttft_ms,
+        response_tokens=args.response_tokens, failure_rate=args.failure_rate,
+        models=[args.model] if args.model_type == "local" else fake_ollama.DEFAULT_MODELS,
+    )
+    # Config is read at import time, so the environment must be set first
+    os.environ["OLLAMA_URL"] = fake_ollama.url(ollama)
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    # No client-side Gemini quota unless one is set explicitly
+    os.environ.setdefault("GEMINI_RATE_LIMIT", "")
+    if not args.plugins:
+        os.environ["PLUGINS_DIRS"] = tempfile.mkdtemp(prefix="loadtest-no-plugins-")
+    if args.mongo_uri:
+        os.environ["MONGODB_URL"] = args.mongo_uri
+
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    from api import create_app, mongo
+
+    app = create_app()
+    if not args.mongo_uri:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("mongomock is not installed: pip install mongomock, or pass --mongo-uri")
+        mongo.cx = mongomock.MongoClient()
+        mongo.db = mongo.cx.privgpt
+    fake_gemini.install(tokens_per_second=args.gemini_tokens_per_second, ttft_ms=args.gemini_ttft_ms,
+                        response_tokens=args.response_tokens, failure_rate=args.gemini_failure_rate)
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="app-server", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def one_request(base_url: str, args) -> dict:
+    form = {"message": args.message, "model_type": args.model_type, "model_name": args.model,
+            "max_tokens": args.response_tokens}
+    # A new connection per request: the in-process (werkzeug) server closes every
+    # connection after its response, so keep-alive reuse would race with the close
+    started = time.perf_counter()
+    result = {"ok": False, "latency": None, "ttft": None, "chunks": 0}
+    try:
+        if args.endpoint == "chat":
+            res = requests.post(f"{base_url}/chat", data=form, timeout=args.timeout)
+            result["ok"] = res.status_code == 200 and "error" not in res.json()
+        else:
+            with requests.post(f"{base_url}/chat/stream", data=form, stream=True, timeout=args.timeout) as res:
+                if res.status_code != 200:
+                    return result
+                for line in res.iter_lines():
+                    if not line.startswith(b"data: "):
+                        continue
+                    event = json.loads(line[6:])
+                    if event["type"] == "chunk":
+                        if result["ttft"] is None:
+                            result["ttft"] = time.perf_counter() - started
+                        result["chunks"] += 1
+                    elif event["type"] == "error":
+                        return result
+                    elif event["type"] == "complete":
+                        result["ok"] = True
+        result["latency"] = time.perf_counter() - started
+    except (requests.RequestException, ValueError, KeyError):
+        pass
+    return result
+
+
+def percentile(values: list, q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def run_level(base_url: str, args, concurrency: int, total: int) -> dict:
+    """Runs `total` requests with `concurrency` clients sending back to back."""
+    remaining = [total]
+    lock = threading.Lock()
+    results = []
+
+    def client():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            outcome = one_request(base_url, args)
+            with lock:
+                results.append(outcome)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if r["ok"]]
+    latencies = [r["latency"] * 1000 for r in ok]
+    ttfts = [r["ttft"] * 1000 for r in ok if r["ttft"] is not None]
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "error_rate": (len(results) - len(ok)) / len(results) if results else 0,
+        "throughput": len(ok) / elapsed if elapsed else 0,
+        "latency_ms": {q: percentile(latencies, p) for q, p in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+        "ttft_ms": {q: percentile(ttfts, p) for q, p in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+    }
+
+
+def fmt(value) -> str:
+    return "-" if value is None else f"{value:.0f}"
+
+
+def print_row(row: dict):
+    lat, ttft = row["latency_ms"], row["ttft_ms"]
+    print(f"{row['concurrency']:>5} {row['requests']:>8} {row['errors']:>6} {row['throughput']:>9.1f}"
+          f" {fmt(lat['p50']):>8} {fmt(lat['p95']):>8} {fmt(lat['p99']):>8}"
+          f" {fmt(ttft['p50']):>8} {fmt(ttft['p95']):>8} {fmt(ttft['p99']):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="load an already running server instead of starting one")
+    parser.add_argument("--endpoint", choices=("stream", "chat"), default="stream")
+    parser.add_argument("--model-type", choices=("local", "cloud"), default="local")
+    parser.add_argument("--model", default="llama3:8b")
+    parser.add_argument("--message", default="Summarize the plot of Hamlet in two sentences.")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="requests per concurrency level")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--capacity", action="store_true", help="search for the max concurrent streams within the SLO")
+    parser.add_argument("--max-concurrency", type=int, default=512)
+    parser.add_argument("--ttft-slo-ms", type=float, default=1000)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    fakes = parser.add_argument_group("fake backends (in-process mode only)")
+    fakes.add_argument("--tokens-per-second", type=float, default=40.0, help="fake Ollama generation speed")
+    fakes.add_argument("--ttft-ms", type=float, default=300.0, help="fake Ollama time to first token")
+    fakes.add_argument("--response-tokens", type=int, default=64)
+    fakes.add_argument("--failure-rate", type=float, default=0.0, help="fraction of Ollama calls that fail")
+    fakes.add_argument("--gemini-tokens-per-second", type=float, default=80.0)
+    fakes.add_argument("--gemini-ttft-ms", type=float, default=400.0)
+    fakes.add_argument("--gemini-failure-rate", type=float, default=0.0)
+    fakes.add_argument("--mongo-uri", help="use this MongoDB instead of in-memory mongomock")
+    fakes.add_argument("--plugins", action="store_true", help="load the installed plugins (default: none)")
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip("/") if args.url else start_app(args)
+    print(f"Target: {base_url}  endpoint: /chat{'/stream' if args.endpoint == 'stream' else ''}"
+          f"  model: {args.model_type}/{args.model}")
+    # Warm up connections, lazy imports and the model catalog outside the measurement
+    one_request(base_url, args)
+
+    print(f"{'conc':>5} {'requests':>8} {'errors':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+          f" {'ttft p50':>8} {'ttft p95':>8} {'ttft p99':>8}")
+    if not args.capacity:
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            print_row(run_level(base_url, args, concurrency, max(args.requests, concurrency)))
+        return
+
+    best = None
+    concurrency = 1
+    while concurrency <= args.max_concurrency:
+        row = run_level(base_url, args, concurrency, max(args.requests, concurrency * 2))
+        print_row(row)
+        p95 = row["ttft_ms"]["p95"] if args.endpoint == "stream" else row["latency_ms"]["p95"]
+        if row["error_rate"] > args.max_error_rate or p95 is None or p95 > args.ttft_slo_ms:
+            break
+        best = concurrency
+        concurrency *= 2
+    metric = "TTFT" if args.endpoint == "stream" else "latency"
+    if best is None:
+        print(f"\nCapacity: even 1 client misses p95 {metric} <= {args.ttft_slo_ms:.0f} ms")
+    else:
+        print(f"\nCapacity: {best} concurrent {'streams' if args.endpoint == 'stream' else 'requests'}"
+              f" within p95 {metric} <= {args.ttft_slo_ms:.0f} ms and <= {args.max_error_rate:.0%} errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Micro-benchmarks for the per-request CPU work of the chat endpoints, with stored
+baselines and regression thresholds.
+
+Each case times one operation (best of several auto-ranged runs, in
+microseconds: noise from other processes only ever adds time) and is compared
+with benchmarks/baseline.json: the run fails (exit code 1) when a case is
+slower than its baseline by more than its threshold. A case over its threshold
+is measured again (--confirm times) and only reported if every measurement is,
+so a single noisy run does not fail the check. Baselines are the median of
+several such measurements (--runs) and are machine-specific, so record them on
+the host that runs the check.
+
+Cases:
+- pdf_extract: extract_text_from_pdf_bytes() on a 20-page PDF (text cache cleared)
+- mention_context: context assembly for 3 mentioned sessions of 20 messages
+- sse_chunk: encoding of one streamed chunk as a server-sent event
+- history_serialize: JSON-ready copy of a 20-message session (chat_history())
+- plugin_dispatch: before_prompt/on_chunk/after_response for one request, N plugins
+- jwt_validate: validate_user() on a Bearer token
+- rate_limit: RateLimiter.hit() cycling over many client IPs
+
+Usage (from the server/ directory):
+    python benchmarks/microbench.py                    # compare with the baseline
+    python benchmarks/microbench.py --save-baseline    # record a new baseline (median of --runs)
+    python benchmarks/microbench.py --filter sse,jwt --threshold 0.5
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("PLUGINS_DIRS", tempfile.mkdtemp(prefix="microbench-no-plugins-"))
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_THRESHOLD = 0.25
+
+
+def case_pdf_extract(args):
+    import fitz
+    from api.utils import file_utils
+
+    doc = fitz.open()
+    for n in range(20):
+        page = doc.new_page()
+        for line in range(40):
+            page.insert_text((40, 40 + line * 18), f"Page {n} line {line}: the quick brown fox jumps over the lazy dog")
+    data = doc.tobytes()
+    doc.close()
+
+    def run():
+        file_utils._pdf_text_cache.clear()
+        file_utils.extract_text_from_pdf_bytes(data)
+    return run
+
+
+def _fake_sessions(count: int, messages: int):
+    from bson import ObjectId
+
+    now = datetime.now()
+    return [{
+        "_id": ObjectId(),
+        "session_name": f"Session {n}",
+        "user_id": ObjectId(),
+        "created_at": now,
+        "updated_at": now,
+        "version": messages,
+        "messages": [
+            {"role": "user" if i % 2 == 0 else "bot", "content": f"Message {i} " + "lorem ipsum " * 20,
+             "timestamp": now - timedelta(minutes=messages - i), "model_name": "llama3:8b"}
+            for i in range(messages)
+        ],
+    } for n in range(count)]
+
+
+def case_mention_context(args):
+    try:
+        import mongomock
+    except ImportError:
+        return None
+    from api import mongo
+    from api.routes.chat_routes import mention_context
+
+    mongo.db = mongomock.MongoClient().db
+    sessions = _fake_sessions(3, 20)
+    mongo.db.sessions.insert_many(sessions)
+    ids = [str(s["_id"]) for s in sessions]
+    return lambda: mention_context(ids)
+
+
+def case_sse_chunk(args):
+    from api.routes.chat_routes import sse_chunk
+
+    text = 'the model says "hello" and continues, '
+    return lambda: sse_chunk(text)
+
+
+def case_history_serialize(args):
+    from api.routes.chat_routes import serialize_session
+
+    session = _fake_sessions(1, 20)[0]
+    return lambda: serialize_session(session)
+
+
+def case_plugin_dispatch(args):
+    from bench_plugin_dispatch import make_plugins, request_hooks
+    from api.plugins.manager import PluginManager
+
+    plugin_dir = tempfile.mkdtemp(prefix="microbench-plugins-")
+    make_plugins(plugin_dir, args.plugins, 0.1, declare_hooks=True)
+    manager = PluginManager([plugin_dir])
+    manager.load_plugins()
+    # Inline calls: measures dispatch, not the timeout thread hop
+    manager.timeout_ms = 0
+    manager.load_all()
+    return lambda: request_hooks(manager, 20)
+
+
+def case_jwt_validate(args):
+    import jwt
+    from flask import Flask, request
+    from api.routes.chat_routes import validate_user
+
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "microbench-secret-key-0123456789abcdef"
+    token = jwt.encode({"user_id": "6650f0c2a1b2c3d4e5f60718", "exp": datetime.now() + timedelta(days=1)},
+                       app.config["SECRET_KEY"], algorithm="HS256")
+    ctx = app.test_request_context(headers={"Authorization": f"Bearer {token}"})
+    ctx.push()
+    return lambda: validate_user(request)
+
+
+def case_rate_limit(args):
+    from api.ratelimit import RateLimiter, MemoryStore
+
+    limiter = RateLimiter(MemoryStore(), {"chat": {"algorithm": "token_bucket", "rate": "20/60"}})
+    ips = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(args.ips)]
+    position = [0]
+    # Steady state: every client already has a bucket (otherwise the first
+    # timed runs also pay for growing the store)
+    for ip in ips:
+        limiter.hit("chat", ip)
+
+    def run():
+        position[0] = (position[0] + 1) % len(ips)
+        limiter.hit("chat", ips[position[0]])
+    return run
+
+
+CASES = {
+    "pdf_extract": case_pdf_extract,
+    "mention_context": case_mention_context,
+    "sse_chunk": case_sse_chunk,
+    "history_serialize": case_history_serialize,
+    "plugin_dispatch": case_plugin_dispatch,
+    "jwt_validate": case_jwt_validate,
+    "rate_limit": case_rate_limit,
+}
+
+
+def measure(func, repeat: int) -> float:
+    """Best time of one call over `repeat` runs, in microseconds (autorange() doubles as warm-up)."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e6
+
+
+def load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="comma-separated substrings of the case names to run")
+    parser.add_argument("--repeat", type=int, default=7, help="timed runs per measurement")
+    parser.add_argument("--runs", type=int, default=5, help="measurements per case with --save-baseline (median kept)")
+    parser.add_argument("--confirm", type=int, default=2, help="re-measurements of a case over its threshold")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, help="allowed slowdown for every case (default: per case)")
+    parser.add_argument("--plugins", type=int, default=50, help="installed plugins for plugin_dispatch")
+    parser.add_argument("--ips", type=int, default=50000, help="distinct client IPs for rate_limit")
+    args = parser.parse_args()
+
+    selected = [name for name in CASES if not args.filter or any(f in name for f in args.filter.split(","))]
+    baseline = load_baseline(args.baseline)
+    baseline_cases = baseline.get("cases", {})
+    results = {}
+    regressions = []
+
+    print(f"{'case':<20} {'us/op':>10} {'baseline':>10} {'change':>8}")
+    for name in selected:
+        func = CASES[name](args)
+        if func is None:
+            print(f"{name:<20} {'skipped (missing optional dependency)':>30}")
+            continue
+        if args.save_baseline:
+            value = statistics.median(measure(func, args.repeat) for _ in range(args.runs))
+        else:
+            value = measure(func, args.repeat)
+        reference = baseline_cases.get(name, {})
+        threshold = args.threshold if args.threshold is not None else reference.get(
+            "threshold", baseline.get("default_threshold", DEFAULT_THRESHOLD))
+        if reference.get("us_per_op") and not args.save_baseline:
+            # Confirm an apparent regression before reporting it
+            for _ in range(args.confirm):
+                if value / reference["us_per_op"] - 1 <= threshold:
+                    break
+                value = min(value, measure(func, args.repeat))
+        results[name] = value
+        line = f"{name:<20} {value:>10.2f}"
+        if reference.get("us_per_op"):
+            change = value / reference["us_per_op"] - 1
+            line += f" {reference['us_per_op']:>10.2f} {change:>+8.0%}"
+            if change > threshold and not args.save_baseline:
+                line += f"  REGRESSION (> {threshold:.0%})"
+                regressions.append(name)
+        print(line)
+
+    if args.save_baseline:
+        cases = {
+            name: {"us_per_op": round(value, 3), "threshold": baseline_cases.get(name, {}).get("threshold", DEFAULT_THRESHOLD)}
+            for name, value in results.items()
+        }
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "machine": f"{platform.machine()} {platform.processor() or platform.system()}, Python {platform.python_version()}",
+                "recorded_at": datetime.now().isoformat(timespec="seconds"),
+                "default_threshold": baseline.get("default_threshold", DEFAULT_THRESHOLD),
+                "cases": {**baseline_cases, **cases},
+            }, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+    elif regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
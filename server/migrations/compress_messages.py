@@ -0,0 +1,83 @@
+"""
+Compresses (or, with --decompress, restores) the bodies of messages already
+stored in the sessions collection, using the message codec (MESSAGE_COMPRESSION
+and MESSAGE_COMPRESSION_MIN_BYTES, or --codec/--min-bytes).
+
+Sessions are rewritten one bulk batch at a time, each update conditional on
+the session version it was read at: a session that receives a new message in
+the meantime is left for the next run (reported as "changed"). Session
+versions are not bumped, since the content does not change. Safe to re-run.
+
+Usage (from the server/ directory, with MONGODB_URL set):
+    python migrations/compress_messages.py --dry-run
+    python migrations/compress_messages.py --codec zlib --min-bytes 4096
+    python migrations/compress_messages.py --decompress
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import BSON
+from pymongo import MongoClient, UpdateOne
+from api.config import Config
+from api.utils.message_codec import encode_message, decode_message, resolve_codec
+
+
+def rewrite(messages: list, args) -> list:
+    if args.decompress:
+        return [decode_message(m) for m in messages]
+    # Re-encode from plain text, so a different codec or threshold also applies
+    return [encode_message(decode_message(m), args.codec, args.min_bytes) for m in messages]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default=Config.MONGO_URI)
+    parser.add_argument("--codec", default=Config.MESSAGE_COMPRESSION or "auto",
+                        help="zlib, zstd or auto (default: MESSAGE_COMPRESSION, else auto)")
+    parser.add_argument("--min-bytes", type=int, default=Config.MESSAGE_COMPRESSION_MIN_BYTES)
+    parser.add_argument("--decompress", action="store_true", help="store every message uncompressed again")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--dry-run", action="store_true", help="report the savings without writing")
+    args = parser.parse_args()
+    if not args.decompress and resolve_codec(args.codec) is None:
+        sys.exit("No codec selected: pass --codec zlib/zstd/auto")
+
+    sessions = MongoClient(args.mongo_uri).get_default_database().sessions
+    totals = {"sessions": 0, "rewritten": 0, "changed": 0, "bytes_before": 0, "bytes_after": 0}
+    batch = []
+
+    def flush():
+        if batch and not args.dry_run:
+            result = sessions.bulk_write(batch, ordered=False)
+            totals["changed"] += len(batch) - result.matched_count
+        batch.clear()
+
+    cursor = sessions.find({"messages.0": {"$exists": True}}, {"messages": 1, "version": 1}).batch_size(args.batch_size)
+    for session in cursor:
+        totals["sessions"] += 1
+        messages = session["messages"]
+        updated = rewrite(messages, args)
+        before = len(BSON.encode({"messages": messages}))
+        after = len(BSON.encode({"messages": updated}))
+        totals["bytes_before"] += before
+        totals["bytes_after"] += after
+        if updated == messages:
+            continue
+        totals["rewritten"] += 1
+        batch.append(UpdateOne({"_id": session["_id"], "version": session.get("version")},
+                               {"$set": {"messages": updated}}))
+        if len(batch) >= args.batch_size:
+            flush()
+    flush()
+
+    change = totals["bytes_after"] / totals["bytes_before"] - 1 if totals["bytes_before"] else 0
+    print(f"{'Would rewrite' if args.dry_run else 'Rewrote'} {totals['rewritten']} of {totals['sessions']} sessions"
+          f" ({totals['changed']} changed meanwhile, re-run to include them)")
+    print(f"Message storage: {totals['bytes_before'] / 1e6:.2f} MB -> {totals['bytes_after'] / 1e6:.2f} MB ({change:+.0%})")
+
+
+if __name__ == "__main__":
+    main()